@@ -0,0 +1,81 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import statistics
+import sys
+import time
+
+import glm
+import numpy as np
+from gpu import GpuTimer, OffscreenContext
+
+from gl_backend import gl
+from scenes import VIEWPOINTS, BenchScene
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Frame times with the static lights evaluated per fragment "
+        "and baked into the vertices, and how far apart the two images are"
+    )
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    context = OffscreenContext(args.width, args.height)
+    print(f"Renderer: {context.renderer}, {args.width}x{args.height}")
+    timer = GpuTimer()
+
+    images = {}
+    for bake in (False, True):
+        start = time.perf_counter()
+        scene = BenchScene(
+            aspect_ratio=args.width / args.height, optimize=True, bake=bake
+        )
+        baked = [name for name, entity in scene.entities.items() if entity.baked_lights]
+        print(
+            f"{'baked' if bake else 'runtime'}: built in"
+            f" {time.perf_counter() - start:.2f}s, baked: {', '.join(baked) or '-'}"
+        )
+
+        for viewpoint, (position, yaw) in VIEWPOINTS.items():
+            scene.camera.position = glm.vec3(*position)
+            scene.camera.yaw = yaw
+            scene.camera._front = scene.camera.update_front()
+            for _ in range(3):
+                scene.render_frame()
+            gl.glFinish()
+            pixels = gl.glReadPixels(
+                0, 0, args.width, args.height, gl.GL_RGB, gl.GL_UNSIGNED_BYTE
+            )
+            images[bake, viewpoint] = np.frombuffer(pixels, np.uint8).astype(np.int16)
+
+            gpu_times, wall_times = [], []
+            for _ in range(args.frames):
+                with timer:
+                    scene.render_frame()
+                gpu_times.append(timer.gpu_time)
+                wall_times.append(timer.wall_time)
+            print(
+                f"{viewpoint:>10}: gpu {statistics.median(gpu_times) * 1000:8.3f} ms"
+                f"  wall {statistics.median(wall_times) * 1000:8.3f} ms"
+                f"  ({scene.renderer.stats.triangles} triangles)"
+            )
+
+    for viewpoint in VIEWPOINTS:
+        difference = np.abs(images[True, viewpoint] - images[False, viewpoint])
+        print(
+            f"{viewpoint:>10}: mean difference {difference.mean():.3f},"
+            f" {np.mean(difference > 16) * 100:.3f}% of channels off by more than 16"
+        )
+
+    context.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import statistics
+import sys
+
+from gpu import GpuTimer, OffscreenContext
+
+from gl_backend import gl
+from scenes import VIEWPOINTS, BenchScene
+
+# On first, so the overdraw is measured before the other modes report it
+MODES = {"on": True, "off": False, "auto": None}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Frame times with the depth pre-pass off, on and decided "
+        "from the measured overdraw, for each viewpoint"
+    )
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    context = OffscreenContext(args.width, args.height)
+    print(f"Renderer: {context.renderer}, {args.width}x{args.height}")
+    timer = GpuTimer()
+
+    for viewpoint in VIEWPOINTS:
+        scene = BenchScene(
+            viewpoint=viewpoint,
+            aspect_ratio=args.width / args.height,
+            optimize=True,
+            depth_prepass=True,
+        )
+        renderer = scene.renderer
+        print(f"{viewpoint}:")
+
+        for label, depth_prepass in MODES.items():
+            renderer.depth_prepass = depth_prepass
+            # Warm-up, and lets the automatic mode measure and decide
+            for _ in range(3):
+                scene.render_frame()
+                gl.glFinish()
+
+            gpu_times, wall_times = [], []
+            for _ in range(args.frames):
+                gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
+                with timer:
+                    scene.render_frame()
+                gpu_times.append(timer.gpu_time)
+                wall_times.append(timer.wall_time)
+
+            stats = renderer.stats
+            print(
+                f"{label:>6}: gpu {statistics.median(gpu_times) * 1000:8.3f} ms"
+                f"  wall {statistics.median(wall_times) * 1000:8.3f} ms"
+                f"  pre-pass {'on ' if stats.depth_prepass else 'off'}"
+                f"  overdraw {renderer.overdraw_probe.overdraw:.2f}"
+                f"  ({stats.draw_calls} draws)"
+            )
+
+    context.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+
+import glm
+import numpy as np
+from gpu import GpuTimer, OffscreenContext
+
+from gl_backend import gl
+from mesh_cache import MeshCache
+from quality_governor import QUALITY_LEVELS, GpuFrameTimer, QualityGovernor
+from render_target import RenderTarget
+from scenes import VIEWPOINTS, BenchScene
+
+LOD_MODELS = ["spongebob", "shion", "monster", "krabbypatty", "boatmobile"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Frame times and image differences at each of the quality "
+        "governor's levels, then the levels it settles on for a frame budget"
+    )
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--viewpoint", choices=list(VIEWPOINTS), default="interior")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=None,
+        help="frame budget in ms, by default 60%% of the full quality frame's"
+        " wall time",
+    )
+    parser.add_argument("--governor-frames", type=int, default=150)
+    args = parser.parse_args()
+
+    context = OffscreenContext(args.width, args.height)
+    print(f"Renderer: {context.renderer}, {args.width}x{args.height}")
+    size = (args.width, args.height)
+    timer = GpuTimer()
+
+    with tempfile.TemporaryDirectory() as directory:
+        scene = BenchScene(
+            viewpoint=args.viewpoint,
+            aspect_ratio=args.width / args.height,
+            optimize=True,
+            mesh_cache=MeshCache(directory),
+            lod_models=LOD_MODELS,
+        )
+    position, yaw = VIEWPOINTS[args.viewpoint]
+    scene.camera.position = glm.vec3(*position)
+    scene.camera.yaw = yaw
+    scene.camera._front = scene.camera.update_front()
+    target = RenderTarget(output=context.framebuffer)
+
+    def render() -> None:
+        target.begin(size)
+        scene.render_frame()
+        target.end(size)
+
+    print(
+        f"{'level':>5} {'scale':>5} {'msaa':>4} {'bias':>4} {'lights':>6}"
+        f" {'gpu':>10} {'wall':>10} {'triangles':>9} {'difference':>10}"
+    )
+    reference = None
+    full_quality = 0.0
+    for level, settings in enumerate(QUALITY_LEVELS):
+        governor = QualityGovernor(levels=QUALITY_LEVELS, level=level)
+        governor.apply(scene.renderer, target)
+        for _ in range(3):
+            render()
+        gl.glFinish()
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, context.framebuffer)
+        pixels = gl.glReadPixels(
+            0, 0, args.width, args.height, gl.GL_RGB, gl.GL_UNSIGNED_BYTE
+        )
+        image = np.frombuffer(pixels, np.uint8).astype(np.int16)
+        if reference is None:
+            reference = image
+
+        gpu_times, wall_times = [], []
+        for _ in range(args.frames):
+            with timer:
+                render()
+            gpu_times.append(timer.gpu_time)
+            wall_times.append(timer.wall_time)
+        if level == 0:
+            full_quality = statistics.median(wall_times)
+        print(
+            f"{level:5d} {settings.render_scale:5.2f} {settings.samples:4d}"
+            f" {settings.lod_bias:4d} {settings.max_lights:6d}"
+            f" {statistics.median(gpu_times) * 1000:7.2f} ms"
+            f" {statistics.median(wall_times) * 1000:7.2f} ms"
+            f" {scene.renderer.stats.triangles:9d}"
+            f" {np.abs(image - reference).mean():10.3f}"
+        )
+
+    budget = args.budget / 1000 if args.budget else full_quality * 0.6
+    print(f"Governor, budget {budget * 1000:.2f} ms:")
+    governor = QualityGovernor(budget)
+    gpu_timer = GpuFrameTimer()
+    cpu_time = 0.0
+    for frame in range(args.governor_frames):
+        if governor.update(cpu_time, gpu_timer.poll()):
+            print(f"{frame:5d}: level {governor.level} {governor.settings}")
+        governor.apply(scene.renderer, target)
+        start = time.perf_counter()
+        gpu_timer.begin()
+        render()
+        gpu_timer.end()
+        # llvmpipe draws on the CPU, when the frame is flushed: the time
+        # elapsed queries miss most of it, so the CPU time includes it
+        gl.glFinish()
+        cpu_time = time.perf_counter() - start
+    governor.report(scene.renderer.stats)
+    print("\n".join(scene.renderer.stats.lines()[-3:]))
+
+    context.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
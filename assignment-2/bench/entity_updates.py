@@ -0,0 +1,196 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import csv
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import harness  # noqa: F401 (sets up the import path)
+
+import glm
+import numpy as np
+
+from entity import Entity, EntityStore
+from entity.store import BOB, ORBIT
+
+COUNTS = [100, 10_000, 1_000_000]
+
+FIELDS = [
+    "entities",
+    "store_ms",
+    "objects_ms",
+    "speedup",
+    "view_reads_ms",
+    "object_reads_ms",
+]
+
+
+class PlainEntity:
+    """An entity as they were before the store: PyGLM vectors and an update"""
+
+    position: glm.vec3
+    angle_y: float
+    rotation_speed: float
+    center: glm.vec3
+    kind: int
+    extent: float
+    rate: float
+    time: float
+
+    def __init__(self, store: EntityStore, row: int) -> None:
+        self.position = glm.vec3(store.transforms["position"][row])
+        self.angle_y = float(store.transforms["angles"][row, 1])
+        self.rotation_speed = float(store.motion["spin"][row, 1])
+        animation = store.animation[row]
+        self.kind = int(animation["kind"])
+        self.center = glm.vec3(animation["center"])
+        self.extent = float(animation["extent"])
+        self.rate = float(animation["rate"])
+        self.time = 0.0
+
+    def update(self, dt: float) -> None:
+        if self.rotation_speed != 0.0:
+            self.angle_y = (self.angle_y + self.rotation_speed * dt) % 360.0
+        if self.kind == ORBIT:
+            self.time += dt
+            self.position = self.center + glm.vec3(
+                self.extent * np.cos(self.rate * self.time),
+                0.0,
+                self.extent * np.sin(self.rate * self.time),
+            )
+        elif self.kind == BOB:
+            self.time += dt
+            self.position = self.center + glm.vec3(
+                0.0, self.extent * np.sin(self.rate * self.time), 0.0
+            )
+
+
+def fill(store: EntityStore, count: int, static_fraction: float, seed: int) -> None:
+    """Rows mixed like `generate_scene`'s: static, spinning and a few animated"""
+    rng = np.random.default_rng(seed)
+    first = store.allocate(count)
+    rows = slice(first, first + count)
+    extent = 6.0 * max(np.sqrt(count), 1.0)
+    positions = rng.uniform(-extent / 2, extent / 2, (count, 3))
+    positions[:, 1] = 0.0
+    store.transforms["position"][rows] = positions
+    store.transforms["angles"][rows, 1] = rng.uniform(0.0, 360.0, count)
+
+    roll = rng.random(count)
+    spinning = roll >= static_fraction
+    store.flags["static"][rows] = ~spinning
+    store.motion["spin"][rows, 1] = np.where(
+        spinning, rng.uniform(-180.0, 180.0, count), 0.0
+    )
+    # One in a hundred of the moving ones orbits or bobs
+    animated = spinning & (rng.random(count) < 0.01)
+    kinds = np.where(rng.random(count) < 0.5, ORBIT, BOB)
+    store.animation["kind"][rows] = np.where(animated, kinds, 0)
+    store.animation["center"][rows] = positions + [0.0, 4.0, 0.0]
+    store.animation["extent"][rows] = rng.uniform(0.5, 6.0, count)
+    store.animation["rate"][rows] = rng.uniform(0.5, 4.0, count)
+    store.invalidate()
+
+
+def median_time(function: Callable[[], Any], repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def measure(count: int, frames: int, static_fraction: float) -> Dict[str, float]:
+    dt = 1.0 / 60.0
+    store = EntityStore()
+    fill(store, count, static_fraction, seed=0)
+    objects = [PlainEntity(store, row) for row in range(count)]
+
+    # Views of the same rows, read the way the renderer does. Made without
+    # `Entity.__init__`, which would add rows of its own
+    entities = [Entity.__new__(Entity) for _ in range(count)]
+    for row, entity in enumerate(entities):
+        entity.store, entity.row = store, row
+
+    def update_objects() -> None:
+        for entity in objects:
+            entity.update(dt)
+
+    def read_views() -> None:
+        for entity in entities:
+            entity.position
+
+    def read_objects() -> None:
+        for entity in objects:
+            entity.position
+
+    store_time = median_time(lambda: store.update(dt), frames)
+    objects_time = median_time(update_objects, frames)
+    return {
+        "store_ms": store_time * 1000,
+        "objects_ms": objects_time * 1000,
+        "speedup": objects_time / store_time,
+        "view_reads_ms": median_time(read_views, frames) * 1000,
+        "object_reads_ms": median_time(read_objects, frames) * 1000,
+    }
+
+
+def plot(rows: List[Dict[str, Any]], path: str) -> None:
+    """Charts the update cost against the entity count (needs matplotlib)"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(5, 4))
+    counts = [row["entities"] for row in rows]
+    ax.loglog(counts, [row["objects_ms"] for row in rows], "s--", label="objects")
+    ax.loglog(counts, [row["store_ms"] for row in rows], "o-", label="store")
+    ax.set_xlabel("entities")
+    ax.set_ylabel("update ms")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Charts the cost of a simulation step against the entity "
+        "count, updating Python objects one by one or the entity store's "
+        "columns at once"
+    )
+    parser.add_argument("--counts", type=int, nargs="+", default=COUNTS)
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--static-fraction", type=float, default=0.8)
+    parser.add_argument("-o", "--output", help="Write the CSV to a file")
+    parser.add_argument("--plot", help="Save a chart (requires matplotlib)")
+    args = parser.parse_args()
+
+    rows = []
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.DictWriter(out, FIELDS)
+    writer.writeheader()
+    for count in args.counts:
+        row = {
+            "entities": count,
+            **measure(count, args.frames, args.static_fraction),
+        }
+        rows.append(row)
+        writer.writerow(
+            {k: f"{v:.3f}" if isinstance(v, float) else v for k, v in row.items()}
+        )
+        out.flush()
+
+    if args.output:
+        out.close()
+    if args.plot:
+        plot(rows, args.plot)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
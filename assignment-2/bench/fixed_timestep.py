@@ -0,0 +1,135 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import harness  # noqa: F401 (sets up the import path)
+
+import glfw
+import glm
+import numpy as np
+
+from assets import load_assets
+from camera import Camera
+from gl_backend import RecordingBackend, use_backend
+from scene_generator import SyntheticScene, generate_scene
+from scenes import FRAGMENT_SHADER_FILE, VERTEX_SHADER_FILE
+from shader import Shader
+from simulation import FixedTimestep, StateInterpolator
+
+
+def frame_times(duration: float, rate: float, jitter: float = 0.0) -> List[float]:
+    """Times between frames adding up to `duration`, around 1 / `rate`"""
+    rng = random.Random(0)
+    times: List[float] = []
+    while sum(times) < duration:
+        times.append(max(1.0 / rate + rng.uniform(-jitter, jitter), 0.001))
+    times[-1] -= sum(times) - duration
+    return times
+
+
+def with_stall(times: List[float], stall: float) -> List[float]:
+    """The same frames, one of them taking `stall` longer (loading something)"""
+    middle = len(times) // 2
+    return times[:middle] + [times[middle] + stall] + times[middle + 1 :]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Where the same seconds of a synthetic scene and a "
+        "sprinting camera end up at different frame rates, updating with the "
+        "time between frames or in fixed steps, and what the updates cost"
+    )
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--entities", type=int, default=1000)
+    args = parser.parse_args()
+
+    traces: Dict[str, List[float]] = {
+        "60 Hz": frame_times(args.duration, 60),
+        "30 Hz": frame_times(args.duration, 30),
+        "144 Hz": frame_times(args.duration, 144),
+        "jittery": frame_times(args.duration, 60, jitter=0.012),
+        "stall": with_stall(frame_times(args.duration, 144), 0.5),
+    }
+
+    backend = RecordingBackend(record=False)
+    with use_backend(backend):
+        shader = Shader.load_from_files(VERTEX_SHADER_FILE, FRAGMENT_SHADER_FILE)
+        _, models = load_assets(shader, ["god", "monster"])
+
+    def build() -> Tuple[SyntheticScene, Camera]:
+        scene = generate_scene(
+            models, entity_count=args.entities, static_fraction=0.5, glowing_count=4
+        )
+        camera = Camera(position=glm.vec3(0.0, 2.0, 0.0))
+        camera._pressed_keys = {glfw.KEY_W, glfw.KEY_LEFT_SHIFT}
+        return scene, camera
+
+    def state(entities: List, camera: Camera) -> np.ndarray:
+        return np.array(
+            [[*entity.position, entity.angle_y] for entity in entities]
+            + [[*camera.position, camera.fov]]
+        )
+
+    def variable(scene: SyntheticScene, camera: Camera, dt: float, _: Callable) -> int:
+        camera._update_position(dt)
+        scene.update(dt, camera)
+        return 1
+
+    def fixed(scene: SyntheticScene, camera: Camera, dt: float, step: Callable) -> int:
+        return step(dt)
+
+    print(
+        f"{'mode':>8} {'trace':>8} {'frames':>6} {'updates':>7} {'update ms':>9}"
+        f" {'blend ms':>8} {'camera x':>9} {'entities off':>12} {'camera off':>10}"
+    )
+    for name, loop in (("variable", variable), ("fixed", fixed)):
+        reference = None
+        for trace, times in traces.items():
+            scene, camera = build()
+            timestep = FixedTimestep()
+            interpolator = StateInterpolator(scene.entities, camera)
+
+            def step(dt: float) -> int:
+                steps = timestep.advance(dt)
+                for _ in range(steps):
+                    interpolator.save()
+                    camera._update_position(timestep.step)
+                    scene.update(timestep.step, camera)
+                return steps
+
+            updates = 0
+            update_time = blend_time = 0.0
+            for dt in times:
+                start = time.perf_counter()
+                updates += loop(scene, camera, dt, step)
+                updated = time.perf_counter()
+                if loop is fixed:
+                    # What drawing the frame adds: the in-between transforms
+                    with interpolator.blend(timestep.alpha):
+                        pass
+                update_time += updated - start
+                blend_time += time.perf_counter() - updated
+
+            result = state(scene.entities, camera)
+            if reference is None:
+                reference = result
+            difference = np.abs(result - reference)
+            print(
+                f"{name:>8} {trace:>8} {len(times):6d} {updates:7d}"
+                f" {update_time * 1000:9.2f} {blend_time * 1000:8.2f}"
+                f" {camera.position.x:9.3f} {difference[:-1, :3].max():12.6f}"
+                f" {difference[-1, :3].max():10.6f}"
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import ctypes
+import os
+import time
+from typing import Any, List, cast
+
+# PyOpenGL picks its platform on first import, so this module must be imported
+# before anything that imports OpenGL. Mesa can then create contexts without
+# a display (llvmpipe when there is no GPU)
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+import harness  # noqa: E402,F401 (sets up the import path)
+
+from OpenGL import EGL  # noqa: E402
+
+from gl_backend import gl  # noqa: E402
+
+
+class OffscreenContext:
+    """
+    An OpenGL 4.1 core context without a window, drawing into a framebuffer
+    object with a color and a depth attachment of the given size.
+    """
+
+    width: int
+    height: int
+    framebuffer: int
+
+    def __init__(self, width: int = 1280, height: int = 720, samples: int = 0):
+        self.width = width
+        self.height = height
+
+        self._display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(
+            self._display, ctypes.pointer(major), ctypes.pointer(minor)
+        ):
+            raise RuntimeError("Could not initialize EGL")
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+
+        config = EGL.EGLConfig()
+        config_count = EGL.EGLint()
+        config_attributes = (EGL.EGLint * 5)(
+            EGL.EGL_SURFACE_TYPE,
+            EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RENDERABLE_TYPE,
+            EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE,
+        )
+        EGL.eglChooseConfig(
+            self._display,
+            config_attributes,
+            ctypes.pointer(config),
+            1,
+            ctypes.pointer(config_count),
+        )
+        if config_count.value == 0:
+            raise RuntimeError("No EGL config supports desktop OpenGL")
+
+        context_attributes = (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION,
+            4,
+            EGL.EGL_CONTEXT_MINOR_VERSION,
+            1,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+            EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE,
+        )
+        self._context = EGL.eglCreateContext(
+            self._display, config, EGL.EGL_NO_CONTEXT, context_attributes
+        )
+        if not EGL.eglMakeCurrent(
+            self._display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self._context
+        ):
+            raise RuntimeError("Could not make the EGL context current")
+
+        self.framebuffer = self._create_framebuffer(samples)
+
+    def _create_framebuffer(self, samples: int) -> int:
+        framebuffer = cast(int, gl.glGenFramebuffers(1))
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, framebuffer)
+
+        color, depth = cast(List[int], gl.glGenRenderbuffers(2))
+        for renderbuffer, storage, attachment in (
+            (color, gl.GL_RGBA8, gl.GL_COLOR_ATTACHMENT0),
+            (depth, gl.GL_DEPTH_COMPONENT24, gl.GL_DEPTH_ATTACHMENT),
+        ):
+            gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, renderbuffer)
+            gl.glRenderbufferStorageMultisample(
+                gl.GL_RENDERBUFFER, samples, storage, self.width, self.height
+            )
+            gl.glFramebufferRenderbuffer(
+                gl.GL_FRAMEBUFFER, attachment, gl.GL_RENDERBUFFER, renderbuffer
+            )
+
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Incomplete framebuffer: {status}")
+
+        gl.glViewport(0, 0, self.width, self.height)
+        return framebuffer
+
+    @property
+    def renderer(self) -> str:
+        return cast(bytes, gl.glGetString(gl.GL_RENDERER)).decode()
+
+    def close(self) -> None:
+        EGL.eglMakeCurrent(
+            self._display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT
+        )
+        EGL.eglDestroyContext(self._display, self._context)
+        EGL.eglTerminate(self._display)
+
+
+class GpuTimer:
+    """Measures GPU time (GL_TIME_ELAPSED) and wall time of a block of commands"""
+
+    query: int
+    gpu_time: float
+    wall_time: float
+
+    def __init__(self) -> None:
+        self.query = int(gl.glGenQueries(1)[0])
+        self.gpu_time = 0.0
+        self.wall_time = 0.0
+
+    def __enter__(self) -> "GpuTimer":
+        gl.glFinish()
+        self._start = time.perf_counter()
+        gl.glBeginQuery(gl.GL_TIME_ELAPSED, self.query)
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        gl.glEndQuery(gl.GL_TIME_ELAPSED)
+        gl.glFinish()
+        self.wall_time = time.perf_counter() - self._start
+        # PyOpenGL can't allocate 64 bit outputs itself
+        result = ctypes.c_uint64()
+        gl.glGetQueryObjectui64v(self.query, gl.GL_QUERY_RESULT, ctypes.byref(result))
+        self.gpu_time = result.value / 1e9
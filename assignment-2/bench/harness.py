@@ -0,0 +1,198 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+# Make the assignment's modules importable from the benchmarks
+SRC_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), "../src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # Builds the state passed to `run`, not timed
+    setup: Callable[[], Any]
+    # The timed code
+    run: Callable[[Any], Any]
+
+
+class Result(NamedTuple):
+    name: str
+    # Median wall time of a run, in seconds
+    time: float
+    # Best wall time of a run, in seconds
+    best: float
+    # Peak traced Python memory during a run, in bytes
+    peak_memory: int
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"time": self.time, "best": self.best, "peak_memory": self.peak_memory}
+
+
+class Suite:
+    """A named collection of benchmarks"""
+
+    name: str
+    benchmarks: List[Benchmark]
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.benchmarks = []
+
+    def add(
+        self,
+        name: str,
+        run: Callable[[Any], Any],
+        setup: Callable[[], Any] = lambda: None,
+    ) -> None:
+        self.benchmarks.append(Benchmark(name, setup, run))
+
+    def benchmark(
+        self, name: str, setup: Callable[[], Any] = lambda: None
+    ) -> Callable[[Callable[[Any], Any]], Callable[[Any], Any]]:
+        """Decorator version of `add`"""
+
+        def decorator(run: Callable[[Any], Any]) -> Callable[[Any], Any]:
+            self.add(name, run, setup)
+            return run
+
+        return decorator
+
+
+def measure(benchmark: Benchmark, repeat: int = 5) -> Result:
+    """Times `repeat` runs, then measures the memory peak in a separate run"""
+    state = benchmark.setup()
+
+    # Warm up caches and lazy imports
+    benchmark.run(state)
+
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        benchmark.run(state)
+        times.append(time.perf_counter() - start)
+
+    # Tracing slows the code down, so it has its own run
+    gc.collect()
+    tracemalloc.start()
+    benchmark.run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(benchmark.name, statistics.median(times), min(times), peak)
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, float]]:
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: List[Result]) -> None:
+    baseline = load_baseline(path)
+    baseline.update({result.name: result.as_dict() for result in results})
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(
+    results: List[Result],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+    memory_threshold: float,
+) -> List[str]:
+    """Returns a description of every result that regressed past the thresholds"""
+    regressions = []
+    for result in results:
+        if result.name not in baseline:
+            continue
+        base = baseline[result.name]
+
+        if result.time > base["time"] * (1.0 + threshold):
+            regressions.append(
+                f"{result.name}: time {result.time * 1000:.3f}ms vs "
+                f"{base['time'] * 1000:.3f}ms (+{result.time / base['time'] - 1:.0%})"
+            )
+        if result.peak_memory > base["peak_memory"] * (1.0 + memory_threshold):
+            regressions.append(
+                f"{result.name}: peak memory {result.peak_memory / 1024:.1f}KiB vs "
+                f"{base['peak_memory'] / 1024:.1f}KiB"
+            )
+    return regressions
+
+
+def format_result(result: Result, base: Optional[Dict[str, float]]) -> str:
+    line = (
+        f"{result.name:<48} {result.time * 1000:>10.3f}ms "
+        f"{result.best * 1000:>10.3f}ms {result.peak_memory / 1024:>10.1f}KiB"
+    )
+    if base is not None:
+        line += f" {result.time / base['time'] - 1:>+8.1%}"
+    return line
+
+
+def main(suite: Suite, argv: Optional[List[str]] = None) -> int:
+    """Command line entry point shared by the benchmark scripts"""
+    parser = argparse.ArgumentParser(description=f"Runs the {suite.name} benchmarks")
+    parser.add_argument("-k", "--filter", default="", help="Run only matching names")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed relative slowdown before failing (0.25 = 25%%)",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.10,
+        help="Allowed relative growth of the memory peak before failing",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+
+    print(f"{'benchmark':<48} {'median':>12} {'best':>12} {'peak':>13}")
+    results = []
+    for benchmark in suite.benchmarks:
+        if args.filter not in benchmark.name:
+            continue
+        result = measure(benchmark, args.repeat)
+        results.append(result)
+        print(format_result(result, baseline.get(result.name)), flush=True)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+
+    return 1 if regressions else 0
@@ -0,0 +1,157 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import sys
+
+from harness import Suite, main
+
+import glm
+
+import wavefront
+from assets import BUNDLED_ASSETS, available_assets, load_assets, local_relative_path
+from entity import Entity, EntityStore
+from gl_backend import RecordingBackend, use_backend
+from headless import HeadlessScene
+from material import Material
+from model import Buffers, Model
+from renderer import Renderer
+from shader import Shader
+
+# Small, medium and the largest bundled meshes
+MODELS = ("monster", "shion", "spongebob", "burgerpiz_inner")
+MTLLIBS = ("burgerpiz_outer", "burgerpiz_inner")
+TEXTURES = (
+    "../textures/boatmobile.png",
+    "../textures/spongebob_color.png",
+    "../textures/burgerpiz-2/Building_baseColor.jpg",
+)
+
+suite = Suite("loading and rendering hot paths")
+
+
+def recording_shader() -> Shader:
+    with use_backend(RecordingBackend(record=False)):
+        return Shader.compile("", "")
+
+
+for name in MODELS:
+    if name not in available_assets():
+        continue
+    asset = BUNDLED_ASSETS[name]
+    obj_file = local_relative_path(asset.obj_file)
+    mtl_file = local_relative_path(asset.mtl_file)
+
+    suite.add(
+        f"wavefront.load_obj[{name}]",
+        lambda path: wavefront.load_obj(path),
+        lambda path=obj_file: path,
+    )
+
+    def setup_model_load(mtl_file=mtl_file, obj_file=obj_file, prefix=asset.prefix):
+        materials = Material.load_mtllib(recording_shader(), mtl_file, prefix)
+        return obj_file, materials, prefix
+
+    suite.add(
+        f"Model.load_obj[{name}]",
+        lambda state: Model.load_obj(state[0], state[1], state[2]),
+        setup_model_load,
+    )
+
+for name in MTLLIBS:
+    mtl_file = local_relative_path(BUNDLED_ASSETS[name].mtl_file)
+    suite.add(
+        f"wavefront.load_mtllib[{name}]",
+        lambda path: wavefront.load_mtllib(path),
+        lambda path=mtl_file: path,
+    )
+
+for texture in TEXTURES:
+    suite.add(
+        f"Material.decode_texture[{texture.rsplit('/', 1)[-1]}]",
+        lambda path: Material.decode_texture(path),
+        lambda path=local_relative_path(texture): path,
+    )
+
+
+def setup_buffers_state():
+    backend = RecordingBackend(record=False)
+    with use_backend(backend):
+        _, models = load_assets(recording_shader(), MODELS)
+    return backend, list(models.values())
+
+
+@suite.benchmark("Buffers.setup_buffers", setup_buffers_state)
+def bench_setup_buffers(state):
+    backend, models = state
+    with use_backend(backend):
+        Buffers.setup_buffers(models)
+
+
+def model_matrix_state():
+    with use_backend(RecordingBackend(record=False)):
+        _, models = load_assets(recording_shader(), ["god"])
+    entity = Entity(
+        models["god"],
+        EntityStore(),
+        position=glm.vec3(1.0, 2.0, 3.0),
+        scale=glm.vec3(0.5),
+        angle_x=10.0,
+        angle_y=20.0,
+        angle_z=30.0,
+    )
+    return Renderer(), entity
+
+
+@suite.benchmark("Renderer._model_matrix[x1000]", model_matrix_state)
+def bench_model_matrix(state):
+    renderer, entity = state
+    for _ in range(1000):
+        renderer._model_matrix(entity)
+
+
+HEADLESS_MODELS = ("god", "monster", "boatmobile", "krabbypatty", "shion", "spongebob")
+
+
+@suite.benchmark(
+    "Renderer.frame[headless]",
+    lambda: HeadlessScene(
+        HEADLESS_MODELS,
+        RecordingBackend(record=False),
+        load_textures=False,
+        use_packets=False,
+    ),
+)
+def bench_headless_frame(scene):
+    scene.render_frame()
+
+
+@suite.benchmark(
+    "Renderer.frame[headless, packets]",
+    lambda: HeadlessScene(
+        HEADLESS_MODELS, RecordingBackend(record=False), load_textures=False
+    ),
+)
+def bench_headless_packets_frame(scene):
+    scene.render_frame()
+
+
+# Many small segments, where the per-draw overhead dominates
+BURGERPIZ_MODELS = ("burgerpiz_inner", "burgerpiz_outer", "spongebob")
+
+for use_packets in (False, True):
+    suite.add(
+        "Renderer.frame[burgerpiz" + (", packets]" if use_packets else "]"),
+        lambda scene: scene.render_frame(),
+        lambda use_packets=use_packets: HeadlessScene(
+            BURGERPIZ_MODELS,
+            RecordingBackend(record=False),
+            load_textures=False,
+            use_packets=use_packets,
+        ),
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main(suite))
@@ -0,0 +1,146 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+import glfw
+from gpu import OffscreenContext
+
+from gl_backend import gl
+from redraw import RedrawScheduler
+from scenes import BenchScene
+from simulation import FixedTimestep
+
+# Cumulative energy of the CPU package, where the kernel exposes it (RAPL)
+ENERGY_FILE = "/sys/class/powercap/intel-rapl:0/energy_uj"
+
+
+def energy() -> Optional[float]:
+    """Joules used by the CPU package so far, None if it can't be read"""
+    try:
+        with open(ENERGY_FILE) as file:
+            return int(file.read()) / 1e6
+    except OSError:
+        return None
+
+
+class EventScript:
+    """
+    Input events at given times, dispatched the way GLFW does: from `poll`
+    and from `wait`, which sleeps until the next one (or the timeout)
+    """
+
+    events: List[Tuple[float, Callable[[], None]]]
+    start: float
+
+    def __init__(self, events: List[Tuple[float, Callable[[], None]]]) -> None:
+        self.events = sorted(events, key=lambda event: event[0])
+        self.start = time.perf_counter()
+
+    def poll(self) -> None:
+        now = time.perf_counter() - self.start
+        while self.events and self.events[0][0] <= now:
+            self.events.pop(0)[1]()
+
+    def wait(self, timeout: float) -> None:
+        now = time.perf_counter() - self.start
+        until = now + timeout
+        if self.events:
+            until = min(until, self.events[0][0])
+        time.sleep(max(until - now, 0.0))
+        self.poll()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Frames drawn and CPU used by the main loop over a few "
+        "seconds of the static scene, drawing every frame or on demand, idle "
+        "and with a burst of input"
+    )
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    args = parser.parse_args()
+
+    context = OffscreenContext(args.width, args.height)
+    print(f"Renderer: {context.renderer}, {args.width}x{args.height}")
+    scene = BenchScene(aspect_ratio=args.width / args.height, optimize=True)
+    camera = scene.camera
+    if energy() is None:
+        print("CPU energy counters aren't readable here, only CPU time is shown")
+
+    print(
+        f"{'mode':>10} {'input':>6} {'frames':>6} {'waits':>5}"
+        f" {'cpu s':>6} {'cpu %':>6} {'energy J':>8}"
+    )
+    for on_demand, with_input in ((False, False), (True, False), (True, True)):
+        events: List[Tuple[float, Callable[[], None]]] = []
+        redraw: RedrawScheduler
+
+        def press(action: int) -> Callable[[], None]:
+            def event() -> None:
+                camera.key_handler(None, glfw.KEY_D, 0, action, 0)
+                redraw.key_handler(None, glfw.KEY_D, 0, action, 0)
+
+            return event
+
+        if with_input:
+            # Strafe for a second in the middle of the run
+            events = [
+                (args.duration * 0.4, press(glfw.PRESS)),
+                (args.duration * 0.4 + 1.0, press(glfw.RELEASE)),
+            ]
+        script = EventScript(events)
+        redraw = RedrawScheduler(
+            scene.entities.values(), camera, enabled=on_demand, wait=script.wait
+        )
+        timestep = FixedTimestep()
+
+        frames = 0
+        start_energy = energy()
+        start_cpu = time.process_time()
+        last_render = time.perf_counter()
+        while time.perf_counter() - script.start < args.duration:
+            if not redraw.due():
+                redraw.wait()
+                last_render = time.perf_counter()
+                continue
+
+            current_time = time.perf_counter()
+            script.poll()
+            for _ in range(timestep.advance(current_time - last_render)):
+                camera._update_position(timestep.step)
+                for entity in scene.entities.values():
+                    entity.update(timestep.step, camera)
+            scene.render_frame()
+            # Stands in for the swap, which waits for the frame
+            gl.glFinish()
+            frames += 1
+            last_render = current_time
+
+        cpu = time.process_time() - start_cpu
+        end_energy = energy()
+        used = (
+            f"{end_energy - start_energy:8.2f}"
+            if start_energy is not None and end_energy is not None
+            else f"{'-':>8}"
+        )
+        print(
+            f"{'on demand' if on_demand else 'always':>10}"
+            f" {'yes' if with_input else 'no':>6} {frames:6d} {redraw.waits:5d}"
+            f" {cpu:6.2f} {cpu / args.duration * 100:5.1f}% {used}"
+        )
+
+    print(f"({os.cpu_count()} CPU(s), llvmpipe draws on them too)")
+    context.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
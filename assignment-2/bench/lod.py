@@ -0,0 +1,100 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import sys
+import tempfile
+import time
+
+import harness  # noqa: F401 (sets up the import path)
+
+import glm
+
+import renderer
+from gl_backend import RecordingBackend, use_backend
+from mesh_cache import MeshCache
+from scenes import BenchScene
+
+CHARACTERS = ["spongebob", "shion", "monster", "krabbypatty", "boatmobile"]
+# The camera backs away from the characters along +x, looking at them
+DISTANCES = [5, 10, 20, 40, 80, 160]
+CAMERA_TARGET = glm.vec3(2, 2, 25)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Triangles drawn for the characters as the camera backs "
+        "away, with and without levels of detail, and how often the levels "
+        "switch while the camera wobbles around a threshold"
+    )
+    parser.add_argument("--wobble-frames", type=int, default=200)
+    args = parser.parse_args()
+
+    with use_backend(RecordingBackend(record=False)), tempfile.TemporaryDirectory() as (
+        directory
+    ):
+        cache = MeshCache(directory)
+        start = time.perf_counter()
+        scene = BenchScene(
+            CHARACTERS,
+            skybox=False,
+            optimize=True,
+            mesh_cache=cache,
+            lod_models=CHARACTERS,
+        )
+        print(f"Loaded and simplified in {time.perf_counter() - start:.1f}s")
+        scene.camera.yaw = 180.0
+        scene.camera._front = scene.camera.update_front()
+
+        for name in CHARACTERS:
+            model = scene.models[name]
+            levels = [model] + model.lods
+            counts = " ".join(f"{len(level.indices) // 3:6d}" for level in levels)
+            print(f"{name:>12}: {counts}")
+
+        print(f"{'distance':>8} {'full':>8} {'lod':>8} {'levels':>16}")
+        for distance in DISTANCES:
+            scene.camera.position = CAMERA_TARGET + glm.vec3(distance, 0, 0)
+            triangles = []
+            for lod in (False, True):
+                scene.renderer.lod = lod
+                scene.render_frame()
+                triangles.append(scene.renderer.stats.triangles)
+            levels = "".join(str(entity.lod) for entity in scene.entities.values())
+            print(f"{distance:8d} {triangles[0]:8d} {triangles[1]:8d} {levels:>16}")
+
+        # Sway back and forth across spongebob's first threshold
+        spongebob = scene.entities["spongebob"]
+        away = glm.normalize(CAMERA_TARGET - spongebob.position)
+        center = glm.vec3(spongebob.position)
+        scene.camera.yaw = float(glm.degrees(glm.atan(-away.z, -away.x)))
+        scene.camera._front = scene.camera.update_front()
+        scene.camera.position = center
+        while (
+            scene.renderer.screen_size(spongebob, scene.camera)
+            > renderer.LOD_SCREEN_SIZES[0]
+        ):
+            center = center + 0.05 * away
+            scene.camera.position = center
+
+        for hysteresis in (0.0, renderer.LOD_HYSTERESIS):
+            renderer.LOD_HYSTERESIS = hysteresis
+            switches = 0
+            previous = spongebob.lod
+            for frame in range(args.wobble_frames):
+                scene.camera.position = center + (0.2 if frame % 2 else -0.2) * away
+                scene.render_frame()
+                switches += spongebob.lod != previous
+                previous = spongebob.lod
+            print(
+                f"Swaying across a threshold for {args.wobble_frames} frames,"
+                f" hysteresis {hysteresis}: {switches} level switches"
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
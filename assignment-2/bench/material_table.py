@@ -0,0 +1,95 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import statistics
+import sys
+import time
+
+import harness  # noqa: F401 (sets up the import path)
+
+# (label, multi_draw, material_table)
+CONFIGURATIONS = [
+    ("per segment", False, False),
+    ("multi-draw", True, False),
+    ("table", True, True),
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Draw calls, uniform uploads and frame time of the burgerpiz "
+        "map, drawing per segment, with multi-draws and with the material table"
+    )
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument(
+        "--gpu", action="store_true", help="Render offscreen on the real driver"
+    )
+    parser.add_argument(
+        "--group-materials",
+        action="store_true",
+        help="Group the faces of each model by material when loading",
+    )
+    args = parser.parse_args()
+
+    # The offscreen context has to pick PyOpenGL's platform before anything
+    # else imports it
+    if args.gpu:
+        from gpu import GpuTimer, OffscreenContext
+
+        context = OffscreenContext()
+        print(f"Renderer: {context.renderer}")
+        timer = GpuTimer()
+
+    from gl_backend import RecordingBackend, get_backend, use_backend
+    from scenes import BenchScene
+
+    recording = RecordingBackend(record=False)
+    backend = get_backend() if args.gpu else recording
+    with use_backend(backend):
+        scene = BenchScene(
+            ["map_internal", "map_external"],
+            viewpoint="street",
+            skybox=False,
+            group_materials=args.group_materials,
+        )
+
+    for label, multi_draw, material_table in CONFIGURATIONS:
+        scene.renderer.multi_draw = multi_draw
+        scene.renderer.material_table = material_table
+        frame_times, gpu_times = [], []
+
+        with use_backend(backend):
+            scene.render_frame()
+            for _ in range(args.frames):
+                start = time.perf_counter()
+                if args.gpu:
+                    with timer:
+                        scene.render_frame()
+                    gpu_times.append(timer.gpu_time)
+                else:
+                    scene.render_frame()
+                frame_times.append(time.perf_counter() - start)
+
+        stats = scene.renderer.stats
+        line = (
+            f"{label:>11}: {stats.draw_calls:4d} draws"
+            f"  {stats.uniform_uploads:4d} uniform uploads"
+            f" ({stats.uniform_skips} skipped)"
+            f"  cpu {statistics.median(frame_times) * 1000:7.3f} ms"
+        )
+        if args.gpu:
+            line += f"  gpu {statistics.median(gpu_times) * 1000:7.3f} ms"
+        print(line)
+
+    print(f"Material table: {len(scene.packets.table.data)} rows")
+
+    if args.gpu:
+        context.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import sys
+import tempfile
+import time
+
+import harness  # noqa: F401 (sets up the import path)
+
+import numpy as np
+
+from assets import available_assets, local_relative_path
+from gl_backend import RecordingBackend, use_backend
+from material import Material
+from mesh_cache import MeshCache
+from mesh_optimizer import VERTEX_CACHE_SIZE, acmr, index_vertices
+from model import Model
+from scenes import FRAGMENT_SHADER_FILE, VERTEX_SHADER_FILE
+from shader import Shader
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Vertex counts and ACMR of every bundled model, in OBJ order "
+        "and after the mesh optimizer, with cold and warm cache load times"
+    )
+    parser.add_argument("--cache-size", type=int, default=VERTEX_CACHE_SIZE)
+    args = parser.parse_args()
+
+    print(f"Simulated FIFO vertex cache: {args.cache_size} entries")
+    print(
+        f"{'model':>16} {'triangles':>9} {'flat':>7} {'indexed':>7}"
+        f" {'ACMR obj':>8} {'ACMR opt':>8} {'cold':>8} {'warm':>8}"
+    )
+
+    with use_backend(RecordingBackend(record=False)), tempfile.TemporaryDirectory() as (
+        directory
+    ):
+        shader = Shader.load_from_files(VERTEX_SHADER_FILE, FRAGMENT_SHADER_FILE)
+        for name, asset in available_assets().items():
+            materials = Material.load_mtllib(
+                shader, local_relative_path(asset.mtl_file), asset.prefix
+            )
+            path = local_relative_path(asset.obj_file)
+
+            flat = Model.load_obj(path, materials, asset.prefix, name)[name]
+            segments = np.repeat(
+                np.arange(len(flat.segments)),
+                [count for _, count, _ in flat.segments],
+            )
+            _, obj_indices = index_vertices(
+                flat.vertices, flat.texture_coords, flat.normals, segments
+            )
+
+            timings = []
+            for _ in ("cold", "warm"):
+                start = time.perf_counter()
+                model = Model(
+                    flat.vertices,
+                    flat.texture_coords,
+                    flat.normals,
+                    flat.materials,
+                    flat.material_swaps,
+                )
+                model.optimize(MeshCache(directory), args.cache_size)
+                timings.append(time.perf_counter() - start)
+
+            print(
+                f"{name:>16} {len(flat.indices) // 3:9d} {len(flat.vertices):7d}"
+                f" {len(model.vertices):7d}"
+                f" {acmr(obj_indices, args.cache_size):8.3f}"
+                f" {acmr(model.indices, args.cache_size):8.3f}"
+                f" {timings[0] * 1000:6.0f}ms {timings[1] * 1000:6.1f}ms"
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import statistics
+import sys
+import time
+
+import harness  # noqa: F401 (sets up the import path)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Draw calls and frame time of the burgerpiz map, with and "
+        "without merging segments into multi-draws"
+    )
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument(
+        "--gpu", action="store_true", help="Render offscreen on the real driver"
+    )
+    parser.add_argument(
+        "--group-materials",
+        action="store_true",
+        help="Group the faces of each model by material when loading",
+    )
+    args = parser.parse_args()
+
+    # The offscreen context has to pick PyOpenGL's platform before anything
+    # else imports it
+    if args.gpu:
+        from gpu import GpuTimer, OffscreenContext
+
+        context = OffscreenContext()
+        print(f"Renderer: {context.renderer}")
+        timer = GpuTimer()
+
+    from gl_backend import RecordingBackend, get_backend, use_backend
+    from scenes import BenchScene
+
+    recording = RecordingBackend(record=False)
+    backend = get_backend() if args.gpu else recording
+    with use_backend(backend):
+        scene = BenchScene(
+            ["map_internal", "map_external"],
+            viewpoint="street",
+            skybox=False,
+            group_materials=args.group_materials,
+            # Materials as uniforms, so only whole-material runs merge
+            material_table=False,
+        )
+
+    for multi_draw in (False, True):
+        scene.renderer.multi_draw = multi_draw
+        frame_times, gpu_times = [], []
+
+        with use_backend(backend):
+            scene.render_frame()
+            recording.reset()
+            for _ in range(args.frames):
+                start = time.perf_counter()
+                if args.gpu:
+                    with timer:
+                        scene.render_frame()
+                    gpu_times.append(timer.gpu_time)
+                else:
+                    scene.render_frame()
+                frame_times.append(time.perf_counter() - start)
+
+        stats = scene.renderer.stats
+        line = (
+            f"{'multi-draw' if multi_draw else 'per segment':>11}:"
+            f" {stats.draw_calls:4d} draws ({len(scene.packets.packets)} segments)"
+            f"  cpu {statistics.median(frame_times) * 1000:7.3f} ms"
+        )
+        if args.gpu:
+            line += f"  gpu {statistics.median(gpu_times) * 1000:7.3f} ms"
+        else:
+            multi_draws = recording.count("glMultiDrawElements") // args.frames
+            line += f"  ({multi_draws} of them glMultiDrawElements)"
+        print(line)
+
+    if args.gpu:
+        context.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
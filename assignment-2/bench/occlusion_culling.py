@@ -0,0 +1,67 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import statistics
+import sys
+import time
+
+import harness  # noqa: F401 (sets up the import path)
+
+from gl_backend import RecordingBackend, use_backend
+from scenes import VIEWPOINTS, BenchScene
+
+OCCLUDERS = ["map_internal"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Entities and triangles the CPU occlusion culling skips as "
+        "the camera turns around each viewpoint, and what it costs per frame"
+    )
+    parser.add_argument("--yaw-step", type=int, default=30)
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+
+    with use_backend(RecordingBackend(record=False)):
+        for viewpoint in VIEWPOINTS:
+            scene = BenchScene(viewpoint=viewpoint, optimize=True, occluders=OCCLUDERS)
+            renderer = scene.renderer
+            culler = renderer.occlusion
+            occluder_triangles = sum(len(o.triangles) for o in culler.occluders)
+            print(f"{viewpoint} ({occluder_triangles} occluder triangles):")
+            print(f"{'yaw':>5} {'occluded':>8} {'triangles':>18} {'cpu':>9}  hidden")
+
+            for yaw in range(0, 360, args.yaw_step):
+                scene.camera.yaw = float(yaw)
+                scene.camera._front = scene.camera.update_front()
+
+                triangles = []
+                for occlusion in (None, culler):
+                    renderer.occlusion = occlusion
+                    scene.render_frame()
+                    triangles.append(renderer.stats.triangles)
+
+                times = []
+                for _ in range(args.frames):
+                    start = time.perf_counter()
+                    renderer.update_occlusion(scene.packets.entities, scene.camera)
+                    times.append(time.perf_counter() - start)
+
+                hidden = [
+                    name
+                    for name, entity in scene.entities.items()
+                    if id(entity) in renderer._occluded
+                ]
+                print(
+                    f"{yaw:5d} {len(hidden):8d} {triangles[0]:8d} -> {triangles[1]:6d}"
+                    f" {statistics.median(times) * 1000:7.2f}ms  {', '.join(hidden)}"
+                )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
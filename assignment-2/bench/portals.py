@@ -0,0 +1,61 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import statistics
+import sys
+import time
+
+import harness  # noqa: F401 (sets up the import path)
+
+from gl_backend import RecordingBackend, use_backend
+from scenes import VIEWPOINTS, BenchScene
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Cells seen through the portals, and the entities and "
+        "triangles skipped with them, as the camera turns around each viewpoint"
+    )
+    parser.add_argument("--yaw-step", type=int, default=30)
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+
+    with use_backend(RecordingBackend(record=False)):
+        for viewpoint in VIEWPOINTS:
+            scene = BenchScene(viewpoint=viewpoint, optimize=True, cells=True)
+            renderer = scene.renderer
+            graph = renderer.cells
+            print(f"{viewpoint} (camera in {graph.locate(scene.camera.position)}):")
+            print(f"{'yaw':>5} {'skipped':>7} {'triangles':>18} {'cpu':>9}  cells")
+
+            for yaw in range(0, 360, args.yaw_step):
+                scene.camera.yaw = float(yaw)
+                scene.camera._front = scene.camera.update_front()
+
+                triangles = []
+                for cells in (None, graph):
+                    renderer.cells = cells
+                    scene.render_frame()
+                    triangles.append(renderer.stats.triangles)
+
+                times = []
+                for _ in range(args.frames):
+                    start = time.perf_counter()
+                    renderer.update_cells(scene.packets.entities, scene.camera)
+                    times.append(time.perf_counter() - start)
+
+                print(
+                    f"{yaw:5d} {renderer.stats.cell_culled_entities:7d}"
+                    f" {triangles[0]:8d} -> {triangles[1]:6d}"
+                    f" {statistics.median(times) * 1000:7.3f}ms"
+                    f"  {', '.join(sorted(graph.visible))}"
+                )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
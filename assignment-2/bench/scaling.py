@@ -0,0 +1,167 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import csv
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+import harness  # noqa: F401 (sets up the import path)
+
+import glm
+
+from assets import load_assets
+from camera import Camera
+from gl_backend import RecordingBackend, use_backend
+from material import Material
+from model import Buffers
+from renderer import Renderer
+from scene_generator import generate_scene
+from scenes import FRAGMENT_SHADER_FILE, VERTEX_SHADER_FILE
+from shader import Shader
+
+DEFAULTS: Dict[str, Any] = {
+    "entity_count": 100,
+    "light_count": 4,
+    "material_variants": 1,
+    "static_fraction": 0.8,
+    "glowing_count": 0,
+}
+
+# Values each parameter is swept over, the others are kept at their defaults
+SWEEPS: Dict[str, List[Any]] = {
+    "entity_count": [10, 100, 1000, 5000],
+    "light_count": [1, 4, 16, 64],
+    "material_variants": [1, 4, 16, 64],
+    "static_fraction": [0.0, 0.5, 1.0],
+    "glowing_count": [0, 1, 2, 4],
+}
+
+FIELDS = [
+    "parameter",
+    "value",
+    "load_ms",
+    "frame_ms",
+    "update_ms",
+    "draw_calls",
+    "uniform_uploads",
+    "uniform_skips",
+]
+
+
+def measure_config(
+    backend: RecordingBackend,
+    shader: Shader,
+    models: Dict[str, Any],
+    frames: int,
+    load_textures: bool,
+    **params: Any,
+) -> Dict[str, float]:
+    """Builds one scene and times its loading and steady-state frames"""
+    with use_backend(backend):
+        start = time.perf_counter()
+        scene = generate_scene(models, **params)
+        Buffers.setup_buffers(scene.models).bind(shader)
+        if load_textures:
+            Material.setup_all(scene.materials.values())
+        load_time = time.perf_counter() - start
+
+        renderer = Renderer()
+        camera = Camera(position=glm.vec3(0.0, 5.0, 0.0))
+        dt = 1.0 / 60.0
+
+        frame_times = []
+        update_times = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            scene.update(dt, camera)
+            updated = time.perf_counter()
+            renderer.pre_render()
+            renderer.draw_entities(scene.entities, camera)
+            end = time.perf_counter()
+            update_times.append(updated - start)
+            frame_times.append(end - start)
+
+    return {
+        "load_ms": load_time * 1000,
+        "frame_ms": statistics.median(frame_times) * 1000,
+        "update_ms": statistics.median(update_times) * 1000,
+        "draw_calls": renderer.stats.draw_calls,
+        "uniform_uploads": renderer.stats.uniform_uploads,
+        "uniform_skips": renderer.stats.uniform_skips,
+    }
+
+
+def plot(rows: List[Dict[str, Any]], path: str) -> None:
+    """Charts load and frame time against each parameter (needs matplotlib)"""
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, len(SWEEPS), figsize=(4 * len(SWEEPS), 4))
+    for ax, parameter in zip(axes, SWEEPS):
+        sweep = [row for row in rows if row["parameter"] == parameter]
+        values = [row["value"] for row in sweep]
+        ax.plot(values, [row["frame_ms"] for row in sweep], "o-", label="frame")
+        ax.plot(values, [row["load_ms"] for row in sweep], "s--", label="load")
+        ax.set_xlabel(parameter)
+        ax.set_ylabel("ms")
+        ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Charts frame and load time against synthetic scene parameters"
+    )
+    parser.add_argument("--models", nargs="+", default=["god", "monster", "boatmobile"])
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--textures", action="store_true", help="Decode textures")
+    parser.add_argument("-k", "--parameter", choices=list(SWEEPS), action="append")
+    parser.add_argument("-o", "--output", help="Write the CSV to a file")
+    parser.add_argument("--plot", help="Save a chart (requires matplotlib)")
+    args = parser.parse_args()
+
+    backend = RecordingBackend(record=False)
+    with use_backend(backend):
+        shader = Shader.load_from_files(VERTEX_SHADER_FILE, FRAGMENT_SHADER_FILE)
+        _, models = load_assets(shader, args.models)
+
+    rows = []
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.DictWriter(out, FIELDS)
+    writer.writeheader()
+    for parameter, values in SWEEPS.items():
+        if args.parameter and parameter not in args.parameter:
+            continue
+        for value in values:
+            params = {**DEFAULTS, parameter: value}
+            params["glowing_count"] = min(
+                params["glowing_count"], params["light_count"]
+            )
+            row = {
+                "parameter": parameter,
+                "value": value,
+                **measure_config(
+                    backend, shader, models, args.frames, args.textures, **params
+                ),
+            }
+            rows.append(row)
+            writer.writerow(
+                {k: f"{v:.3f}" if isinstance(v, float) else v for k, v in row.items()}
+            )
+            out.flush()
+
+    if args.output:
+        out.close()
+    if args.plot:
+        plot(rows, args.plot)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import harness  # noqa: F401 (sets up the import path)
+
+import glm
+import numpy as np
+
+from assets import available_assets, load_assets, local_relative_path
+from camera import Camera
+from draw_packets import DrawPackets
+from entity import Entity, EntityStore
+from light_source import LightSource
+from mesh_cache import MeshCache
+from material import Material
+from model import Buffers, Model
+from occlusion import OcclusionCuller, Occluder
+from cells import CellGraph
+from light_baker import LightBaker
+from renderer import Renderer
+from shader import Shader
+from skybox import Skybox
+
+VERTEX_SHADER_FILE = local_relative_path("../shaders/phong.vert")
+FRAGMENT_SHADER_FILE = local_relative_path("../shaders/phong.frag")
+SKYBOX_VERTEX_SHADER_FILE = local_relative_path("../shaders/skybox.vert")
+SKYBOX_FRAGMENT_SHADER_FILE = local_relative_path("../shaders/skybox.frag")
+SKYBOX_TEXTURE_FILE = local_relative_path("../textures/skybox.jpg")
+DEPTH_VERTEX_SHADER_FILE = local_relative_path("../shaders/depth.vert")
+DEPTH_FRAGMENT_SHADER_FILE = local_relative_path("../shaders/depth.frag")
+CELLS_FILE = local_relative_path("../models/burgerpiz/cells.json")
+
+# Entities of main.py's scene: model, position, scale, yaw and light
+PLACEMENTS = {
+    "map_internal": ("burgerpiz_inner", (0, -0.02, 0), 1.0, 0.0, "internal"),
+    "map_external": ("burgerpiz_outer", (0, -0.02, 0), 1.0, 0.0, "external"),
+    "monster": ("monster", (-1.5, 0, 7.6), 0.5, 0.0, "internal"),
+    "boatmobile": ("boatmobile", (2, 0.4, 50), 1.0, -90.0, "external"),
+    "krabbypatty": ("krabbypatty", (1.5, 6.8, 23), 1.2, 0.0, "external"),
+    "shion": ("shion", (2.5, 1.35, 11), 0.1, -90.0, "internal"),
+    "spongebob": ("spongebob", (2, 1, 4.94), 1.66, 90.0, "internal"),
+    "squidward_house": ("squidward_house", (-11, 0, 43), 1.8, 0.0, "external"),
+    "okuufumo": ("okuu_fumo", (3.5, 0.85, 15), 1.0, 0.0, "internal"),
+}
+
+# Camera positions and yaws used by the benchmarks
+VIEWPOINTS = {
+    # main.py's starting point, looking at the restaurant
+    "street": ((12, 1.5, 55), 245.0),
+    # Inside the restaurant, looking at the counter
+    "interior": ((3.5, 1.5, 16), 265.0),
+}
+
+
+class BenchScene:
+    """main.py's scene (static), built on whatever GL backend is active"""
+
+    shader: Shader
+    renderer: Renderer
+    camera: Camera
+    materials: Dict[str, Material]
+    models: Dict[str, Model]
+    entities: Dict[str, Entity]
+    # Holds the state of the scene's entities
+    store: EntityStore
+    lights: Dict[str, LightSource]
+    buffers: Buffers
+    packets: DrawPackets
+    skybox: Optional[Skybox]
+    baker: LightBaker
+
+    def __init__(
+        self,
+        names: List[str] = list(PLACEMENTS),
+        viewpoint: str = "interior",
+        skybox: bool = True,
+        aspect_ratio: float = 16 / 9,
+        group_materials: bool = False,
+        optimize: bool = False,
+        mesh_cache: Optional[MeshCache] = None,
+        lod_models: Iterable[str] = (),
+        depth_prepass: Optional[bool] = False,
+        occluders: Iterable[str] = (),
+        cells: bool = False,
+        bake: bool = False,
+        **renderer_args: Any,
+    ) -> None:
+        available = available_assets()
+        placements = {
+            name: placement
+            for name, placement in PLACEMENTS.items()
+            if name in names and placement[0] in available
+        }
+        model_names = {placement[0] for placement in placements.values()}
+
+        self.shader = Shader.load_from_files(VERTEX_SHADER_FILE, FRAGMENT_SHADER_FILE)
+        self.materials, self.models = load_assets(
+            self.shader, sorted(model_names), group_materials, optimize, mesh_cache
+        )
+        for name in lod_models:
+            if name in self.models:
+                self.models[name].build_lods(cache=mesh_cache, optimize=optimize)
+        # Some textures aren't bundled with the repository, draw those untextured
+        for material in self.materials.values():
+            if material.texture_path and not os.path.isfile(material.texture_path):
+                material.texture_path = None
+
+        self.lights = {
+            "internal": LightSource(
+                position=np.array([3.5, 1.85, 15.0]),
+                color=np.array([0.6, 0.6, 1.0]),
+                decay_coefs=np.array([1.0, 0.01, 0.01]),
+                static=True,
+            ),
+            "external": LightSource(
+                position=np.array([12.0, 16.0, 5.0]),
+                color=np.array([1.0, 1.0, 0.7]),
+                decay_coefs=np.array([1.0, 0.01, 0]),
+            ),
+        }
+
+        self.store = EntityStore()
+        self.entities = {}
+        for name, (model, position, scale, yaw, light) in placements.items():
+            self.entities[name] = Entity(
+                self.models[model],
+                self.store,
+                position=glm.vec3(*position),
+                scale=glm.vec3(scale),
+                angle_y=yaw,
+                light_sources=[self.lights[light]],
+                static=name.startswith("map_"),
+            )
+        Material.setup_all(self.materials.values())
+
+        position, yaw = VIEWPOINTS[viewpoint]
+        self.camera = Camera(
+            position=glm.vec3(*position), yaw=yaw, aspect_ratio=aspect_ratio
+        )
+        # Off unless asked for, so the other benchmarks keep drawing the same
+        self.renderer = Renderer(
+            ambient_color=np.array([1.0, 1.0, 1.0, 1.0], dtype=np.float32),
+            ambient_intensity=0.1,
+            depth_shader=Shader.load_from_files(
+                DEPTH_VERTEX_SHADER_FILE, DEPTH_FRAGMENT_SHADER_FILE
+            ),
+            depth_prepass=depth_prepass,
+            **renderer_args,
+        )
+        self.renderer.init()
+        # Occluders keep the triangles from before baking subdivides them
+        occluders = [name for name in occluders if name in self.entities]
+        if occluders:
+            self.renderer.occlusion = OcclusionCuller(
+                [Occluder.from_entity(self.entities[name]) for name in occluders]
+            )
+        self.baker = LightBaker(
+            self.entities.values(), self.renderer._model_matrix, mesh_cache
+        )
+        if bake:
+            self.baker.prepare(optimize)
+
+        self.buffers = Buffers.setup_buffers(self.models.values())
+        self.buffers.bind(self.shader)
+        self.packets = DrawPackets(list(self.entities.values()))
+        if cells:
+            self.renderer.cells = CellGraph.load(CELLS_FILE)
+            self.renderer.cells.pin(self.entities)
+
+        self.skybox = None
+        if skybox:
+            self.skybox = Skybox.load_from_files(
+                SKYBOX_VERTEX_SHADER_FILE,
+                SKYBOX_FRAGMENT_SHADER_FILE,
+                SKYBOX_TEXTURE_FILE,
+            )
+
+    def render_frame(self) -> None:
+        self.renderer.pre_render()
+        self.renderer.draw_packets(self.packets, self.camera, self.skybox)
@@ -0,0 +1,93 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from gpu import OffscreenContext
+
+from light_source import MAX_LIGHTS
+from material import LIGHT_BUCKETS
+from program_cache import ProgramCache
+from scenes import FRAGMENT_SHADER_FILE, VERTEX_SHADER_FILE
+from shader import Shader
+
+
+def permutations() -> List[Dict[str, Any]]:
+    """Every variant `Material.select_shader` can ask for"""
+    variants: List[Dict[str, Any]] = []
+    for textured, alpha_test in itertools.product((0, 1), (0, 1)):
+        variants.append(
+            dict(LIGHTING="UNLIT", TEXTURED=textured, ALPHA_TEST=alpha_test)
+        )
+        for lights in LIGHT_BUCKETS:
+            variants.append(
+                dict(
+                    LIGHTING="LIT",
+                    TEXTURED=textured,
+                    ALPHA_TEST=alpha_test,
+                    MAX_LIGHTS=lights,
+                )
+            )
+    return variants
+
+
+def build_all(cache: Optional[ProgramCache], nonce: str) -> float:
+    """Time to build the generic program and all of its variants"""
+    with open(VERTEX_SHADER_FILE, "r") as f:
+        vertex_source = f.read()
+    with open(FRAGMENT_SHADER_FILE, "r") as f:
+        fragment_source = f.read()
+
+    # Drivers keep their own shader caches (Mesa's is on disk), an unused
+    # define makes the sources new to them
+    start = time.perf_counter()
+    shader = Shader.compile(vertex_source, fragment_source, {"NONCE": nonce}, cache)
+    for defines in permutations():
+        shader.variant(**defines)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Times building every phong variant with and without the cache"
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    context = OffscreenContext(64, 64)
+    print(f"Renderer: {context.renderer}")
+    print(f"Programs: {len(permutations()) + 1} (max {MAX_LIGHTS} lights)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(args.runs):
+            uncached = build_all(None, uuid.uuid4().hex)
+
+            # A fresh directory per run, so the first build is always cold
+            nonce = uuid.uuid4().hex
+            run_directory = os.path.join(directory, str(run))
+            cold_cache = ProgramCache(run_directory)
+            cold = build_all(cold_cache, nonce)
+            warm_cache = ProgramCache(run_directory)
+            warm = build_all(warm_cache, nonce)
+
+            print(
+                f"run {run}: no cache {uncached * 1000:8.2f} ms"
+                f"  cold {cold * 1000:8.2f} ms ({cold_cache.misses} misses)"
+                f"  warm {warm * 1000:8.2f} ms ({warm_cache.hits} hits)"
+            )
+
+    context.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
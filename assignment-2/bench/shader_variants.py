@@ -0,0 +1,59 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import argparse
+import statistics
+import sys
+
+from gpu import GpuTimer, OffscreenContext
+
+from gl_backend import gl
+from scenes import VIEWPOINTS, BenchScene
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compares the generic phong program against its variants"
+    )
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--viewpoint", choices=list(VIEWPOINTS), default="interior")
+    args = parser.parse_args()
+
+    context = OffscreenContext(args.width, args.height)
+    print(f"Renderer: {context.renderer}, {args.width}x{args.height}")
+
+    scene = BenchScene(viewpoint=args.viewpoint, aspect_ratio=args.width / args.height)
+    timer = GpuTimer()
+
+    for shader_variants in (False, True):
+        scene.renderer.shader_variants = shader_variants
+        # Warm-up, compiles the variants the materials need
+        scene.render_frame()
+
+        gpu_times, wall_times = [], []
+        for _ in range(args.frames):
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
+            with timer:
+                scene.render_frame()
+            gpu_times.append(timer.gpu_time)
+            wall_times.append(timer.wall_time)
+
+        label = "variants" if shader_variants else "generic"
+        stats = scene.renderer.stats
+        print(
+            f"{label:>8}: gpu {statistics.median(gpu_times) * 1000:8.3f} ms"
+            f"  wall {statistics.median(wall_times) * 1000:8.3f} ms"
+            f"  ({stats.draw_calls} draws, {stats.program_switches} programs)"
+        )
+
+    print(f"Compiled variants: {len(scene.shader._variants)}")
+    context.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+// vi: filetype=glsl
+#version 410 core
+
+// Only depth is written, the color mask is off during the pre-pass
+void main() {
+}
@@ -0,0 +1,18 @@
+// vi: filetype=glsl
+#version 410 core
+
+// Same location as in phong.vert, so the models' vertex arrays work as is
+layout(location = 0) in vec3 position;
+
+uniform mat4 model;
+uniform mat4 view;
+uniform mat4 projection;
+
+// Computed exactly like in phong.vert, the color pass tests depths for
+// equality against the ones written here
+invariant gl_Position;
+
+void main() {
+    vec4 worldPosition = model * vec4(position, 1.0);
+    gl_Position = projection * view * worldPosition;
+}
@@ -0,0 +1,17 @@
+// vi: filetype=glsl
+#version 410 core
+
+in vec2 out_texture;
+
+uniform sampler2D samplerTexture;
+uniform vec4 u_color;
+
+out vec4 fragColor;
+
+void main() {
+  vec4 texel = texture(samplerTexture, out_texture) * u_color;
+
+  if (texel.a < 0.5) discard;
+
+  fragColor = texel;
+}
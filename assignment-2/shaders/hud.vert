@@ -0,0 +1,16 @@
+// vi: filetype=glsl
+#version 410 core
+
+// position in pixels, from the top-left corner
+in vec2 position;
+in vec2 texture_coord;
+
+out vec2 out_texture;
+
+uniform vec2 u_viewport;
+
+void main() {
+    vec2 ndc = position / u_viewport * 2.0 - 1.0;
+    gl_Position = vec4(ndc.x, -ndc.y, 0.0, 1.0);
+    out_texture = texture_coord;
+}
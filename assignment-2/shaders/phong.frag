@@ -1,6 +1,40 @@
 // vi: filetype=glsl
 #version 410 core
 
+// Variant switches, injected by Shader.variant. The defaults build the
+// generic program, that handles every material at runtime.
+#define UNLIT 0
+#define LIT 1
+#define RUNTIME 2
+
+// Lighting model: UNLIT, LIT or RUNTIME (chosen by u_ignoreLighting)
+#ifndef LIGHTING
+#define LIGHTING RUNTIME
+#endif
+// Whether the material samples a texture
+#ifndef TEXTURED
+#define TEXTURED 1
+#endif
+// Whether fragments may be discarded for their alpha. Opaque variants
+// never discard, which keeps early depth rejection enabled
+#ifndef ALPHA_TEST
+#define ALPHA_TEST 1
+#endif
+// Whether the material comes from the material table instead of uniforms,
+// so segments with different materials can share a draw call
+#ifndef MATERIAL_TABLE
+#define MATERIAL_TABLE 0
+#endif
+// Whether the static lights come baked in the vertices (only with LIT): the
+// light arrays then only hold the others
+#ifndef BAKED_LIGHTING
+#define BAKED_LIGHTING 0
+#endif
+// Size of the light arrays (and bound of the lighting loop)
+#ifndef MAX_LIGHTS
+#define MAX_LIGHTS 4
+#endif
+
 // camera position
 uniform vec3 u_viewPos;
 
@@ -8,7 +42,6 @@ uniform vec3 u_viewPos;
 uniform vec3 u_ambientColor;
 uniform float u_ambientIntensity;
 
-#define MAX_LIGHTS 4
 uniform int u_lightCount;
 uniform vec3 u_lightPos[MAX_LIGHTS];
 uniform vec3 u_lightColors[MAX_LIGHTS];
@@ -16,47 +49,95 @@ uniform vec3 u_lightDecay[MAX_LIGHTS];
 uniform float u_lightIntensity_d[MAX_LIGHTS];
 uniform float u_lightIntensity_s[MAX_LIGHTS];
 
+#if MATERIAL_TABLE
+// Three texels per material: (ka, ns), (kd, d) and (ks, unused)
+uniform samplerBuffer u_materials;
+// Row of the model's first segment
+uniform int u_materialBase;
+flat in uint out_material;
+#else
 // lighting parameters
 uniform vec3 u_kd;
 uniform vec3 u_ks;
 uniform vec3 u_ka;
 uniform float u_ns;
 uniform float u_d;
+#endif
 
+#if LIGHTING == RUNTIME
 // lighting toggle
 uniform bool u_ignoreLighting;
+#endif
 
 
 // vertex data
 in vec2 out_texture;
 in vec3 out_normal;
 in vec3 out_fragPos;
-
+#if BAKED_LIGHTING
+// Diffuse lighting without the material, the lights' direction weighted by
+// their brightness, and the attenuated color of their highlights
+in vec3 out_bakedDiffuse;
+in vec3 out_bakedDirection;
+in vec3 out_bakedSpecular;
+#endif
+
+#if TEXTURED
 // material properties
 uniform sampler2D samplerTexture;
+#endif
 
 // output color
 out vec4 fragColor;
 
 void main() {
+#if MATERIAL_TABLE
+  int row = (u_materialBase + int(out_material)) * 3;
+  vec4 material_a = texelFetch(u_materials, row);
+  vec4 material_d = texelFetch(u_materials, row + 1);
+  vec4 material_s = texelFetch(u_materials, row + 2);
+  vec3 m_ka = material_a.rgb;
+  float m_ns = material_a.a;
+  vec3 m_kd = material_d.rgb;
+  float m_d = material_d.a;
+  vec3 m_ks = material_s.rgb;
+#else
+  vec3 m_ka = u_ka;
+  float m_ns = u_ns;
+  vec3 m_kd = u_kd;
+  float m_d = u_d;
+  vec3 m_ks = u_ks;
+#endif
+
+#if TEXTURED
   // Try load texture. If there is not a texture, it will be vec4(0.0, 0.0, 0.0, 1.0)
-  vec4 composed_kd = texture(samplerTexture, out_texture) + vec4(u_kd, 0.0);
-
-  if (u_ka.x > 2.0) discard; // deleteme
+  vec4 composed_kd = texture(samplerTexture, out_texture) + vec4(m_kd, 0.0);
+#else
+  vec4 composed_kd = vec4(m_kd, 1.0);
+#endif
 
   // Material properties
   vec3 kd = vec3(composed_kd.x, composed_kd.y, composed_kd.z);
   vec3 ka = kd; // todo: add ka as texture too
-  vec3 ks = u_ks; // todo: add ks as texture too
-  float d = min(composed_kd.a, u_d);
+  vec3 ks = m_ks; // todo: add ks as texture too
+  float d = min(composed_kd.a, m_d);
+
+#if ALPHA_TEST
+  if (m_ka.x > 2.0) discard; // deleteme
 
   // Handle alpha depth issues
   if (d < 0.5) discard;
+#endif
 
+#if LIGHTING == UNLIT
+  fragColor = vec4(kd, d);
+#else
+#if LIGHTING == RUNTIME
   if (u_ignoreLighting) {
     fragColor = vec4(kd, d);
     return;
   }
+#endif
 
   // Fragment normal
   vec3 normal = normalize(out_normal);
@@ -68,7 +149,9 @@ void main() {
 
   vec3 result = vec3(0.0);
 
-  for (int i = 0; i < u_lightCount; i++) {
+  for (int i = 0; i < MAX_LIGHTS; i++) {
+    if (i >= u_lightCount) break;
+
     // Compute light direction, from fragment
     vec3 lightDir = normalize(u_lightPos[i] - out_fragPos);
 
@@ -83,11 +166,21 @@ void main() {
 
     // Specular light
     vec3 reflectDir = reflect(-lightDir, normal); // Half vector
-    float spec = pow(max(dot(viewDir, reflectDir), 0.0), u_ns);
+    float spec = pow(max(dot(viewDir, reflectDir), 0.0), m_ns);
     vec3 specular = ks * spec * u_lightColors[i] * u_lightIntensity_s[i];
 
     result += (diffuse + specular) * attenuation;
   }
 
+#if BAKED_LIGHTING
+  result += kd * out_bakedDiffuse;
+  if (dot(out_bakedDirection, out_bakedDirection) > 0.0) {
+    vec3 reflectDir = reflect(-normalize(out_bakedDirection), normal);
+    float spec = pow(max(dot(viewDir, reflectDir), 0.0), m_ns);
+    result += ks * spec * out_bakedSpecular;
+  }
+#endif
+
   fragColor = vec4(ambient + result * (1.0 - u_ambientIntensity), d);
+#endif
 }
@@ -1,22 +1,51 @@
 // vi: filetype=glsl
 #version 410 core
 
-in vec3 position;
-in vec2 texture_coord;
-in vec3 normal; // Add this input for normal data
+// Whether the static lights come baked in the vertices, see phong.frag
+#ifndef BAKED_LIGHTING
+#define BAKED_LIGHTING 0
+#endif
+
+// Fixed locations, so every shader variant works with the same vertex array
+layout(location = 0) in vec3 position;
+layout(location = 1) in vec2 texture_coord;
+layout(location = 2) in vec3 normal; // Add this input for normal data
+// Segment of the model the vertex belongs to (its row of the material table)
+layout(location = 3) in uint material_index;
+#if BAKED_LIGHTING
+// Static lighting of the vertex, see light_baker.py
+layout(location = 4) in vec3 baked_diffuse;
+layout(location = 5) in vec3 baked_direction;
+layout(location = 6) in vec3 baked_specular;
+#endif
 
 out vec2 out_texture; // Changed from tex_coord to out_texture to match the fragment shader
 out vec3 out_normal; // Output the normal to the fragment shader
 out vec3 out_fragPos; // Output the fragment position to the fragment shader
+flat out uint out_material;
+#if BAKED_LIGHTING
+out vec3 out_bakedDiffuse;
+out vec3 out_bakedDirection;
+out vec3 out_bakedSpecular;
+#endif
 
 uniform mat4 model;
 uniform mat4 view;
 uniform mat4 projection;
 
+// Matches the depth pre-pass (depth.vert) exactly, see its comment
+invariant gl_Position;
+
 void main() {
     vec4 worldPosition = model * vec4(position, 1.0); // Transform vertex to world coordinates
     gl_Position = projection * view * worldPosition; // Compute final position
     out_texture = texture_coord;
     out_normal = mat3(transpose(inverse(model))) * normal; // Correctly transform normals
     out_fragPos = vec3(worldPosition); // Pass world position to fragment shader
+    out_material = material_index;
+#if BAKED_LIGHTING
+    out_bakedDiffuse = baked_diffuse;
+    out_bakedDirection = baked_direction;
+    out_bakedSpecular = baked_specular;
+#endif
 }
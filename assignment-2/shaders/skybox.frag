@@ -0,0 +1,12 @@
+// vi: filetype=glsl
+#version 410 core
+
+in vec3 out_direction;
+
+uniform samplerCube u_sky;
+
+out vec4 fragColor;
+
+void main() {
+  fragColor = vec4(texture(u_sky, out_direction).rgb, 1.0);
+}
@@ -0,0 +1,19 @@
+// vi: filetype=glsl
+#version 410 core
+
+// Corner of the unit cube around the camera
+layout(location = 0) in vec3 position;
+
+out vec3 out_direction;
+
+// View without the translation, the sky never gets closer
+uniform mat4 view;
+uniform mat4 projection;
+
+void main() {
+    out_direction = position;
+    vec4 clip = projection * view * vec4(position, 1.0);
+    // Depth 1.0, so the sky is behind everything and covered pixels fail the
+    // depth test before shading
+    gl_Position = clip.xyww;
+}
@@ -0,0 +1,107 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import os
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from material import Material
+from mesh_cache import MeshCache
+from model import Model
+from shader import Shader
+
+
+def local_relative_path(path: str) -> str:
+    return os.path.join(os.path.dirname(__file__), path)
+
+
+class Asset(NamedTuple):
+    obj_file: str
+    mtl_file: str
+    prefix: str
+
+
+# Models bundled with the assignment, keyed by the name used in the scene
+BUNDLED_ASSETS: Dict[str, Asset] = {
+    "god": Asset("../models/12lados.obj", "../models/12lados.mtl", "god"),
+    "monster": Asset("../models/monstro.obj", "../models/monstro.mtl", "monster-"),
+    "burgerpiz_inner": Asset(
+        "../models/burgerpiz/inner.obj",
+        "../models/burgerpiz/inner.mtl",
+        "burgerpiz-inner-",
+    ),
+    "burgerpiz_outer": Asset(
+        "../models/burgerpiz/outer.obj",
+        "../models/burgerpiz/burgerpiz.mtl",
+        "burgerpiz-",
+    ),
+    "okuu_fumo": Asset(
+        "../models/okuu_fumo.obj", "../models/okuu_fumo.mtl", "okuufumo-"
+    ),
+    "boatmobile": Asset(
+        "../models/boatmobile.obj", "../models/boatmobile.mtl", "boatmobile-"
+    ),
+    "krabbypatty": Asset(
+        "../models/krabbypatty.obj", "../models/krabbypatty.mtl", "krabbypatty-"
+    ),
+    "shion": Asset("../models/shion.obj", "../models/shion.mtl", "shion-"),
+    "spongebob": Asset(
+        "../models/spongebob.obj", "../models/spongebob.mtl", "spongebob-"
+    ),
+    "squidward_house": Asset(
+        "../models/squidward_house.obj",
+        "../models/squidward_house.mtl",
+        "squidhouse-",
+    ),
+}
+
+
+def available_assets() -> Dict[str, Asset]:
+    """The bundled assets whose files are present on disk"""
+    return {
+        name: asset
+        for name, asset in BUNDLED_ASSETS.items()
+        if os.path.isfile(local_relative_path(asset.obj_file))
+        and os.path.isfile(local_relative_path(asset.mtl_file))
+    }
+
+
+def load_assets(
+    shader: Shader,
+    names: Optional[Iterable[str]] = None,
+    group_materials: bool = False,
+    optimize: bool = False,
+    mesh_cache: Optional[MeshCache] = None,
+) -> Tuple[Dict[str, Material], Dict[str, Model]]:
+    """
+    Loads the materials and models of the given bundled assets, optionally
+    grouping their faces by material and optimizing them (see
+    `Model.load_obj`)
+    """
+    assets = available_assets()
+    if names is None:
+        names = assets.keys()
+
+    materials: Dict[str, Material] = {}
+    models: Dict[str, Model] = {}
+    for name in names:
+        asset = assets[name]
+        materials.update(
+            Material.load_mtllib(
+                shader, local_relative_path(asset.mtl_file), asset.prefix
+            )
+        )
+        models.update(
+            Model.load_obj(
+                local_relative_path(asset.obj_file),
+                materials,
+                asset.prefix,
+                name,
+                group_materials=group_materials,
+                optimize=optimize,
+                mesh_cache=mesh_cache,
+            )
+        )
+
+    return materials, models
@@ -53,7 +53,8 @@ class Camera:
         up=glm.vec3(0.0, 1.0, 0.0),
         aspect_ratio=1.0,
         near=0.1,
-        far=5100.0,
+        # Spans the whole map, the sky is drawn without depth
+        far=600.0,
         sensitivity_x=0.05,
         sensitivity_y=0.05,
         move_xyz=True,
@@ -130,6 +131,9 @@ class Camera:
                 self.base_fov,
                 self.running_fov,
             )
+        # NumPy scalars would turn the glm vectors they scale into arrays
+        self._movement_speed = float(self._movement_speed)
+        self._fov = float(self._fov)
 
     def _update_position(self, dt: float):
         self._update_speed_and_fov(dt)
@@ -191,6 +195,13 @@ class Camera:
         self._update_aspect_ratio(win)
         self._update_position(dt)
 
+    def animating(self) -> bool:
+        """Whether the camera is moving, or its fov is still changing"""
+        running = glfw.KEY_LEFT_SHIFT in self._pressed_keys
+        if self._pressed_keys - {glfw.KEY_LEFT_SHIFT}:
+            return True
+        return self._fov != (self.running_fov if running else self.base_fov)
+
     def cursor_handler(self, win: Any, x: float, y: float, rel_x: float, rel_y: float):
         if self._previous_x is None or self._previous_y is None:
             self._previous_x = x
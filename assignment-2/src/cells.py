@@ -0,0 +1,254 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import json
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from entity import Entity
+
+# A screen rectangle in normalized device coordinates: (left, bottom, right,
+# top)
+Rect = Tuple[float, float, float, float]
+FULL_SCREEN: Rect = (-1.0, -1.0, 1.0, 1.0)
+
+
+class Portal:
+    """An opening (door, window) between two cells, as a convex polygon"""
+
+    name: str
+    cells: Tuple[str, str]
+    # World space corners, in order around the polygon
+    corners: np.ndarray
+
+    def __init__(self, name: str, cells: Tuple[str, str], corners: np.ndarray):
+        self.name = name
+        self.cells = cells
+        self.corners = corners
+
+    def other(self, cell: str) -> str:
+        """The cell on the other side from `cell`"""
+        return self.cells[1] if self.cells[0] == cell else self.cells[0]
+
+    def screen_rect(self, view_projection: np.ndarray) -> Optional[Rect]:
+        """
+        The bounding rectangle of the portal on the screen, clipped against
+        the near plane. None if it's entirely behind the camera
+        """
+        clip = np.hstack([self.corners, np.ones((len(self.corners), 1))])
+        clip = clip @ view_projection.T
+        distances = clip[:, 2] + clip[:, 3]
+
+        # Sutherland-Hodgman against the near plane alone, the other planes
+        # are the rectangle intersection done by the caller
+        points = []
+        for i in range(len(clip)):
+            j = (i + 1) % len(clip)
+            if distances[i] > 0:
+                points.append(clip[i])
+            if (distances[i] > 0) != (distances[j] > 0):
+                t = distances[i] / (distances[i] - distances[j])
+                points.append(clip[i] + t * (clip[j] - clip[i]))
+        if not points:
+            return None
+
+        clipped = np.array(points)
+        ndc = clipped[:, :2] / clipped[:, 3:]
+        left, bottom = ndc.min(axis=0)
+        right, top = ndc.max(axis=0)
+        return (float(left), float(bottom), float(right), float(top))
+
+
+class Cell:
+    """A region of the scene, the union of some boxes"""
+
+    name: str
+    # (min, max) corners of each box, n x 2 x 3. Empty for the cell holding
+    # everything the others don't
+    boxes: np.ndarray
+    portals: List[Portal]
+
+    def __init__(self, name: str, boxes: np.ndarray) -> None:
+        self.name = name
+        self.boxes = boxes
+        self.portals = []
+
+    def contains(self, point: np.ndarray) -> bool:
+        return bool(
+            np.any(
+                np.all(
+                    (self.boxes[:, 0] <= point) & (point <= self.boxes[:, 1]), axis=1
+                )
+            )
+        )
+
+
+def _intersect(a: Rect, b: Rect) -> Optional[Rect]:
+    rect = (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+    if rect[0] >= rect[2] or rect[1] >= rect[3]:
+        return None
+    return rect
+
+
+class CellGraph:
+    """
+    Cells of a scene and the portals between them, for portal visibility:
+    from the camera's cell, a neighbor is visible if the portal leading to
+    it shows on the part of the screen through which its own cell is seen.
+    Every frame, `update` finds the visible cells and tags the entities with
+    the cell they're in.
+
+    Entities are placed by their position, unless the scene file pins them
+    to a cell (the maps, whose origins say nothing about where they are).
+    """
+
+    cells: Dict[str, Cell]
+    portals: List[Portal]
+    # The cell of whatever no other cell contains
+    outside: str
+    # Entity names pinned to a cell, from the scene file. None pins them to
+    # no cell, they're never hidden
+    entity_cells: Dict[str, Optional[str]]
+    # Cells seen from the camera in the last `update`
+    visible: Set[str]
+
+    _pinned: Set[int]
+
+    def __init__(
+        self,
+        cells: List[Cell],
+        portals: List[Portal],
+        entity_cells: Optional[Dict[str, Optional[str]]] = None,
+    ) -> None:
+        self.cells = {cell.name: cell for cell in cells}
+        outside = [cell.name for cell in cells if len(cell.boxes) == 0]
+        assert len(outside) == 1, "Exactly one cell must have no boxes"
+        self.outside = outside[0]
+        self.portals = portals
+        for portal in portals:
+            for name in portal.cells:
+                self.cells[name].portals.append(portal)
+        self.entity_cells = dict(entity_cells or {})
+        self.visible = set(self.cells)
+        self._pinned = set()
+
+    @staticmethod
+    def load(path: str) -> "CellGraph":
+        """
+        Reads a scene file: a JSON object with the "cells" (name to a list
+        of [min, max] "boxes"), the "portals" between them (name to the two
+        "cells" and the polygon's "corners") and optionally the "entities"
+        pinned to a cell (name to cell, null for those spanning several cells,
+        drawn from any of them)
+        """
+        with open(path, "r") as f:
+            scene = json.load(f)
+
+        cells = [
+            Cell(
+                name,
+                np.array(cell.get("boxes", []), dtype=np.float64).reshape(-1, 2, 3),
+            )
+            for name, cell in scene["cells"].items()
+        ]
+        portals = [
+            Portal(
+                name,
+                (portal["cells"][0], portal["cells"][1]),
+                np.array(portal["corners"], dtype=np.float64),
+            )
+            for name, portal in scene["portals"].items()
+        ]
+        return CellGraph(cells, portals, scene.get("entities", {}))
+
+    def pin(self, entities: Dict[str, Entity]) -> None:
+        """Places the scene file's entities, found by name, in their cells"""
+        for name, cell in self.entity_cells.items():
+            if name in entities:
+                entities[name].cell = cell
+                self._pinned.add(id(entities[name]))
+
+    def locate(self, point: np.ndarray) -> str:
+        """The cell a point is in"""
+        for cell in self.cells.values():
+            if len(cell.boxes) and cell.contains(point):
+                return cell.name
+        return self.outside
+
+    def locate_many(self, points: np.ndarray) -> List[str]:
+        """The cell each of the points (n x 3) is in, all boxes tested at once"""
+        names = list(self.cells)
+        found = np.full(len(points), -1)
+        for index, cell in enumerate(self.cells.values()):
+            if not len(cell.boxes):
+                continue
+            inside = np.all(
+                (cell.boxes[:, np.newaxis, 0] <= points)
+                & (points <= cell.boxes[:, np.newaxis, 1]),
+                axis=2,
+            ).any(axis=0)
+            found[(found < 0) & inside] = index
+        return [
+            names[index] if index >= 0 else self.outside for index in found.tolist()
+        ]
+
+    def update(
+        self,
+        view_projection: np.ndarray,
+        camera_position: np.ndarray,
+        entities: Iterable[Entity],
+        positions: Optional[np.ndarray] = None,
+    ) -> Set[str]:
+        """
+        Tags the entities with their cell, returns the cells in view.
+        `positions` are the entities' (n x 3), read from them if not given
+        """
+        entities = list(entities)
+        if positions is None:
+            positions = np.array(
+                [np.asarray(entity.position) for entity in entities]
+            ).reshape(-1, 3)
+        for entity, cell in zip(entities, self.locate_many(positions)):
+            if id(entity) not in self._pinned:
+                entity.cell = cell
+
+        start = self.locate(camera_position)
+        self.visible = {start}
+        # Depth first through the portals, narrowing the rectangle at each
+        stack: List[Tuple[str, Rect, Tuple[str, ...]]] = [
+            (start, FULL_SCREEN, (start,))
+        ]
+        while stack:
+            name, rect, path = stack.pop()
+            for portal in self.cells[name].portals:
+                neighbor = portal.other(name)
+                if neighbor in path:
+                    continue
+                portal_rect = portal.screen_rect(view_projection)
+                if portal_rect is None:
+                    continue
+                seen = _intersect(rect, portal_rect)
+                if seen is None:
+                    continue
+                self.visible.add(neighbor)
+                stack.append((neighbor, seen, path + (neighbor,)))
+        return self.visible
+
+    def hides(self, entity: Entity) -> bool:
+        """Whether the entity is in a cell out of view"""
+        return entity.cell is not None and entity.cell not in self.visible
+
+    def hidden(self, entities: List[Entity]) -> np.ndarray:
+        """Which of the entities are in a cell out of view"""
+        visible = self.visible
+        return np.fromiter(
+            (
+                entity.cell is not None and entity.cell not in visible
+                for entity in entities
+            ),
+            dtype=bool,
+            count=len(entities),
+        )
@@ -0,0 +1,515 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import ctypes
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from entity import Entity, EntityRows
+from light_source import MAX_LIGHTS
+from material import BLENDED, OPAQUE, Material
+from material_table import MaterialTable
+from model import INDEX_SIZE, Model
+from shader import Shader
+
+# One row per (entity, segment): everything a draw needs, resolved up front
+PACKET_DTYPE = np.dtype(
+    [
+        ("entity", np.int32),
+        # Level of detail of the entity's model
+        ("lod", np.int32),
+        # Pass drawing the packet, its material's transparency
+        ("transparency", np.int32),
+        ("program", np.uint32),
+        ("vao", np.uint32),
+        ("texture", np.uint32),
+        # Row of the material block
+        ("material", np.int32),
+        ("first", np.int32),
+        ("count", np.int32),
+        ("mode", np.uint32),
+        ("flags", np.uint32),
+        # Index of the (possibly merged) draw call issuing the packet
+        ("batch", np.int32),
+    ]
+)
+
+# Packet flags
+IGNORE_LIGHTING = 1
+
+# Material block columns: ka, kd, ks, ns and d
+MATERIAL_FLOATS = 11
+
+# What the renderer iterates: (shader, vao, texture, material uniforms, mode,
+# offset, count, offsets, counts), the material uniforms being (ka, kd, ks,
+# ns, d), or None when the shader reads them from the material table. Offsets
+# are in bytes into the index buffer. Merged draws have their ranges in
+# `offsets` (an intp array) and `counts` (int32), with `count` holding their
+# total; otherwise those are None
+MaterialUniforms = Tuple[np.ndarray, np.ndarray, np.ndarray, float, float]
+PacketRow = Tuple[
+    Shader,
+    int,
+    int,
+    Optional[MaterialUniforms],
+    int,
+    Optional[ctypes.c_void_p],
+    int,
+    Optional[np.ndarray],
+    Optional[np.ndarray],
+]
+# A draw of the depth pre-pass: (vao, mode, offset, count, offsets, counts),
+# the last four like in `PacketRow`
+DepthRow = Tuple[
+    int, int, Optional[ctypes.c_void_p], int, Optional[np.ndarray], Optional[np.ndarray]
+]
+# The draws of one level of detail of an entity: its first row of the
+# material table (None without it), its rows in each pass (indexed by
+# transparency), the center of each blended row's range, in model space, and
+# its opaque geometry for the depth pre-pass
+LevelDraws = Tuple[Optional[int], List[List[PacketRow]], np.ndarray, List[DepthRow]]
+
+
+def _depth_rows(
+    ranges: Dict[Tuple[int, int], List[List[int]]], multi_draw: bool
+) -> List[DepthRow]:
+    """
+    The pre-pass draws of an entity's (first, count) index ranges by vertex
+    array and mode: one per range, or one per vertex array with `multi_draw`
+    """
+    rows: List[DepthRow] = []
+    for (vao, mode), spans in ranges.items():
+        if len(spans) == 1 or not multi_draw:
+            rows.extend(
+                (vao, mode, ctypes.c_void_p(first * INDEX_SIZE), count, None, None)
+                for first, count in spans
+            )
+        else:
+            firsts, counts = zip(*spans)
+            rows.append(
+                (
+                    vao,
+                    mode,
+                    None,
+                    sum(counts),
+                    np.array(firsts, dtype=np.intp) * INDEX_SIZE,
+                    np.array(counts, dtype=np.int32),
+                )
+            )
+    return rows
+
+
+class DrawPackets:
+    """
+    The draws of a list of entities compiled into a packet array, so a frame
+    is a walk over prebuilt rows instead of models, segments and materials.
+
+    Packets are split by their material's transparency into the opaque,
+    alpha tested and blended passes. With `multi_draw`, the packets of each
+    entity in the first two are sorted by program, texture and material, and
+    runs sharing all three become a single draw: one glDrawElements if their
+    ranges are contiguous, a glMultiDrawElements otherwise. Blended packets
+    keep their order and are never merged, the renderer sorts them by
+    distance every frame.
+
+    With `material_table` (which needs the shader variants), the materials
+    live in a `MaterialTable` instead of uniforms, so runs only need to share
+    program and texture, and each entity uploads the row of its model.
+
+    The opaque packets are also gathered, whatever their material, into the
+    draws of the depth pre-pass: contiguous ranges of the same vertex array
+    become one, and with `multi_draw` all of them a single call.
+
+    Every level of detail of the models gets its packets, so the renderer
+    picks one per entity every frame without rebuilding anything.
+
+    Only what changes every frame (transforms, light positions, visibility)
+    is read from the entities while drawing, as whole columns of their
+    stores through `rows`. Packets are rebuilt when an entity's model (or its
+    levels of detail), lighting flag or light count change, or when the
+    renderer options (`max_lights` included) change. Call `invalidate` after
+    changing the entity list itself.
+    """
+
+    entities: List[Entity]
+    shaders: List[Shader]
+    materials: List[Material]
+    packets: np.ndarray
+    # Material uniforms, one row per material
+    material_block: np.ndarray
+    # Materials of the entities' models, with `material_table`
+    table: Optional[MaterialTable]
+    # The draws of each level of detail of each entity as tuples, ready for
+    # the hot loop
+    batches: List[Tuple[Entity, List[LevelDraws]]]
+    # Rows of the entities in their stores
+    rows: EntityRows
+    builds: int
+
+    _options: Optional[Tuple[bool, bool, bool, int]]
+    _signatures: List[Tuple[Any, int, int, int]]
+    # Lighting flag of each entity the packets were built with
+    _ignore_lighting: np.ndarray
+
+    def __init__(self, entities: List[Entity]) -> None:
+        self.entities = entities
+        self.shaders = []
+        self.materials = []
+        self.packets = np.zeros(0, dtype=PACKET_DTYPE)
+        self.material_block = np.zeros((0, MATERIAL_FLOATS), dtype=np.float32)
+        self.table = None
+        self.batches = []
+        self.rows = EntityRows(entities)
+        self.builds = 0
+        self._options = None
+        self._signatures = []
+        self._ignore_lighting = np.zeros(0, dtype=bool)
+
+    @staticmethod
+    def _signature(entity: Entity) -> Tuple[Any, int, int, int]:
+        return (
+            entity.model,
+            len(entity.model.lods),
+            min(len(entity.light_sources), MAX_LIGHTS),
+            len(entity.baked_lights),
+        )
+
+    @property
+    def draw_count(self) -> int:
+        """Draw calls issued when every entity is visible, at full detail"""
+        return sum(len(rows) for _, levels in self.batches for rows in levels[0][1])
+
+    @property
+    def active_table(self) -> Optional[MaterialTable]:
+        """The material table the packets were built for, if any"""
+        if self._options is None or not self._options[2]:
+            return None
+        return self.table
+
+    def invalidate(self) -> None:
+        self._options = None
+
+    def refresh(
+        self,
+        shader_variants: bool,
+        multi_draw: bool = False,
+        material_table: bool = False,
+        max_lights: int = MAX_LIGHTS,
+    ) -> bool:
+        """Rebuilds the packets if the entities changed, returns whether it did"""
+        options = (
+            shader_variants,
+            multi_draw,
+            material_table and shader_variants,
+            min(max_lights, MAX_LIGHTS),
+        )
+        stale = (
+            options != self._options
+            or len(self._signatures) != len(self.entities)
+            or not self.rows.describes(self.entities)
+            or not np.array_equal(
+                self.rows.gather("flags")["ignore_lighting"], self._ignore_lighting
+            )
+        )
+        if not stale:
+            for entity, (model, lods, light_count, baked) in zip(
+                self.entities, self._signatures
+            ):
+                if (
+                    entity.model is not model
+                    or len(model.lods) != lods
+                    or min(len(entity.light_sources), MAX_LIGHTS) != light_count
+                    or len(entity.baked_lights) != baked
+                ):
+                    stale = True
+                    break
+        if stale:
+            self.build(*options)
+        return stale
+
+    def _compile(
+        self,
+        entity_index: int,
+        level: int,
+        model: Model,
+        ignore_lighting: bool,
+        light_count: int,
+        baked: bool,
+        shader_variants: bool,
+        multi_draw: bool,
+        material_table: bool,
+        shader_index: Dict[int, int],
+        material_index: Dict[Tuple[Any, ...], int],
+    ) -> List[Tuple[Any, ...]]:
+        """The packets of one level of detail of an entity, in drawing order"""
+        rows = []
+        for start, count, material in model.segments:
+            if shader_variants:
+                shader = material.select_shader(
+                    not ignore_lighting, light_count, material_table, baked
+                )
+            else:
+                shader = material.shader
+
+            if id(shader) not in shader_index:
+                shader_index[id(shader)] = len(self.shaders)
+                self.shaders.append(shader)
+            # Materials with the same texture and values share a row of the block
+            material_key = (
+                material.texture_id,
+                material.ka.tobytes(),
+                material.kd.tobytes(),
+                material.ks.tobytes(),
+                material.ns,
+                material.d,
+            )
+            if material_key not in material_index:
+                material_index[material_key] = len(self.materials)
+                self.materials.append(material)
+
+            flags = IGNORE_LIGHTING if ignore_lighting else 0
+            rows.append(
+                (
+                    entity_index,
+                    level,
+                    material.transparency,
+                    shader.program_id,
+                    model.vao,
+                    material.texture_id,
+                    material_index[material_key],
+                    model.offset + start,
+                    count,
+                    model.draw_mode,
+                    flags,
+                    0,
+                )
+            )
+
+        if multi_draw:
+            # Group the segments of each pass, blended ones keep their order
+            solid = [row for row in rows if row[2] != BLENDED]
+            blended = [row for row in rows if row[2] == BLENDED]
+            if material_table:
+                solid.sort(key=lambda row: (row[2], row[3], row[5], row[7]))
+            else:
+                solid.sort(key=lambda row: (row[2], row[3], row[5], row[6], row[7]))
+            rows = solid + blended
+        return rows
+
+    def build(
+        self,
+        shader_variants: bool,
+        multi_draw: bool = False,
+        material_table: bool = False,
+        max_lights: int = MAX_LIGHTS,
+    ) -> None:
+        """
+        Compiles every segment of every entity into packets, with the shader
+        variants for at most `max_lights` lights
+        """
+        material_table = material_table and shader_variants
+        max_lights = min(max_lights, MAX_LIGHTS)
+        if material_table:
+            if self.table is None:
+                self.table = MaterialTable()
+            self.table.build(
+                model
+                for entity in self.entities
+                for model in [entity.model] + entity.model.lods
+            )
+            self.table.upload()
+
+        shader_index: Dict[int, int] = {}
+        material_index: Dict[Tuple[Any, ...], int] = {}
+        self.shaders = []
+        self.materials = []
+        rows = []
+
+        for i, entity in enumerate(self.entities):
+            # Same as the renderer's `_lights`
+            baked = shader_variants and bool(entity.baked_lights)
+            lights = entity.dynamic_lights if baked else entity.light_sources
+            light_count = min(len(lights), max_lights)
+            for level, model in enumerate([entity.model] + entity.model.lods):
+                rows.extend(
+                    self._compile(
+                        i,
+                        level,
+                        model,
+                        entity.ignore_lighting,
+                        light_count,
+                        baked,
+                        shader_variants,
+                        multi_draw,
+                        material_table,
+                        shader_index,
+                        material_index,
+                    )
+                )
+
+        self.packets = np.array(rows, dtype=PACKET_DTYPE)
+
+        self.material_block = np.zeros(
+            (len(self.materials), MATERIAL_FLOATS), dtype=np.float32
+        )
+        for row, material in zip(self.material_block, self.materials):
+            row[0:3] = material.ka[:3]
+            row[3:6] = material.kd[:3]
+            row[6:9] = material.ks[:3]
+            row[9] = material.ns
+            row[10] = material.d
+
+        # Views into the block, so uploading doesn't slice every frame
+        material_uniforms: List[MaterialUniforms] = [
+            (row[0:3], row[3:6], row[6:9], float(row[9]), float(row[10]))
+            for row in self.material_block
+        ]
+        shaders_by_program = {shader.program_id: shader for shader in self.shaders}
+
+        # Runs of packets that can share a draw call
+        runs: List[List[int]] = []
+        previous = None
+        for index, packet in enumerate(self.packets.tolist()):
+            (
+                entity,
+                level,
+                transparency,
+                program,
+                vao,
+                texture,
+                material,
+                _,
+                _,
+                mode,
+                _,
+                _,
+            ) = packet
+            key = (
+                entity,
+                level,
+                transparency,
+                program,
+                vao,
+                texture,
+                None if material_table else material,
+                mode,
+            )
+            if multi_draw and key == previous and transparency != BLENDED:
+                runs[-1].append(index)
+            else:
+                runs.append([index])
+            previous = key
+
+        passes: List[List[List[List[PacketRow]]]] = [
+            [[[], [], []] for _ in [entity.model] + entity.model.lods]
+            for entity in self.entities
+        ]
+        centers: List[List[List[np.ndarray]]] = [
+            [[] for _ in [entity.model] + entity.model.lods] for entity in self.entities
+        ]
+        for batch, run in enumerate(runs):
+            self.packets["batch"][run] = batch
+            packets = self.packets[run]
+            head = packets[0]
+
+            # Contiguous ranges become a single one
+            firsts: List[int] = []
+            counts: List[int] = []
+            for first, count in zip(
+                packets["first"].tolist(), packets["count"].tolist()
+            ):
+                if firsts and firsts[-1] + counts[-1] == first:
+                    counts[-1] += count
+                else:
+                    firsts.append(first)
+                    counts.append(count)
+
+            entity_index = int(head["entity"])
+            level = int(head["lod"])
+            transparency = int(head["transparency"])
+            if transparency == BLENDED:
+                model = self.entities[entity_index].model.lod(level)
+                centers[entity_index][level].append(
+                    model.range_center(
+                        int(head["first"]) - model.offset, int(head["count"])
+                    )
+                )
+            passes[entity_index][level][transparency].append(
+                (
+                    shaders_by_program[int(head["program"])],
+                    int(head["vao"]),
+                    int(head["texture"]),
+                    (
+                        None
+                        if material_table
+                        else material_uniforms[int(head["material"])]
+                    ),
+                    int(head["mode"]),
+                    (
+                        ctypes.c_void_p(firsts[0] * INDEX_SIZE)
+                        if len(firsts) == 1
+                        else None
+                    ),
+                    sum(counts),
+                    (
+                        None
+                        if len(firsts) == 1
+                        else np.array(firsts, dtype=np.intp) * INDEX_SIZE
+                    ),
+                    None if len(firsts) == 1 else np.array(counts, dtype=np.int32),
+                )
+            )
+
+        # The opaque ranges of each level by vertex array and mode, ignoring
+        # materials. Sorted, so neighboring segments join
+        depth_ranges: List[List[Dict[Tuple[int, int], List[List[int]]]]] = [
+            [{} for _ in [entity.model] + entity.model.lods] for entity in self.entities
+        ]
+        opaque = self.packets[self.packets["transparency"] == OPAQUE]
+        opaque = opaque[
+            np.lexsort(
+                (
+                    opaque["first"],
+                    opaque["mode"],
+                    opaque["vao"],
+                    opaque["lod"],
+                    opaque["entity"],
+                )
+            )
+        ]
+        for entity_index, level, vao, mode, first, count in zip(
+            *(
+                opaque[field].tolist()
+                for field in ("entity", "lod", "vao", "mode", "first", "count")
+            )
+        ):
+            spans = depth_ranges[entity_index][level].setdefault((vao, mode), [])
+            if spans and spans[-1][0] + spans[-1][1] == first:
+                spans[-1][1] += count
+            else:
+                spans.append([first, count])
+
+        self.batches = [
+            (
+                entity,
+                [
+                    (
+                        self.table.base(model) if material_table else None,
+                        passes[i][level],
+                        np.array(centers[i][level], dtype=np.float32).reshape(-1, 3),
+                        _depth_rows(depth_ranges[i][level], multi_draw),
+                    )
+                    for level, model in enumerate([entity.model] + entity.model.lods)
+                ],
+            )
+            for i, entity in enumerate(self.entities)
+        ]
+
+        self.rows = EntityRows(self.entities)
+        self._signatures = [self._signature(entity) for entity in self.entities]
+        self._ignore_lighting = self.rows.gather("flags")["ignore_lighting"]
+        self._options = (shader_variants, multi_draw, material_table, max_lights)
+        self.builds += 1
@@ -1,7 +1,14 @@
+from .store import EntityRows, EntityStore
 from .entity import Entity
-from .skybox import Skybox
 from .okuu_fumo import OkuuFumo
 from .selectable_entity import SelectableEntity
 from .glowing_entity import GlowingEntity
 
-__all__ = ["Entity", "Skybox", "OkuuFumo", "SelectableEntity", "GlowingEntity"]
+__all__ = [
+    "Entity",
+    "OkuuFumo",
+    "SelectableEntity",
+    "GlowingEntity",
+    "EntityStore",
+    "EntityRows",
+]
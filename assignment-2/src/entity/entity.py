@@ -5,33 +5,56 @@
 
 from typing import Optional, Callable, List, Any
 
-import OpenGL.GL as gl
+from gl_backend import gl
 import glm
 
 
 from camera import Camera
 from model import Model
 
-from light_source import LightSource
+from light_source import MAX_LIGHTS, LightSource
+
+from .store import BOB, ORBIT, EntityStore
 
 
 class Entity:
-    model: Model
-    position: glm.vec3
-    scale: glm.vec3
-    angle_x: float
-    angle_y: float
-    angle_z: float
+    """
+    A view of a row of an `EntityStore`: the transform, motion and flags
+    below live in the store's arrays, where its systems update them all at
+    once. What only the renderer needs stays on the object.
+
+    The vectors read from the row are kept until its version changes (see
+    `EntityStore.versions`), so reading them again costs no allocation. They
+    are shared: assign a new vector rather than changing one in place.
+    """
 
-    visible: bool  # Whether to draw the entity or not
+    model: Model
+    store: EntityStore
+    row: int
 
     light_sources: List[LightSource]
 
-    ignore_lighting: bool
+    # Lights baked into the entity's model, left out when drawing it with the
+    # BAKED_LIGHTING shader variants (see `light_baker.LightBaker`)
+    baked_lights: List[LightSource]
+
+    # Level of detail drawn last frame, see `Renderer.select_lod`
+    lod: int
+    # Cell of the scene the entity is in (see `cells.CellGraph`), None when
+    # the scene isn't split in cells
+    cell: Optional[str]
+
+    # Version of the row the vectors below were read at, -1 before the first
+    _version: int = -1
+    _position: glm.vec3
+    _scale: glm.vec3
+    _velocity: glm.vec3
+    _spin: glm.vec3
 
     def __init__(
         self,
         model: Model,
+        store: EntityStore,
         position: glm.vec3 = glm.vec3(0.0, 0.0, 0.0),
         scale: glm.vec3 = glm.vec3(1.0, 1.0, 1.0),
         angle_x: float = 0,  # pitch
@@ -41,22 +64,167 @@ class Entity:
         draw_mode: int = gl.GL_TRIANGLES,
         light_sources: List[LightSource] = [],
         ignore_lighting: bool = False,
+        static: bool = False,
     ):
+        self.store = store
+        self.row = store.add(self)
+        # Whole records at once, rather than a property at a time
+        store.transforms[self.row] = (position, scale, (angle_x, angle_y, angle_z))
+        store.flags[self.row] = (visible, static, ignore_lighting)
         self.model = model
-        self.position = position
-        self.scale = scale
-        self.angle_x = angle_x
-        self.angle_y = angle_y
-        self.angle_z = angle_z
-        self.visible = visible
         self.draw_mode = draw_mode
         self.light_sources = light_sources
-        self.ignore_lighting = ignore_lighting
+        self.baked_lights = []
+        self.lod = 0
+        self.cell = None
+
+    @property
+    def dynamic_lights(self) -> List[LightSource]:
+        """The light sources to draw with besides those baked into the model"""
+        if not self.baked_lights:
+            return self.light_sources
+        return [
+            light
+            for light in self.light_sources[:MAX_LIGHTS]
+            if light not in self.baked_lights
+        ]
+
+    def _read(self) -> None:
+        """Reads the vectors of the row again, if it changed since"""
+        version = self.store.versions[self.row]
+        if version == self._version:
+            return
+        position, scale, _ = self.store.transforms[self.row].tolist()
+        velocity, spin = self.store.motion[self.row].tolist()
+        self._position = glm.vec3(position.tolist())
+        self._scale = glm.vec3(scale.tolist())
+        self._velocity = glm.vec3(velocity.tolist())
+        self._spin = glm.vec3(spin.tolist())
+        self._version = version
+
+    @property
+    def position(self) -> glm.vec3:
+        self._read()
+        return self._position
+
+    @position.setter
+    def position(self, value: glm.vec3) -> None:
+        self.store.transforms["position"][self.row] = value
+        self.store.touch(self.row)
+
+    @property
+    def scale(self) -> glm.vec3:
+        self._read()
+        return self._scale
+
+    @scale.setter
+    def scale(self, value: glm.vec3) -> None:
+        self.store.transforms["scale"][self.row] = value
+        self.store.touch(self.row)
+
+    @property
+    def angle_x(self) -> float:
+        return float(self.store.transforms["angles"][self.row, 0])
+
+    @angle_x.setter
+    def angle_x(self, value: float) -> None:
+        self.store.transforms["angles"][self.row, 0] = value
+        self.store.touch(self.row)
+
+    @property
+    def angle_y(self) -> float:
+        return float(self.store.transforms["angles"][self.row, 1])
+
+    @angle_y.setter
+    def angle_y(self, value: float) -> None:
+        self.store.transforms["angles"][self.row, 1] = value
+        self.store.touch(self.row)
+
+    @property
+    def angle_z(self) -> float:
+        return float(self.store.transforms["angles"][self.row, 2])
+
+    @angle_z.setter
+    def angle_z(self, value: float) -> None:
+        self.store.transforms["angles"][self.row, 2] = value
+        self.store.touch(self.row)
+
+    @property
+    def velocity(self) -> glm.vec3:
+        """Units per second the store moves the entity by"""
+        self._read()
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, value: glm.vec3) -> None:
+        self.store.motion["velocity"][self.row] = value
+        self.store.invalidate()
+
+    @property
+    def spin(self) -> glm.vec3:
+        """Degrees per second the store turns the entity by, around each axis"""
+        self._read()
+        return self._spin
+
+    @spin.setter
+    def spin(self, value: glm.vec3) -> None:
+        self.store.motion["spin"][self.row] = value
+        self.store.invalidate()
+
+    @property
+    def visible(self) -> bool:
+        """Whether to draw the entity or not"""
+        return bool(self.store.flags["visible"][self.row])
+
+    @visible.setter
+    def visible(self, value: bool) -> None:
+        self.store.flags["visible"][self.row] = value
+
+    @property
+    def ignore_lighting(self) -> bool:
+        return bool(self.store.flags["ignore_lighting"][self.row])
+
+    @ignore_lighting.setter
+    def ignore_lighting(self, value: bool) -> None:
+        self.store.flags["ignore_lighting"][self.row] = value
+
+    @property
+    def static(self) -> bool:
+        """Whether the entity never moves, so static lights can be baked into it"""
+        return bool(self.store.flags["static"][self.row])
+
+    @static.setter
+    def static(self, value: bool) -> None:
+        self.store.flags["static"][self.row] = value
+
+    def orbit(self, center: glm.vec3, radius: float, rate: float) -> None:
+        """Moves the entity in a horizontal circle around `center`"""
+        self.store.animate(self.row, ORBIT, center, radius, rate)
+
+    def bob(self, center: glm.vec3, height: float, rate: float) -> None:
+        """Moves the entity up and down around `center`"""
+        self.store.animate(self.row, BOB, center, height, rate)
+
+    def remove(self) -> None:
+        """Takes the entity out of its store, freeing its row"""
+        self.store.remove(self)
 
     def update(self, dt: float, camera: Camera):
-        # By default, do nothing
+        # By default, do nothing: the store's systems move the entity
         pass
 
+    @property
+    def scripted(self) -> bool:
+        """Whether `update` has to be called every step, besides the systems"""
+        return type(self).update is not Entity.update
+
+    def animating(self) -> bool:
+        """
+        Whether the entity (or its lights) changes by itself right now, so
+        on-demand redraw keeps drawing (see `redraw.RedrawScheduler`)
+        """
+        return self.store.animated(self.row)
+
     def key_handler(self) -> Optional[Callable[[Any, int, int, int, int], None]]:
         pass
 
@@ -12,6 +12,7 @@ from model import Model
 from camera import Camera
 
 from .entity import Entity
+from .store import EntityStore
 from light_source import LightSource
 
 
@@ -21,6 +22,7 @@ class GlowingEntity(Entity):
     def __init__(
         self,
         model: Model,
+        store: EntityStore,
         position=glm.vec3(0.0, 0.0, 0.0),
         scale: glm.vec3 = glm.vec3(1.0, 1.0, 1.0),
         angle_x: float = 0.0,
@@ -32,6 +34,7 @@ class GlowingEntity(Entity):
     ):
         super().__init__(
             model,
+            store,
             **kwargs,
         )
 
@@ -47,11 +50,18 @@ class GlowingEntity(Entity):
             )
 
         self.light_source = light_source
+        self.store.carry(self.row, light_source)
 
         self.light_sources = [self.light_source]
         self.animator = animator
 
     def update(self, dt: float, camera: Camera):
-        self.light_source.position = np.array(self.position)
         if self.animator is not None:
             self.animator(self, dt)
+
+    @property
+    def scripted(self) -> bool:
+        return self.animator is not None
+
+    def animating(self) -> bool:
+        return super().animating() or self.animator is not None
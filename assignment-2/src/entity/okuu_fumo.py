@@ -9,10 +9,10 @@ import glm
 import glfw
 
 from model import Model
-from camera import Camera
 from light_source import LightSource
 
 from .entity import Entity
+from .store import EntityStore
 
 
 class OkuuFumo(Entity):
@@ -20,6 +20,7 @@ class OkuuFumo(Entity):
     def __init__(
         self,
         model: Model,
+        store: EntityStore,
         position=glm.vec3(0.0, 0.0, 0.0),
         scale: glm.vec3 = glm.vec3(1.0, 1.0, 1.0),
         angle_x: float = 0.0,
@@ -32,6 +33,7 @@ class OkuuFumo(Entity):
     ):
         super().__init__(
             model,
+            store,
         )
 
         self.position = position
@@ -44,9 +46,14 @@ class OkuuFumo(Entity):
         self.ignore_lighting = ignore_lighting
         self.light_sources = light_sources
 
-    def update(self, dt: float, camera: Camera):
-        self.angle_y += self.rotation_speed * dt
-        self.angle_y %= 360
+    @property
+    def rotation_speed(self) -> float:
+        """Degrees per second around the vertical axis, spun by the store"""
+        return self.spin.y
+
+    @rotation_speed.setter
+    def rotation_speed(self, value: float) -> None:
+        self.spin = glm.vec3(0.0, value, 0.0)
 
     def key_handler(self) -> Optional[Callable[[Any, int, int, int, int], None]]:
         if not self.handle_events:
@@ -12,6 +12,7 @@ from model import Model
 from camera import Camera
 
 from .entity import Entity
+from .store import EntityStore
 
 
 class SelectableEntity(Entity):
@@ -35,6 +36,7 @@ class SelectableEntity(Entity):
         key: int,
         name: str,
         model: Model,
+        store: EntityStore,
         position=glm.vec3(0.0, 0.0, 0.0),
         scale: glm.vec3 = glm.vec3(1.0, 1.0, 1.0),
         angle_x: float = 0.0,
@@ -48,6 +50,7 @@ class SelectableEntity(Entity):
     ):
         super().__init__(
             model,
+            store,
             **kwargs,
         )
 
@@ -94,22 +97,27 @@ class SelectableEntity(Entity):
                 match key:
                     # Use UIOP for moving and OU for vertical and YH for scale
                     case glfw.KEY_I:
-                        self.position.z -= self.movement_speed * dt
+                        self.position -= glm.vec3(0.0, 0.0, self.movement_speed * dt)
                     case glfw.KEY_K:
-                        self.position.z += self.movement_speed * dt
+                        self.position += glm.vec3(0.0, 0.0, self.movement_speed * dt)
                     case glfw.KEY_J:
-                        self.position.x -= self.movement_speed * dt
+                        self.position -= glm.vec3(self.movement_speed * dt, 0.0, 0.0)
                     case glfw.KEY_L:
-                        self.position.x += self.movement_speed * dt
+                        self.position += glm.vec3(self.movement_speed * dt, 0.0, 0.0)
                     case glfw.KEY_U:
-                        self.position.y -= self.movement_speed * dt
+                        self.position -= glm.vec3(0.0, self.movement_speed * dt, 0.0)
                     case glfw.KEY_O:
-                        self.position.y += self.movement_speed * dt
+                        self.position += glm.vec3(0.0, self.movement_speed * dt, 0.0)
                     case glfw.KEY_Y:
                         self.scale = self.scale * (1.0 + (self.scale_speed * dt))
                     case glfw.KEY_H:
                         self.scale = self.scale / (1.0 + (self.scale_speed * dt))
 
+    def animating(self) -> bool:
+        # Held keys move, turn or scale the selected entity, ALT alone doesn't
+        held = self.selected and bool(self.pressed_keys - {glfw.KEY_LEFT_ALT})
+        return held or super().animating()
+
     def key_handler(self) -> Optional[Callable[[Any, int, int, int, int], None]]:
         def handler(win, key, scancode, action, mods):
             if key == self.select_key and action == glfw.PRESS:
@@ -0,0 +1,308 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import glm
+import numpy as np
+
+from light_source import LightSource
+
+# Animations run by `EntityStore.update`, in the `kind` column
+STILL = 0
+# Horizontal circle of radius `extent` around `center`
+ORBIT = 1
+# Up and down by `extent` around `center`
+BOB = 2
+
+# Components, one structured array each (a record per entity). Angles are
+# pitch, yaw and roll in degrees, `spin` is in degrees per second and `rate`
+# in radians per second
+TRANSFORM = np.dtype(
+    [
+        ("position", np.float32, 3),
+        ("scale", np.float32, 3),
+        ("angles", np.float32, 3),
+    ]
+)
+MOTION = np.dtype([("velocity", np.float32, 3), ("spin", np.float32, 3)])
+ANIMATION = np.dtype(
+    [
+        ("kind", np.int8),
+        ("center", np.float32, 3),
+        ("extent", np.float32),
+        ("rate", np.float32),
+        ("time", np.float64),
+    ]
+)
+FLAGS = np.dtype(
+    [("visible", np.bool_), ("static", np.bool_), ("ignore_lighting", np.bool_)]
+)
+
+INITIAL_CAPACITY = 64
+
+
+def _wrap_degrees(angles: np.ndarray) -> np.ndarray:
+    # Into [0, 360), several times faster than the % operator on floats
+    return angles - 360.0 * np.floor(angles * (1.0 / 360.0))
+
+
+class EntityStore:
+    """
+    The state of many entities, in one contiguous structured array per
+    component: transforms, motion (velocity and spin), animation parameters
+    and render flags. `update` runs the systems over whole columns at once,
+    instead of a Python call per entity. `Entity` objects are views of a row,
+    only those with an `update` of their own (`Entity.scripted`) are still
+    called one by one.
+
+    Each scene owns its store. Rows of removed entities go to a free list,
+    reused by the next entities added. The columns can be written directly
+    (see `allocate`), followed by `touch` when only transforms changed, or
+    `invalidate` when motion or animations did.
+
+    Every row has a version, bumped whenever its transform or motion changes,
+    so entities can keep the vectors they return until then.
+    """
+
+    transforms: np.ndarray
+    motion: np.ndarray
+    animation: np.ndarray
+    flags: np.ndarray
+    # Bumped when a row's transform or motion changes
+    versions: np.ndarray
+    # Rows handed out so far, free ones included, the arrays above have room
+    # for more
+    count: int
+    # Entities viewing rows of the store by row, rows from `allocate` alone
+    # have none
+    entities: Dict[int, Any]
+
+    # Lights carried by the entity in a row, moved along after each update
+    _lights: List[Tuple[int, LightSource]]
+    # Rows of removed entities, reset and waiting for reuse
+    _free: List[int]
+    # Entities whose `update` runs every step, None when they need finding
+    _scripted: Optional[List[Any]]
+    # Rows each system runs over, None when they need finding
+    _moving: Optional[np.ndarray]
+    _spinning: np.ndarray
+    _animated: np.ndarray
+    # Rows any system changes, whose versions are bumped every update
+    _changing: np.ndarray
+    _orbiting: np.ndarray
+    _bobbing: np.ndarray
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY) -> None:
+        self.transforms = np.zeros(capacity, TRANSFORM)
+        self.motion = np.zeros(capacity, MOTION)
+        self.animation = np.zeros(capacity, ANIMATION)
+        self.flags = np.zeros(capacity, FLAGS)
+        self.versions = np.zeros(capacity, np.uint32)
+        self._defaults(slice(None))
+        self.count = 0
+        self.entities = {}
+        self._lights = []
+        self._free = []
+        self._scripted = None
+        self._moving = None
+
+    def __len__(self) -> int:
+        """Rows in use"""
+        return self.count - len(self._free)
+
+    def allocate(self, count: int = 1) -> int:
+        """Adds `count` still, visible rows at the origin, returns the first"""
+        first = self.count
+        self.count += count
+        # Rows past `count` hold the defaults already, only new ones need them
+        capacity = len(self.transforms)
+        if self.count > capacity:
+            capacity = max(capacity * 2, self.count)
+            for name in ("transforms", "motion", "animation", "flags", "versions"):
+                old = getattr(self, name)
+                new = np.zeros(capacity, old.dtype)
+                new[:first] = old[:first]
+                setattr(self, name, new)
+            self._defaults(slice(first, capacity))
+        return first
+
+    def _defaults(self, rows: Any) -> None:
+        self.transforms["scale"][rows] = 1.0
+        self.flags["visible"][rows] = True
+
+    def add(self, entity: Any) -> int:
+        """Gives `entity` a row, a free one if any, returns it"""
+        row = self._free.pop() if self._free else self.allocate()
+        self.entities[row] = entity
+        self._scripted = None
+        return row
+
+    def remove(self, entity: Any) -> None:
+        """Frees the row of `entity`, which must not be used anymore"""
+        row = entity.row
+        del self.entities[row]
+        self._lights = [(other, light) for other, light in self._lights if other != row]
+        self.transforms[row] = 0
+        self.motion[row] = 0
+        self.animation[row] = 0
+        self.flags[row] = 0
+        self._defaults(row)
+        self.invalidate()
+        self._free.append(row)
+        self._scripted = None
+
+    def carry(self, row: int, light: LightSource) -> None:
+        """Moves `light` along with the entity in `row`"""
+        self._lights.append((row, light))
+
+    def animate(
+        self,
+        row: int,
+        kind: int,
+        center: glm.vec3 = glm.vec3(0.0),
+        extent: float = 0.0,
+        rate: float = 0.0,
+    ) -> None:
+        """Starts animation `kind` (ORBIT, BOB or STILL) for `row`"""
+        self.animation[row] = (kind, center, extent, rate, 0.0)
+        self.invalidate()
+
+    def touch(self, rows: Any) -> None:
+        """Bumps the versions of `rows`, after writing their transforms"""
+        self.versions[rows] += 1
+
+    def invalidate(self) -> None:
+        """
+        Finds the rows each system runs over again, on the next update, and
+        bumps the version of every row
+        """
+        self._moving = None
+        self.versions[: self.count] += 1
+
+    def animated(self, row: int) -> bool:
+        """Whether the systems change `row` by themselves"""
+        motion = self.motion[row]
+        return bool(
+            self.animation["kind"][row] != STILL
+            or motion["velocity"].any()
+            or motion["spin"].any()
+        )
+
+    def _find_rows(self) -> None:
+        motion = self.motion[: self.count]
+        kind = self.animation["kind"][: self.count]
+        self._moving = np.flatnonzero(motion["velocity"].any(axis=1))
+        self._spinning = np.flatnonzero(motion["spin"].any(axis=1))
+        self._animated = np.flatnonzero(kind != STILL)
+        self._orbiting = np.flatnonzero(kind == ORBIT)
+        self._bobbing = np.flatnonzero(kind == BOB)
+        self._changing = np.union1d(
+            np.union1d(self._moving, self._spinning), self._animated
+        )
+
+    def update(self, dt: float, camera: Any = None) -> None:
+        """Runs one step of the systems, then the scripted entities"""
+        if self._moving is None:
+            self._find_rows()
+        if self._scripted is None:
+            self._scripted = [
+                entity for entity in self.entities.values() if entity.scripted
+            ]
+
+        positions = self.transforms["position"]
+        if len(self._moving):
+            rows = self._moving
+            positions[rows] += self.motion["velocity"][rows] * dt
+        if len(self._spinning):
+            rows = self._spinning
+            angles = self.transforms["angles"]
+            angles[rows] = _wrap_degrees(angles[rows] + self.motion["spin"][rows] * dt)
+        if len(self._animated):
+            time = self.animation["time"]
+            time[self._animated] += dt
+            self._orbit(positions)
+            self._bob(positions)
+        if len(self._changing):
+            self.versions[self._changing] += 1
+
+        for entity in self._scripted:
+            entity.update(dt, camera)
+        # Written in place to avoid allocating a new array every step
+        for row, light in self._lights:
+            light.position[:] = positions[row]
+
+    def _orbit(self, positions: np.ndarray) -> None:
+        if not len(self._orbiting):
+            return
+        animation = self.animation[self._orbiting]
+        phase = animation["rate"] * animation["time"]
+        offsets = np.zeros((len(phase), 3))
+        offsets[:, 0] = animation["extent"] * np.cos(phase)
+        offsets[:, 2] = animation["extent"] * np.sin(phase)
+        positions[self._orbiting] = animation["center"] + offsets
+
+    def _bob(self, positions: np.ndarray) -> None:
+        if not len(self._bobbing):
+            return
+        animation = self.animation[self._bobbing]
+        phase = animation["rate"] * animation["time"]
+        offsets = np.zeros((len(phase), 3))
+        offsets[:, 1] = animation["extent"] * np.sin(phase)
+        positions[self._bobbing] = animation["center"] + offsets
+
+
+# The dtype of each component, by the name of its array in the store
+COMPONENTS = {
+    "transforms": TRANSFORM,
+    "motion": MOTION,
+    "animation": ANIMATION,
+    "flags": FLAGS,
+}
+
+
+class EntityRows:
+    """
+    Where a list of entities lives in their stores, to read a component of
+    all of them as one array, in the list's order
+    """
+
+    entities: List[Any]
+
+    # Each store, with the indices in the list of its entities and their rows
+    _groups: List[Tuple[EntityStore, np.ndarray, np.ndarray]]
+
+    def __init__(self, entities: List[Any]) -> None:
+        self.entities = entities
+        groups: Dict[int, Tuple[EntityStore, List[int], List[int]]] = {}
+        for index, entity in enumerate(entities):
+            _, indices, rows = groups.setdefault(
+                id(entity.store), (entity.store, [], [])
+            )
+            indices.append(index)
+            rows.append(entity.row)
+        self._groups = [
+            (store, np.array(indices, dtype=np.intp), np.array(rows, dtype=np.intp))
+            for store, indices, rows in groups.values()
+        ]
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def describes(self, entities: List[Any]) -> bool:
+        """Whether these are still the rows of `entities`"""
+        return entities is self.entities and len(entities) == sum(
+            len(rows) for _, _, rows in self._groups
+        )
+
+    def gather(self, component: str) -> np.ndarray:
+        """The records of `component` ("transforms", "flags"...) of the entities"""
+        if len(self._groups) == 1:
+            store, _, rows = self._groups[0]
+            return getattr(store, component)[rows]
+        records = np.zeros(len(self.entities), COMPONENTS[component])
+        for store, indices, rows in self._groups:
+            records[indices] = getattr(store, component)[rows]
+        return records
@@ -0,0 +1,292 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import re
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+import OpenGL.GL as pyopengl
+
+
+class GLFacade:
+    """
+    Stand-in for the `OpenGL.GL` module that forwards everything to a
+    pluggable backend. Resolved names are cached on the instance, so after the
+    first call the hot path pays a plain attribute lookup.
+    """
+
+    _backend: Any
+    _listeners: List[Callable[[Any, Any], None]]
+
+    def __init__(self, backend: Any) -> None:
+        self._backend = backend
+        self._listeners = []
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._backend, name)
+        self.__dict__[name] = value
+        return value
+
+    def set_backend(self, backend: Any) -> Any:
+        """Swaps the backend, returning the previous one"""
+        previous = self._backend
+        listeners = self._listeners
+        self.__dict__.clear()
+        self._backend = backend
+        self._listeners = listeners
+        if backend is not previous:
+            for listener in listeners:
+                listener(previous, backend)
+        return previous
+
+    def add_backend_listener(self, listener: Callable[[Any, Any], None]) -> None:
+        """Calls `listener(previous, backend)` whenever the backend is swapped"""
+        self._listeners.append(listener)
+
+    @property
+    def backend(self) -> Any:
+        return self._backend
+
+
+gl = GLFacade(pyopengl)
+
+
+def set_backend(backend: Any) -> Any:
+    """Routes all the GL calls to `backend`, returning the previous one"""
+    return gl.set_backend(backend)
+
+
+def get_backend() -> Any:
+    return gl.backend
+
+
+@contextmanager
+def use_backend(backend: Any) -> Iterator[Any]:
+    """Temporarily routes all the GL calls to `backend`"""
+    previous = set_backend(backend)
+    try:
+        yield backend
+    finally:
+        set_backend(previous)
+
+
+def _arg_bytes(args: Tuple[Any, ...]) -> int:
+    """Size of the data payloads (arrays and byte strings) passed to a call"""
+    total = 0
+    for arg in args:
+        if isinstance(arg, np.ndarray):
+            total += arg.nbytes
+        elif isinstance(arg, (bytes, bytearray, memoryview)):
+            total += len(arg)
+    return total
+
+
+# GLSL uniform types and their GL enums, for the recording backend
+GLSL_TYPES = {
+    "float": pyopengl.GL_FLOAT,
+    "vec2": pyopengl.GL_FLOAT_VEC2,
+    "vec3": pyopengl.GL_FLOAT_VEC3,
+    "vec4": pyopengl.GL_FLOAT_VEC4,
+    "int": pyopengl.GL_INT,
+    "bool": pyopengl.GL_BOOL,
+    "mat4": pyopengl.GL_FLOAT_MAT4,
+    "sampler2D": pyopengl.GL_SAMPLER_2D,
+    "samplerCube": pyopengl.GL_SAMPLER_CUBE,
+    "samplerBuffer": pyopengl.GL_SAMPLER_BUFFER,
+}
+
+UNIFORM_DECLARATION = re.compile(
+    r"^\s*uniform\s+(\w+)\s+(\w+)\s*(?:\[\s*(\w+)\s*\])?\s*;", re.MULTILINE
+)
+DEFINE_DIRECTIVE = re.compile(r"^\s*#define\s+(\w+)\s+(\S+)", re.MULTILINE)
+
+
+def declared_uniforms(source: str) -> List[Tuple[str, int, int]]:
+    """
+    The (name, array size, GL type) of the uniforms declared in GLSL source.
+    Preprocessor conditionals are ignored, so everything declared counts.
+    """
+    defines: Dict[str, str] = {}
+    for name, value in DEFINE_DIRECTIVE.findall(source):
+        # The first definition wins, injected defines come before the defaults
+        defines.setdefault(name, value)
+
+    uniforms = []
+    for glsl_type, name, size in UNIFORM_DECLARATION.findall(source):
+        size = defines.get(size, size) if size else "1"
+        uniforms.append((name, int(size), GLSL_TYPES.get(glsl_type, 0)))
+    return uniforms
+
+
+class GLCall(NamedTuple):
+    name: str
+    args: Tuple[Any, ...]
+    nbytes: int
+
+
+class RecordingBackend:
+    """
+    Fake GL backend that never touches a driver. Every call is counted and,
+    if `record` is set, logged with its arguments and payload size. Object
+    creation and queries return plausible values so the rest of the code runs
+    unchanged. Constants (`GL_*`) and helpers come from PyOpenGL.
+    """
+
+    calls: List[GLCall]
+    counts: Counter
+    record: bool
+
+    _next_id: int
+    _locations: Dict[Tuple[int, str], int]
+    _shader_sources: Dict[int, str]
+    _program_shaders: Dict[int, List[int]]
+    _program_uniforms: Dict[int, List[Tuple[str, int, int]]]
+
+    def __init__(self, record: bool = True) -> None:
+        self.record = record
+        self.calls = []
+        self.counts = Counter()
+        self._next_id = 1
+        self._locations = {}
+        self._shader_sources = {}
+        self._program_shaders = {}
+        self._program_uniforms = {}
+
+    def reset(self) -> None:
+        """Forgets the calls made so far (created objects keep their ids)"""
+        self.calls.clear()
+        self.counts.clear()
+
+    def count(self, name: str) -> int:
+        return self.counts[name]
+
+    def calls_named(self, name: str) -> List[GLCall]:
+        return [call for call in self.calls if call.name == name]
+
+    def total_bytes(self) -> int:
+        return sum(call.nbytes for call in self.calls)
+
+    def _new_ids(self, n: int, *_: Any) -> Any:
+        ids = list(range(self._next_id, self._next_id + n))
+        self._next_id += n
+        return ids[0] if n == 1 else ids
+
+    def _new_id(self, *_: Any) -> int:
+        return self._new_ids(1)
+
+    def _location(self, program: int, name: Any) -> int:
+        if isinstance(name, bytes):
+            name = name.decode()
+        key = (int(program), name)
+        if key not in self._locations:
+            self._locations[key] = len(self._locations)
+        return self._locations[key]
+
+    def _shader_source(self, shader: int, source: Any, *_: Any) -> None:
+        if isinstance(source, (list, tuple)):
+            source = "".join(source)
+        if isinstance(source, bytes):
+            source = source.decode()
+        self._shader_sources[int(shader)] = source
+
+    def _attach_shader(self, program: int, shader: int) -> None:
+        self._program_shaders.setdefault(int(program), []).append(int(shader))
+
+    def _link_program(self, program: int) -> None:
+        uniforms = {}
+        for shader in self._program_shaders.get(int(program), []):
+            for uniform in declared_uniforms(self._shader_sources.get(shader, "")):
+                uniforms[uniform[0]] = uniform
+        self._program_uniforms[int(program)] = list(uniforms.values())
+
+    def _get_programiv(self, program: int, pname: int) -> int:
+        if pname == pyopengl.GL_ACTIVE_UNIFORMS:
+            return len(self._program_uniforms.get(int(program), []))
+        return 1
+
+    def _get_active_uniform(self, program: int, index: int) -> Tuple[bytes, int, int]:
+        name, size, gl_type = self._program_uniforms[int(program)][index]
+        return (name + "[0]" if size > 1 else name).encode(), size, gl_type
+
+    def _fake(self, name: str) -> Callable[..., Any]:
+        """Return value generator for a GL entry point"""
+        # Shader sources are parsed, so reflection sees the declared uniforms
+        if name == "glShaderSource":
+            return self._shader_source
+        if name == "glAttachShader":
+            return self._attach_shader
+        if name == "glLinkProgram":
+            return self._link_program
+        if name == "glGetProgramiv":
+            return self._get_programiv
+        if name == "glGetActiveUniform":
+            return self._get_active_uniform
+        if name.startswith("glGen"):
+            return self._new_ids
+        if name.startswith("glCreate"):
+            return self._new_id
+        if name in ("glGetUniformLocation", "glGetAttribLocation"):
+            return self._location
+        if name == "glGetShaderiv":
+            return lambda *_: 1
+        if name.endswith("InfoLog"):
+            return lambda *_: b""
+        if name == "glGetString":
+            return lambda *_: b"Recording"
+        if name == "glCheckFramebufferStatus":
+            return lambda *_: pyopengl.GL_FRAMEBUFFER_COMPLETE
+        if name.startswith("glGet") or name.startswith("glIs"):
+            return lambda *_: 0
+        return lambda *_: None
+
+    def __getattr__(self, name: str) -> Any:
+        if not name.startswith("gl"):
+            return getattr(pyopengl, name)
+
+        fake = self._fake(name)
+        counts = self.counts
+
+        def call(*args: Any) -> Any:
+            counts[name] += 1
+            if self.record:
+                self.calls.append(GLCall(name, args, _arg_bytes(args)))
+            return fake(*args)
+
+        # Cache the recorder so later lookups skip __getattr__
+        setattr(self, name, call)
+        return call
+
+
+class CountingBackend:
+    """Wraps a real backend (PyOpenGL by default), counting every GL call"""
+
+    counts: Counter
+    _backend: Any
+
+    def __init__(self, backend: Any = pyopengl) -> None:
+        self._backend = backend
+        self.counts = Counter()
+
+    def reset(self) -> None:
+        self.counts.clear()
+
+    def count(self, name: str) -> int:
+        return self.counts[name]
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._backend, name)
+        if not name.startswith("gl") or not callable(value):
+            return value
+
+        counts = self.counts
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            counts[name] += 1
+            return value(*args, **kwargs)
+
+        setattr(self, name, call)
+        return call
@@ -0,0 +1,278 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from gl_backend import gl
+
+# Texture targets and the queries `GLState.verify` checks them with
+_BINDING_QUERIES = {
+    "GL_TEXTURE_2D": "GL_TEXTURE_BINDING_2D",
+    "GL_TEXTURE_CUBE_MAP": "GL_TEXTURE_BINDING_CUBE_MAP",
+    "GL_TEXTURE_BUFFER": "GL_TEXTURE_BINDING_BUFFER",
+}
+
+_CACHED_FIELDS = (
+    "_program",
+    "_vertex_array",
+    "_array_buffer",
+    "_element_buffers",
+    "_active_texture",
+    "_textures",
+    "_capabilities",
+    "_blend_func",
+    "_depth_mask",
+    "_depth_func",
+    "_color_mask",
+    "_polygon_mode",
+)
+
+
+class GLState:
+    """
+    Cache of the GL state the application changes: bound program, vertex
+    array, buffers and textures, the active texture unit, capabilities, blend
+    function, depth mask and function, color mask and polygon mode. Setters
+    only reach the driver when the value differs from the cached one, and
+    return whether they did.
+
+    Everything starts unknown, so the first call always goes through. Call
+    `invalidate` after changing state behind the tracker's back. With `debug`
+    set, the cache is compared against glGet* after every change.
+    """
+
+    debug: bool
+
+    _program: Optional[int]
+    _vertex_array: Optional[int]
+    _array_buffer: Optional[int]
+    # The element buffer binding is part of the vertex array's state
+    _element_buffers: Dict[Optional[int], Optional[int]]
+    _active_texture: Optional[int]
+    # Bound textures of each unit, by target
+    _textures: Dict[Optional[int], Dict[int, int]]
+    _capabilities: Dict[int, bool]
+    _blend_func: Optional[Tuple[int, int]]
+    _depth_mask: Optional[bool]
+    _depth_func: Optional[int]
+    # Whether all the color channels are written, they're toggled together
+    _color_mask: Optional[bool]
+    _polygon_mode: Optional[int]
+
+    # Caches of the other backends, restored when they come back
+    _saved: "weakref.WeakKeyDictionary[Any, Dict[str, Any]]"
+
+    def __init__(self, debug: bool = False) -> None:
+        self.debug = debug
+        self._saved = weakref.WeakKeyDictionary()
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Forgets everything, the next calls will all reach the driver"""
+        self._program = None
+        self._vertex_array = None
+        self._array_buffer = None
+        self._element_buffers = {}
+        self._active_texture = None
+        self._textures = {}
+        self._capabilities = {}
+        self._blend_func = None
+        self._depth_mask = None
+        self._depth_func = None
+        self._color_mask = None
+        self._polygon_mode = None
+
+    def switch_backend(self, previous: Any, backend: Any) -> None:
+        """Each backend talks to its own context, so each gets its own cache"""
+        self._saved[previous] = {name: getattr(self, name) for name in _CACHED_FIELDS}
+        saved = self._saved.pop(backend, None)
+        if saved is None:
+            self.invalidate()
+        else:
+            for name, value in saved.items():
+                setattr(self, name, value)
+
+    def use_program(self, program: int) -> bool:
+        if program == self._program:
+            return False
+        gl.glUseProgram(program)
+        self._program = program
+        return self._checked()
+
+    def bind_vertex_array(self, vertex_array: int) -> bool:
+        if vertex_array == self._vertex_array:
+            return False
+        gl.glBindVertexArray(vertex_array)
+        self._vertex_array = vertex_array
+        return self._checked()
+
+    def bind_buffer(self, target: int, buffer: int) -> bool:
+        """Binds an array or element array buffer (others aren't cached)"""
+        if target == gl.GL_ARRAY_BUFFER:
+            if buffer == self._array_buffer:
+                return False
+            self._array_buffer = buffer
+        elif target == gl.GL_ELEMENT_ARRAY_BUFFER:
+            if buffer == self._element_buffers.get(self._vertex_array):
+                return False
+            self._element_buffers[self._vertex_array] = buffer
+        gl.glBindBuffer(target, buffer)
+        return self._checked()
+
+    def active_texture(self, unit: int) -> bool:
+        """Selects the texture unit (GL_TEXTURE0 + n)"""
+        if unit == self._active_texture:
+            return False
+        gl.glActiveTexture(unit)
+        self._active_texture = unit
+        return self._checked()
+
+    def bind_texture(self, target: int, texture: int) -> bool:
+        """Binds a texture to the active unit"""
+        bound = self._textures.get(self._active_texture)
+        if bound is None:
+            bound = self._textures[self._active_texture] = {}
+        if bound.get(target) == texture:
+            return False
+        gl.glBindTexture(target, texture)
+        bound[target] = texture
+        return self._checked()
+
+    def set_capability(self, capability: int, enabled: bool) -> bool:
+        """glEnable or glDisable, as needed"""
+        if self._capabilities.get(capability) == enabled:
+            return False
+        if enabled:
+            gl.glEnable(capability)
+        else:
+            gl.glDisable(capability)
+        self._capabilities[capability] = enabled
+        return self._checked()
+
+    def enable(self, capability: int) -> bool:
+        return self.set_capability(capability, True)
+
+    def disable(self, capability: int) -> bool:
+        return self.set_capability(capability, False)
+
+    def blend_func(self, source: int, destination: int) -> bool:
+        if self._blend_func == (source, destination):
+            return False
+        gl.glBlendFunc(source, destination)
+        self._blend_func = (source, destination)
+        return self._checked()
+
+    def depth_mask(self, enabled: bool) -> bool:
+        if self._depth_mask == enabled:
+            return False
+        gl.glDepthMask(gl.GL_TRUE if enabled else gl.GL_FALSE)
+        self._depth_mask = enabled
+        return self._checked()
+
+    def depth_func(self, function: int) -> bool:
+        if self._depth_func == function:
+            return False
+        gl.glDepthFunc(function)
+        self._depth_func = function
+        return self._checked()
+
+    def color_mask(self, enabled: bool) -> bool:
+        if self._color_mask == enabled:
+            return False
+        value = gl.GL_TRUE if enabled else gl.GL_FALSE
+        gl.glColorMask(value, value, value, value)
+        self._color_mask = enabled
+        return self._checked()
+
+    def polygon_mode(self, mode: int) -> bool:
+        """Polygon mode of both faces (GL_FILL, GL_LINE or GL_POINT)"""
+        if mode == self._polygon_mode:
+            return False
+        gl.glPolygonMode(gl.GL_FRONT_AND_BACK, mode)
+        self._polygon_mode = mode
+        return self._checked()
+
+    def forget_texture(self, texture: int) -> None:
+        """Drops a deleted texture from the cache, its name may be reused"""
+        for bound in self._textures.values():
+            for target, bound_texture in list(bound.items()):
+                if bound_texture == texture:
+                    del bound[target]
+
+    def _checked(self) -> bool:
+        if self.debug:
+            mismatches = self.verify()
+            if mismatches:
+                raise RuntimeError("GL state cache is stale: " + "; ".join(mismatches))
+        return True
+
+    def verify(self) -> List[str]:
+        """Compares the cached state against the driver's (needs a real context)"""
+        mismatches: List[str] = []
+
+        def compare(name: str, cached: Any, actual: Any) -> None:
+            if cached is not None and cached != actual:
+                mismatches.append(f"{name} is {actual}, cached {cached}")
+
+        def integer(pname: int) -> int:
+            return int(gl.glGetIntegerv(pname))
+
+        compare("program", self._program, integer(gl.GL_CURRENT_PROGRAM))
+        compare("vertex array", self._vertex_array, integer(gl.GL_VERTEX_ARRAY_BINDING))
+        compare("array buffer", self._array_buffer, integer(gl.GL_ARRAY_BUFFER_BINDING))
+        compare(
+            "element array buffer",
+            self._element_buffers.get(self._vertex_array),
+            integer(gl.GL_ELEMENT_ARRAY_BUFFER_BINDING),
+        )
+        compare("active texture", self._active_texture, integer(gl.GL_ACTIVE_TEXTURE))
+
+        # Only the active unit can be queried without changing it
+        for target, texture in self._textures.get(self._active_texture, {}).items():
+            for target_name, query_name in _BINDING_QUERIES.items():
+                if getattr(gl, target_name) == target:
+                    query = getattr(gl, query_name)
+                    compare(f"texture {target_name}", texture, integer(query))
+
+        for capability, enabled in self._capabilities.items():
+            compare(
+                f"capability {capability}",
+                enabled,
+                bool(gl.glIsEnabled(capability)),
+            )
+
+        if self._blend_func is not None:
+            compare(
+                "blend function",
+                self._blend_func,
+                (integer(gl.GL_BLEND_SRC_RGB), integer(gl.GL_BLEND_DST_RGB)),
+            )
+        compare(
+            "depth mask",
+            self._depth_mask,
+            bool(gl.glGetBooleanv(gl.GL_DEPTH_WRITEMASK)),
+        )
+        compare("depth function", self._depth_func, integer(gl.GL_DEPTH_FUNC))
+        if self._color_mask is not None:
+            compare(
+                "color mask",
+                (self._color_mask,) * 4,
+                tuple(bool(value) for value in gl.glGetBooleanv(gl.GL_COLOR_WRITEMASK)),
+            )
+        if self._polygon_mode is not None:
+            # Core profiles report both faces together
+            compare(
+                "polygon mode",
+                self._polygon_mode,
+                int(gl.glGetIntegerv(gl.GL_POLYGON_MODE)[0]),
+            )
+
+        return mismatches
+
+
+# The state of the current context, shared by every module
+gl_state = GLState()
+gl.add_backend_listener(gl_state.switch_backend)
@@ -0,0 +1,207 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import os
+import sys
+import tracemalloc
+from typing import Dict, Iterable, List, Optional
+
+import glm
+import numpy as np
+
+from assets import load_assets, local_relative_path
+from camera import Camera
+from draw_packets import DrawPackets
+from entity import Entity, EntityStore
+import gl_backend
+from gl_backend import RecordingBackend, use_backend
+from light_source import LightSource
+from material import Material
+from model import Buffers
+from renderer import Renderer
+from shader import Shader
+from skybox import Skybox
+
+VERTEX_SHADER_FILE = local_relative_path("../shaders/phong.vert")
+FRAGMENT_SHADER_FILE = local_relative_path("../shaders/phong.frag")
+SKYBOX_VERTEX_SHADER_FILE = local_relative_path("../shaders/skybox.vert")
+SKYBOX_FRAGMENT_SHADER_FILE = local_relative_path("../shaders/skybox.frag")
+DEPTH_VERTEX_SHADER_FILE = local_relative_path("../shaders/depth.vert")
+DEPTH_FRAGMENT_SHADER_FILE = local_relative_path("../shaders/depth.frag")
+
+# GL calls that only belong to setup code and must never show up in a frame
+SETUP_ONLY_CALLS = (
+    "glGetUniformLocation",
+    "glGetAttribLocation",
+    "glCreateProgram",
+    "glCreateShader",
+    "glCompileShader",
+    "glLinkProgram",
+    "glProgramBinary",
+    "glGenBuffers",
+    "glGenTextures",
+    "glGenVertexArrays",
+    "glGenQueries",
+    "glTexImage2D",
+)
+
+
+class HeadlessScene:
+    """A renderer, camera and entities wired to the recording GL backend"""
+
+    backend: RecordingBackend
+    shader: Shader
+    renderer: Renderer
+    camera: Camera
+    buffers: Buffers
+    materials: Dict[str, Material]
+    entities: List[Entity]
+    # Holds the state of the scene's entities
+    store: EntityStore
+    packets: DrawPackets
+    skybox: Skybox
+    # Draw through the packets instead of entity by entity
+    use_packets: bool
+
+    def __init__(
+        self,
+        model_names: Iterable[str] = ("god", "monster", "boatmobile"),
+        backend: Optional[RecordingBackend] = None,
+        load_textures: bool = True,
+        use_packets: bool = True,
+    ) -> None:
+        self.backend = backend if backend is not None else RecordingBackend()
+
+        with use_backend(self.backend):
+            self.shader = Shader.load_from_files(
+                VERTEX_SHADER_FILE, FRAGMENT_SHADER_FILE
+            )
+            self.materials, models = load_assets(self.shader, model_names)
+
+            light = LightSource(position=np.array([0.0, 5.0, 0.0]))
+            self.store = EntityStore()
+            self.entities = [
+                Entity(
+                    model,
+                    self.store,
+                    position=glm.vec3(4.0 * i, 0.0, 0.0),
+                    light_sources=[light],
+                )
+                for i, model in enumerate(models.values())
+            ]
+
+            self.buffers = Buffers.setup_buffers(models.values())
+            self.buffers.bind(self.shader)
+            if load_textures:
+                Material.setup_all(self.materials.values())
+
+            # A plain sky, converting the texture doesn't change the calls
+            self.skybox = Skybox.load_from_files(
+                SKYBOX_VERTEX_SHADER_FILE, SKYBOX_FRAGMENT_SHADER_FILE, None
+            )
+            depth_shader = Shader.load_from_files(
+                DEPTH_VERTEX_SHADER_FILE, DEPTH_FRAGMENT_SHADER_FILE
+            )
+
+        self.packets = DrawPackets(self.entities)
+        self.use_packets = use_packets
+        self.renderer = Renderer(depth_shader=depth_shader)
+        self.camera = Camera(position=glm.vec3(0.0, 2.0, 10.0), yaw=270.0)
+
+    def render_frame(self) -> None:
+        """Issues a full frame (without updating the entities)"""
+        with use_backend(self.backend):
+            self.renderer.pre_render()
+            if self.use_packets:
+                self.renderer.draw_packets(self.packets, self.camera, self.skybox)
+            else:
+                self.renderer.draw_entities(self.entities, self.camera)
+                self.renderer.draw_skybox(self.skybox, self.camera)
+
+
+def check_frame_calls(scene: HeadlessScene) -> List[str]:
+    """Renders one steady-state frame and returns the call budget violations"""
+    scene.render_frame()
+    scene.backend.reset()
+    scene.render_frame()
+
+    backend = scene.backend
+    violations = []
+
+    programs = {call.args[0] for call in backend.calls_named("glUseProgram")}
+    if backend.count("glUseProgram") > len(programs):
+        violations.append(
+            f"glUseProgram called {backend.count('glUseProgram')} times "
+            f"for {len(programs)} program(s)"
+        )
+
+    for name in SETUP_ONLY_CALLS:
+        if backend.count(name) > 0:
+            violations.append(f"{name} called {backend.count(name)} times in a frame")
+
+    return violations
+
+
+def check_frame_allocations(scene: HeadlessScene, frames: int = 20) -> List[str]:
+    """
+    Renders two windows of steady-state frames under tracemalloc and returns
+    the lines of the assignment's code whose memory grew in both of them,
+    i.e. that keep allocations alive frame after frame. One-off changes (a
+    counter growing past the small int cache) only show up in one window.
+    The recording backend's own bookkeeping (call log and counters) is left
+    out, as it grows by design.
+    """
+    record = scene.backend.record
+    scene.backend.record = False
+
+    # Warm up lazily created state (counters, cached GL entry points, ...)
+    for _ in range(3):
+        scene.render_frame()
+
+    source_filters = [
+        tracemalloc.Filter(True, os.path.join(os.path.dirname(__file__), "*")),
+        tracemalloc.Filter(False, gl_backend.__file__),
+    ]
+    tracemalloc.start()
+    snapshots = []
+    for _ in range(3):
+        snapshots.append(tracemalloc.take_snapshot().filter_traces(source_filters))
+        for _ in range(frames):
+            scene.render_frame()
+    tracemalloc.stop()
+    scene.backend.record = record
+
+    first, second, third = snapshots
+    grown = {
+        str(stat.traceback): stat
+        for stat in second.compare_to(first, "lineno")
+        if stat.size_diff > 0
+    }
+    return [
+        f"{stat.traceback}: {stat.size_diff} bytes in {stat.count_diff} blocks "
+        f"kept per {frames} frames"
+        for stat in third.compare_to(second, "lineno")
+        if stat.size_diff > 0 and str(stat.traceback) in grown
+    ]
+
+
+def main() -> int:
+    scene = HeadlessScene()
+    violations = check_frame_calls(scene)
+
+    for name, count in scene.backend.counts.most_common():
+        print(f"{name:<28} {count}")
+    print(f"{'payload bytes':<28} {scene.backend.total_bytes()}")
+
+    violations += check_frame_allocations(scene)
+
+    for violation in violations:
+        print(f"FAIL: {violation}")
+
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
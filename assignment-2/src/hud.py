@@ -0,0 +1,249 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import Any, List, Optional, cast
+
+import glfw
+import numpy as np
+from gl_backend import gl
+from gl_state import gl_state
+from PIL import Image, ImageDraw, ImageFont
+
+from render_stats import RenderStats
+from shader import Shader
+
+FIRST_CHAR = 32
+LAST_CHAR = 126
+ATLAS_COLUMNS = 16
+
+# Each glyph is a quad of two triangles with (x, y, u, v) per vertex
+FLOATS_PER_VERTEX = 4
+VERTICES_PER_GLYPH = 6
+
+
+class BitmapFont:
+    """A font rasterized once into a texture atlas of fixed size cells"""
+
+    texture_id: int
+    cell_width: int
+    cell_height: int
+    advances: np.ndarray
+    uvs: np.ndarray
+
+    def __init__(self, font: Any = None) -> None:
+        if font is None:
+            font = ImageFont.load_default()
+
+        chars = [chr(c) for c in range(FIRST_CHAR, LAST_CHAR + 1)]
+        boxes = [font.getbbox(c) for c in chars]
+        self.cell_width = max(box[2] for box in boxes) + 1
+        self.cell_height = max(box[3] for box in boxes) + 1
+
+        rows = (len(chars) + ATLAS_COLUMNS - 1) // ATLAS_COLUMNS
+        width = self.cell_width * ATLAS_COLUMNS
+        height = self.cell_height * rows
+
+        # Rasterize every glyph in its own cell
+        atlas = Image.new("RGBA", (width, height), (255, 255, 255, 0))
+        draw = ImageDraw.Draw(atlas)
+        self.advances = np.zeros(LAST_CHAR + 1, dtype=np.float32)
+        self.uvs = np.zeros((LAST_CHAR + 1, 4), dtype=np.float32)
+        for i, c in enumerate(chars):
+            x = (i % ATLAS_COLUMNS) * self.cell_width
+            y = (i // ATLAS_COLUMNS) * self.cell_height
+            draw.text((x, y), c, font=font, fill=(255, 255, 255, 255))
+
+            code = ord(c)
+            self.advances[code] = font.getlength(c)
+            # Texture is uploaded flipped, so v grows upwards
+            self.uvs[code] = (
+                x / width,
+                1.0 - (y + self.cell_height) / height,
+                (x + self.cell_width) / width,
+                1.0 - y / height,
+            )
+
+        self.texture_id = self._upload(atlas)
+
+    @staticmethod
+    def _upload(atlas: Image.Image) -> int:
+        texture = cast(int, gl.glGenTextures(1))
+        gl_state.bind_texture(gl.GL_TEXTURE_2D, texture)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+        gl.glTexImage2D(
+            gl.GL_TEXTURE_2D,
+            0,
+            gl.GL_RGBA,
+            atlas.width,
+            atlas.height,
+            0,
+            gl.GL_RGBA,
+            gl.GL_UNSIGNED_BYTE,
+            atlas.tobytes("raw", "RGBA", 0, -1),
+        )
+        return texture
+
+
+class TextRenderer:
+    """Draws any amount of text with a single draw call"""
+
+    font: BitmapFont
+    shader: Shader
+    vao: int
+    vertex_buffer: int
+    scale: float
+
+    viewport_loc: Any
+    color_loc: Any
+
+    def __init__(self, shader: Shader, font: BitmapFont, scale: float = 1.0) -> None:
+        self.font = font
+        self.shader = shader
+        self.scale = scale
+        self.viewport_loc = gl.glGetUniformLocation(shader.program_id, "u_viewport")
+        self.color_loc = gl.glGetUniformLocation(shader.program_id, "u_color")
+
+        # The text gets its own vertex array so it doesn't touch the scene's
+        self.vao = cast(int, gl.glGenVertexArrays(1))
+        self.vertex_buffer = cast(int, gl.glGenBuffers(1))
+        gl_state.bind_vertex_array(self.vao)
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, self.vertex_buffer)
+
+        stride = FLOATS_PER_VERTEX * 4
+        loc = gl.glGetAttribLocation(shader.program_id, "position")
+        gl.glEnableVertexAttribArray(loc)
+        gl.glVertexAttribPointer(
+            loc, 2, gl.GL_FLOAT, False, stride, gl.ctypes.c_void_p(0)
+        )
+        loc = gl.glGetAttribLocation(shader.program_id, "texture_coord")
+        gl.glEnableVertexAttribArray(loc)
+        gl.glVertexAttribPointer(
+            loc, 2, gl.GL_FLOAT, False, stride, gl.ctypes.c_void_p(8)
+        )
+
+    def build_vertices(self, lines: List[str], x: float, y: float) -> np.ndarray:
+        """Lays out the lines (top-left anchored, in pixels) into quad vertices"""
+        font = self.font
+        codes = [
+            [min(max(ord(c), FIRST_CHAR), LAST_CHAR) for c in line] for line in lines
+        ]
+        glyph_count = sum(len(line) for line in codes)
+        vertices = np.empty(
+            (glyph_count, VERTICES_PER_GLYPH, FLOATS_PER_VERTEX), dtype=np.float32
+        )
+
+        w = font.cell_width * self.scale
+        h = font.cell_height * self.scale
+        glyph = 0
+        for row, line in enumerate(codes):
+            if not line:
+                continue
+            line_codes = np.array(line)
+            count = len(line)
+            advances = font.advances[line_codes] * self.scale
+            x0 = x + np.concatenate([[0.0], np.cumsum(advances[:-1])])
+            x1 = x0 + w
+            y0 = np.full(count, y + row * h)
+            y1 = y0 + h
+            u0, v0, u1, v1 = font.uvs[line_codes].T
+
+            quads = vertices[glyph : glyph + count]
+            # Two triangles: (0, 1, 2) and (0, 2, 3), counter-clockwise on screen
+            quads[:, 0] = np.stack([x0, y1, u0, v0], axis=1)
+            quads[:, 1] = np.stack([x1, y1, u1, v0], axis=1)
+            quads[:, 2] = np.stack([x1, y0, u1, v1], axis=1)
+            quads[:, 3] = quads[:, 0]
+            quads[:, 4] = quads[:, 2]
+            quads[:, 5] = np.stack([x0, y0, u0, v1], axis=1)
+            glyph += count
+
+        return vertices.reshape(-1, FLOATS_PER_VERTEX)
+
+    def draw(
+        self,
+        lines: List[str],
+        viewport: tuple[int, int],
+        x: float = 8.0,
+        y: float = 8.0,
+        color: tuple[float, float, float, float] = (1.0, 1.0, 1.0, 1.0),
+        stats: Optional[RenderStats] = None,
+    ) -> None:
+        """Uploads and draws all the given lines at once"""
+        vertices = self.build_vertices(lines, x, y)
+        if len(vertices) == 0:
+            return
+
+        program_switched = self.shader.use()
+        gl.glUniform2f(self.viewport_loc, *viewport)
+        gl.glUniform4f(self.color_loc, *color)
+
+        gl_state.bind_vertex_array(self.vao)
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, self.vertex_buffer)
+        gl.glBufferData(
+            gl.GL_ARRAY_BUFFER, vertices.nbytes, vertices, gl.GL_STREAM_DRAW
+        )
+        texture_bound = gl_state.bind_texture(gl.GL_TEXTURE_2D, self.font.texture_id)
+
+        # Text is an overlay: no depth and always filled
+        gl_state.disable(gl.GL_DEPTH_TEST)
+        gl_state.polygon_mode(gl.GL_FILL)
+        gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(vertices))
+        gl_state.enable(gl.GL_DEPTH_TEST)
+
+        if stats is not None:
+            stats.program_switches += program_switched
+            stats.uniform_uploads += 2
+            stats.buffer_uploads += 1
+            stats.texture_binds += texture_bound
+            stats.record_draw(gl.GL_TRIANGLES, len(vertices))
+
+
+class StatsHud:
+    """Toggleable overlay with the renderer's statistics"""
+
+    text: TextRenderer
+    visible: bool
+    toggle_key: int
+
+    def __init__(
+        self,
+        text: TextRenderer,
+        visible: bool = False,
+        toggle_key: int = glfw.KEY_F3,
+    ) -> None:
+        self.text = text
+        self.visible = visible
+        self.toggle_key = toggle_key
+
+    @staticmethod
+    def load_from_files(
+        vertex_file: str, fragment_file: str, scale: float = 1.0
+    ) -> "StatsHud":
+        """Builds the HUD with a text shader loaded from a .vert and .frag file"""
+        shader = Shader.load_from_files(vertex_file, fragment_file)
+        return StatsHud(TextRenderer(shader, BitmapFont(), scale))
+
+    def key_handler(
+        self,
+        win: Any,
+        key: int,
+        scancode: int,
+        action: int,
+        mods: int,
+    ) -> None:
+        """Handles the keyboard event to show and hide the HUD"""
+        if key == self.toggle_key and action == glfw.PRESS:
+            self.visible = not self.visible
+
+    def draw(self, win: Any, stats: RenderStats) -> None:
+        """Draws the stats of the frame so far, the HUD's own cost included after"""
+        if not self.visible:
+            return
+
+        viewport = glfw.get_framebuffer_size(win)
+        self.text.draw(stats.lines(), viewport, stats=stats)
@@ -0,0 +1,202 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from entity import Entity
+from light_source import MAX_LIGHTS, LightSource
+from mesh_cache import MeshCache
+from model import BAKED_FLOATS, Buffers, Model
+
+# Longest edge (world space) left in baked models, so the lighting, linearly
+# interpolated between vertices, still follows the falloff over large faces
+BAKE_MAX_EDGE = 1.0
+
+
+def _light_key(light: LightSource) -> Tuple[Any, ...]:
+    return (
+        np.asarray(light.position, dtype=np.float64).tobytes(),
+        np.asarray(light.color, dtype=np.float64).tobytes(),
+        np.asarray(light.decay_coefs, dtype=np.float64).tobytes(),
+        float(light.intensity_d),
+        float(light.intensity_s),
+    )
+
+
+def bake_vertices(
+    positions: np.ndarray, normals: np.ndarray, lights: Iterable[LightSource]
+) -> np.ndarray:
+    """
+    The lighting of world space vertices, vertices x BAKED_FLOATS: the sum of
+    phong.frag's diffuse term without the material's color, the lights'
+    direction weighted by their brightness, and the attenuated color of
+    their highlights. The shader adds the material and the highlight, which
+    depends on the view
+    """
+    positions = positions.astype(np.float64)
+    normals = normals.astype(np.float64)
+    normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+
+    baked = np.zeros((len(positions), BAKED_FLOATS))
+    diffuse, direction, specular = baked[:, 0:3], baked[:, 3:6], baked[:, 6:9]
+    for light in lights:
+        to_light = np.asarray(light.position, dtype=np.float64) - positions
+        distance = np.linalg.norm(to_light, axis=1)
+        light_dir = to_light / np.maximum(distance, 1e-12)[:, None]
+
+        constant, linear, quadratic = np.asarray(light.decay_coefs, dtype=np.float64)
+        attenuation = np.clip(
+            1.0 / (constant + linear * distance + quadratic * distance**2), 0.0, 1.0
+        )
+        color = np.asarray(light.color, dtype=np.float64)
+        diff = np.maximum(np.sum(normals * light_dir, axis=1), 0.0)
+
+        diffuse += (diff * attenuation)[:, None] * color * light.intensity_d
+        highlight = attenuation[:, None] * color * light.intensity_s
+        specular += highlight
+        direction += light_dir * highlight.mean(axis=1)[:, None]
+    return baked.astype(np.float32)
+
+
+class LightBaker:
+    """
+    Bakes the static lights into the vertices of the static entities they
+    light, so the BAKED_LIGHTING shader variants only loop over the lights
+    that move. Diffuse lighting is stored as is, highlights as the lights'
+    summed direction and color, and phong.frag shades them for the view.
+
+    Baked models are first subdivided (see `Model.subdivide`), then baked
+    with `model_matrix` placing them in the world, the same as the
+    renderer's. Results are cached by the geometry, placement and lights
+    they came from, and `refresh` bakes again when a light or an entity
+    changes. Models shared by several entities are never baked, their
+    lighting would differ.
+    """
+
+    # Entities with baked lights
+    entities: List[Entity]
+    max_edge: float
+    cache: Optional[MeshCache]
+    # Times a model was baked (not found in the cache)
+    bakes: int
+
+    _model_matrix: Callable[[Entity], np.ndarray]
+    _signatures: Dict[int, Tuple[Any, ...]]
+
+    def __init__(
+        self,
+        entities: Iterable[Entity],
+        model_matrix: Callable[[Entity], np.ndarray],
+        cache: Optional[MeshCache] = None,
+        max_edge: float = BAKE_MAX_EDGE,
+    ) -> None:
+        entities = list(entities)
+        self._model_matrix = model_matrix
+        self.cache = cache
+        self.max_edge = max_edge
+        self.bakes = 0
+        self._signatures = {}
+
+        users: Dict[int, int] = {}
+        for entity in entities:
+            for model in self._levels(entity):
+                users[id(model)] = users.get(id(model), 0) + 1
+        self.entities = [
+            entity
+            for entity in entities
+            if entity.static
+            and not entity.ignore_lighting
+            and self._static_lights(entity)
+            and all(users[id(model)] == 1 for model in self._levels(entity))
+        ]
+
+    @staticmethod
+    def _levels(entity: Entity) -> List[Model]:
+        """The models owning the vertex data of each level of the entity"""
+        return [
+            model if model.source is None else model.source
+            for model in [entity.model] + entity.model.lods
+        ]
+
+    @staticmethod
+    def _static_lights(entity: Entity) -> List[LightSource]:
+        """The lights to bake, among those the renderer would draw with"""
+        return [light for light in entity.light_sources[:MAX_LIGHTS] if light.static]
+
+    def _signature(self, entity: Entity) -> Tuple[Any, ...]:
+        return (
+            entity.model,
+            self._model_matrix(entity).tobytes(),
+            tuple(
+                (id(light), light.static) + _light_key(light)
+                for light in entity.light_sources[:MAX_LIGHTS]
+            ),
+        )
+
+    def prepare(self, optimize: bool = True) -> None:
+        """
+        Subdivides and bakes the models, before the buffers are set up. With
+        `optimize`, subdivided models go through `Model.optimize` again
+        """
+        for entity in self.entities:
+            scale = max(abs(float(axis)) for axis in entity.scale)
+            entity.model.subdivide(self.max_edge / scale, self.cache, optimize)
+            self._bake(entity)
+
+    def _bake(self, entity: Entity) -> None:
+        lights = self._static_lights(entity)
+        matrix = self._model_matrix(entity).astype(np.float64)
+        normal_matrix = np.linalg.inv(matrix[:3, :3]).T
+
+        for model in self._levels(entity):
+            key = None
+            baked = None
+            if self.cache is not None:
+                key = self.cache.key(
+                    "bake",
+                    model.vertices,
+                    model.normals,
+                    matrix,
+                    [_light_key(light) for light in lights],
+                )
+                arrays = self.cache.load(key, "baked")
+                baked = None if arrays is None else arrays["baked"]
+            if baked is None:
+                baked = bake_vertices(
+                    model.vertices @ matrix[:3, :3].T + matrix[:3, 3],
+                    model.normals @ normal_matrix.T,
+                    lights,
+                )
+                self.bakes += 1
+                if self.cache is not None and key is not None:
+                    self.cache.store(key, {"baked": baked})
+            model.baked = baked
+
+        entity.baked_lights = lights
+        self._signatures[id(entity)] = self._signature(entity)
+
+    def refresh(self, buffers: Buffers) -> bool:
+        """
+        Bakes again, and uploads, the entities whose lights or placement
+        changed. Entities whose model changed lose their baked lights, the
+        new model was never subdivided. Returns whether anything changed
+        """
+        changed = False
+        for entity in list(self.entities):
+            signature = self._signature(entity)
+            if signature == self._signatures.get(id(entity)):
+                continue
+            changed = True
+            if entity.model is not self._signatures[id(entity)][0]:
+                entity.baked_lights = []
+                self.entities.remove(entity)
+                del self._signatures[id(entity)]
+                continue
+            self._bake(entity)
+            for model in self._levels(entity):
+                buffers.update_baked(model)
+        return changed
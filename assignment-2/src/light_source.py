@@ -1,5 +1,8 @@
 import numpy as np
 
+# Must match MAX_LIGHTS in phong.frag
+MAX_LIGHTS = 4
+
 
 class LightSource:
     position: np.ndarray
@@ -7,6 +10,9 @@ class LightSource:
     intensity_d: float
     intensity_s: float
     decay_coefs = np.ndarray
+    # Whether the light never moves nor changes, so it can be baked into the
+    # static entities it lights (see `light_baker.LightBaker`)
+    static: bool
 
     def __init__(
         self,
@@ -15,6 +21,7 @@ class LightSource:
         intensity_d: float = 1.0,
         intensity_s: float = 1.0,
         decay_coefs=np.array([1.0, 0, 0]),
+        static: bool = False,
     ):
 
         self.position = position
@@ -22,3 +29,4 @@ class LightSource:
         self.intensity_d = intensity_d
         self.intensity_s = intensity_s
         self.decay_coefs = decay_coefs
+        self.static = static
@@ -4,7 +4,7 @@
 # Samuel Figueiredo Veronez - 12542626
 
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import random
 import numpy as np
@@ -12,13 +12,27 @@ import glfw
 import glm
 
 from camera import Camera
+from gl_backend import CountingBackend, set_backend
+from gl_state import gl_state
 from renderer import Renderer
+from draw_packets import DrawPackets
+from hud import StatsHud
+from skybox import Skybox
 from window import KeyHandler, init_window, setup_events, closer_handler
 from light_source import LightSource
 from material import Material
 from shader import Shader
+from program_cache import ProgramCache
+from mesh_cache import MeshCache
 from model import Buffers, Model
-from entity import Entity, Skybox, OkuuFumo, SelectableEntity, GlowingEntity
+from occlusion import OcclusionCuller, Occluder
+from cells import CellGraph
+from light_baker import LightBaker
+from quality_governor import GpuFrameTimer, QualityGovernor
+from render_target import RenderTarget
+from simulation import FixedTimestep, StateInterpolator
+from redraw import RedrawScheduler
+from entity import Entity, EntityStore, OkuuFumo, SelectableEntity, GlowingEntity
 
 
 def local_relative_path(path: str) -> str:
@@ -26,9 +40,53 @@ def local_relative_path(path: str) -> str:
 
 
 LOG_FPS = True
+# Wraps PyOpenGL to log how many times each GL function is called per second
+LOG_GL_CALLS = False
+# Checks the GL state cache against the driver after every change (slow)
+DEBUG_GL_STATE = False
+# Reorder each model's faces at load time so every material is one segment
+GROUP_MATERIALS = True
+# Index and reorder each model's triangles for the vertex cache and overdraw
+OPTIMIZE_MESHES = True
+# Models that get simplified levels of detail, drawn when they look small
+LOD_MODELS = ("spongebob", "shion", "monster", "krabbypatty", "boatmobile")
+# Entities whose walls hide the others from the CPU occlusion culling, empty
+# to turn it off
+OCCLUDERS = ("map_internal",)
+# Bake the static lights into the static entities, for the shader variants.
+# Pays off with several static lights on the same faces: with the single one
+# here, the subdivided vertices cost more than the lighting saved
+BAKE_LIGHTING = False
+# Wait for the display's refresh to show each frame, False to draw as many
+# frames as possible. The simulation runs at SIMULATION_RATE either way
+VSYNC = True
+# Only draw frames after input, or while something animates (T pauses the
+# entities' animations), sleeping until the next event otherwise
+ON_DEMAND_REDRAW = True
+# Time each frame should fit in: the governor lowers the render scale,
+# multisampling, detail and lights while frames take longer. None keeps the
+# window's 4x multisampling at full resolution
+FRAME_BUDGET: Optional[float] = 1 / 60
+# Cells of the scene and the portals between them, None to draw every cell
+CELLS_FILE = local_relative_path("../models/burgerpiz/cells.json")
 
 VERTEX_SHADER_FILE = local_relative_path("../shaders/phong.vert")
 FRAGMENT_SHADER_FILE = local_relative_path("../shaders/phong.frag")
+HUD_VERTEX_SHADER_FILE = local_relative_path("../shaders/hud.vert")
+HUD_FRAGMENT_SHADER_FILE = local_relative_path("../shaders/hud.frag")
+SKYBOX_VERTEX_SHADER_FILE = local_relative_path("../shaders/skybox.vert")
+SKYBOX_FRAGMENT_SHADER_FILE = local_relative_path("../shaders/skybox.frag")
+DEPTH_VERTEX_SHADER_FILE = local_relative_path("../shaders/depth.vert")
+DEPTH_FRAGMENT_SHADER_FILE = local_relative_path("../shaders/depth.frag")
+# Draw the opaque geometry's depth before shading it: True, False, or None to
+# decide from the measured overdraw
+DEPTH_PREPASS = None
+# Equirectangular sky, converted into a cube map when loading
+SKYBOX_TEXTURE_FILE = local_relative_path("../textures/skybox.jpg")
+# Linked shader programs are saved here, set to None to always compile
+SHADER_CACHE_DIR = local_relative_path("../.shader_cache")
+# Optimized meshes are saved here, set to None to always optimize
+MESH_CACHE_DIR = local_relative_path("../.mesh_cache")
 
 
 def debug_camera_handler(
@@ -119,32 +177,50 @@ def god_inside_animation(entity, dt):
     entity.scale = glm.vec3(0.1) + glm.vec3(0.01) * (random.random() - 0.5)
 
 
-def god_outside_animation(entity, _):
-    """
-    Animation for the god outside the building.
-    """
-    time = glfw.get_time()
-    rate = 0.2
-    radius = 50
-    entity.position = glm.vec3(12, 16, 55) + glm.vec3(
-        radius * np.cos(rate * np.pi * time),
-        0,
-        radius * np.sin(rate * np.pi * time),
-    )
-
-
 def main():
 
+    gl_counter = CountingBackend()
+    if LOG_GL_CALLS:
+        set_backend(gl_counter)
+    gl_state.debug = DEBUG_GL_STATE
+
     # Configure window
-    win = init_window("Eldrich Horrors Beyond Your Comprehension :D", 1280, 720)
+    # With the governor, multisampling happens in the render target instead
+    win = init_window(
+        "Eldrich Horrors Beyond Your Comprehension :D",
+        1280,
+        720,
+        samples=4 if FRAME_BUDGET is None else 0,
+        vsync=VSYNC,
+    )
 
     # Load and compile shaders
-    main_shader = Shader.load_from_files(VERTEX_SHADER_FILE, FRAGMENT_SHADER_FILE)
+    shader_cache = ProgramCache(SHADER_CACHE_DIR) if SHADER_CACHE_DIR else None
+    main_shader = Shader.load_from_files(
+        VERTEX_SHADER_FILE, FRAGMENT_SHADER_FILE, shader_cache
+    )
+
+    depth_shader = Shader.load_from_files(
+        DEPTH_VERTEX_SHADER_FILE, DEPTH_FRAGMENT_SHADER_FILE, shader_cache
+    )
 
     # Create the renderer
     renderer = Renderer(
         ambient_color=np.array([1.0, 1.0, 1.0, 1.0], dtype=np.float32),
         ambient_intensity=0.1,
+        depth_shader=depth_shader,
+        depth_prepass=DEPTH_PREPASS,
+    )
+
+    # Create the stats HUD (toggled with F3)
+    hud = StatsHud.load_from_files(HUD_VERTEX_SHADER_FILE, HUD_FRAGMENT_SHADER_FILE)
+
+    # Create the sky, drawn after the opaque geometry
+    skybox = Skybox.load_from_files(
+        SKYBOX_VERTEX_SHADER_FILE,
+        SKYBOX_FRAGMENT_SHADER_FILE,
+        SKYBOX_TEXTURE_FILE,
+        cache=shader_cache,
     )
 
     # Create the camera
@@ -163,9 +239,6 @@ def main():
         **Material.load_mtllib(
             main_shader, local_relative_path("../models/monstro.mtl"), "monster-"
         ),
-        **Material.load_mtllib(
-            main_shader, local_relative_path("../models/skybox.mtl"), "sb"
-        ),
         **Material.load_mtllib(
             main_shader,
             local_relative_path("../models/burgerpiz/inner.mtl"),
@@ -209,9 +282,16 @@ def main():
     }
 
     # Load all models
+    mesh_cache = MeshCache(MESH_CACHE_DIR) if MESH_CACHE_DIR else None
     models: Dict[str, Model] = {
         **Model.load_obj(
-            local_relative_path("../models/12lados.obj"), materials, "god", "god"
+            local_relative_path("../models/12lados.obj"),
+            materials,
+            "god",
+            "god",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
         # Monstro, my beloved
         **Model.load_obj(
@@ -219,70 +299,95 @@ def main():
             materials,
             "monster-",
             "monster",
-        ),
-        **Model.load_obj(
-            local_relative_path("../models/skybox.obj"),
-            materials,
-            "sb",
-            "skybox",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
         **Model.load_obj(
             local_relative_path("../models/burgerpiz/inner.obj"),
             materials,
             "burgerpiz-inner-",
             "burgerpiz_inner",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
         **Model.load_obj(
             local_relative_path("../models/burgerpiz/outer.obj"),
             materials,
             "burgerpiz-",
             "burgerpiz_outer",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
         **Model.load_obj(
             local_relative_path("../models/okuu_fumo.obj"),
             materials,
             "okuufumo-",
             "okuu_fumo",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
         **Model.load_obj(
             local_relative_path("../models/boatmobile.obj"),
             materials,
             "boatmobile-",
             "boatmobile",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
         **Model.load_obj(
             local_relative_path("../models/krabbypatty.obj"),
             materials,
             "krabbypatty-",
             "krabbypatty",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
         **Model.load_obj(
             local_relative_path("../models/shion.obj"),
             materials,
             "shion-",
             "shion",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
         **Model.load_obj(
             local_relative_path("../models/spongebob.obj"),
             materials,
             "spongebob-",
             "spongebob",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
         **Model.load_obj(
             local_relative_path("../models/squidward_house.obj"),
             materials,
             "squidhouse-",
             "squidward_house",
+            group_materials=GROUP_MATERIALS,
+            optimize=OPTIMIZE_MESHES,
+            mesh_cache=mesh_cache,
         ),
     }
+    for name in LOD_MODELS:
+        models[name].build_lods(cache=mesh_cache, optimize=OPTIMIZE_MESHES)
 
     # Create light sources
+    # The god inside only spins, its light never moves
     internal_source = LightSource(
         position=np.array([0.0, 0.0, 0.0]),
         color=np.array([0.6, 0.6, 1.0]),
         intensity_d=1.0,
         intensity_s=1.0,
         decay_coefs=np.array([1.0, 0.01, 0.01]),
+        static=True,
     )
 
     external_source = LightSource(
@@ -293,18 +398,20 @@ def main():
         decay_coefs=np.array([1.0, 0.01, 0]),
     )
 
-    # Create entities
+    # Create entities, their state lives in the store
+    store = EntityStore()
     entities: Dict[str, Entity] = {
         "god_outside": GlowingEntity(
             models["god"],
+            store,
             position=glm.vec3(12, 10, 55),
             scale=glm.vec3(3),
             light_source=external_source,
             ignore_lighting=True,
-            animator=god_outside_animation,
         ),
         "god_inside": GlowingEntity(
             models["god"],
+            store,
             position=glm.vec3(3.5, 1.85, 15),
             scale=glm.vec3(0.1),
             light_source=internal_source,
@@ -315,14 +422,15 @@ def main():
             glfw.KEY_1,
             "monster",
             models["monster"],
+            store,
             position=glm.vec3(-1.5, 0, 7.6),
             scale=glm.vec3(0.5),
             log_position=True,
             light_sources=[internal_source],
         ),
-        "skybox": Skybox(models["skybox"]),
         "okuufumo": OkuuFumo(
             models["okuu_fumo"],
+            store,
             position=glm.vec3(3.5, 0.85, 15),
             light_sources=[internal_source],
         ),
@@ -330,6 +438,7 @@ def main():
             glfw.KEY_2,
             "boatmobile",
             models["boatmobile"],
+            store,
             position=glm.vec3(2, 0.4, 50),
             angle_y=-90.0,
             log_position=True,
@@ -339,6 +448,7 @@ def main():
             glfw.KEY_3,
             "krabbypatty",
             models["krabbypatty"],
+            store,
             position=glm.vec3(1.5, 6.8, 23),
             scale=glm.vec3(1.2),
             log_position=True,
@@ -348,6 +458,7 @@ def main():
             glfw.KEY_4,
             "shion",
             models["shion"],
+            store,
             position=glm.vec3(2.5, 1.35, 11),
             scale=glm.vec3(0.1),
             angle_y=-90.0,
@@ -358,6 +469,7 @@ def main():
             glfw.KEY_5,
             "spongebob",
             models["spongebob"],
+            store,
             position=glm.vec3(2, 1, 4.94),
             scale=glm.vec3(1.66),
             angle_y=90,
@@ -368,6 +480,7 @@ def main():
             glfw.KEY_6,
             "squidward_house",
             models["squidward_house"],
+            store,
             position=glm.vec3(-11, 0, 43),
             scale=glm.vec3(1.8),
             log_position=True,
@@ -375,6 +488,7 @@ def main():
         ),
         "okuufumo-ee": OkuuFumo(
             models["okuu_fumo"],
+            store,
             position=glm.vec3(-11, 2, 43),
             rotation_speed=3600,
             scale=glm.vec3(4),
@@ -383,22 +497,54 @@ def main():
         ),
         "map_internal": Entity(
             models["burgerpiz_inner"],
+            store,
             position=glm.vec3(0, -0.02, 0),
             light_sources=[internal_source],
+            static=True,
         ),
         "map_external": Entity(
             models["burgerpiz_outer"],
+            store,
             position=glm.vec3(0, -0.02, 0),
             light_sources=[external_source],
+            static=True,
         ),
     }
 
+    # The god outside circles the building, moved by the entity store's
+    # systems along with everything else that animates
+    entities["god_outside"].orbit(glm.vec3(12, 16, 55), 50, 0.2 * np.pi)
+
+    # Load textures
+    Material.setup_all(materials.values())
+
+    # Occluders are picked by their materials' transparency, known once the
+    # textures are loaded, and keep the large triangles from before baking
+    # subdivides them
+    if OCCLUDERS:
+        renderer.occlusion = OcclusionCuller(
+            [Occluder.from_entity(entities[name]) for name in OCCLUDERS]
+        )
+
+    baker: Optional[LightBaker] = None
+    if BAKE_LIGHTING:
+        # The god inside has to be in place for its light to be baked
+        store.update(0.0, camera)
+        baker = LightBaker(entities.values(), renderer._model_matrix, mesh_cache)
+        baker.prepare(OPTIMIZE_MESHES)
+
     # Load buffers
     buffers = Buffers.setup_buffers(models.values())
     buffers.bind(main_shader)
 
-    # Load textures
-    Material.setup_all(materials.values())
+    # Compile the draws of the scene (rebuilt whenever an entity changes model)
+    packets = DrawPackets(list(entities.values()))
+    if CELLS_FILE is not None:
+        renderer.cells = CellGraph.load(CELLS_FILE)
+        renderer.cells.pin(entities)
+
+    # Decides which frames are worth drawing
+    redraw = RedrawScheduler(entities.values(), camera, enabled=ON_DEMAND_REDRAW)
 
     # Setup events
     setup_events(
@@ -407,22 +553,43 @@ def main():
         key_handlers=[
             closer_handler,
             renderer.key_handler,
+            hud.key_handler,
             camera.key_handler,
             debug_camera_handler(camera),
             light_handler(renderer, [internal_source, external_source]),
+            redraw.key_handler,
         ],
-        cursor_handlers=[camera.cursor_handler],
+        cursor_handlers=[camera.cursor_handler, redraw.cursor_handler],
     )
+    glfw.set_window_refresh_callback(win, redraw.refresh_handler)
+
+    # Adapt the quality to the frame budget
+    governor = QualityGovernor(FRAME_BUDGET) if FRAME_BUDGET is not None else None
+    target = RenderTarget()
+    gpu_timer = GpuFrameTimer()
+    cpu_time = 0.0
 
     # Show window
     glfw.show_window(win)
 
+    # The simulation runs in fixed steps, frames are drawn between the last two
+    timestep = FixedTimestep()
+    interpolator = StateInterpolator(entities.values(), camera)
+
     # Main loop
     renderer.init()
     last_render = glfw.get_time()
     last_fps = last_render
     frame_count = 0
     while not glfw.window_should_close(win):
+        # Sleep until there's something new to draw
+        if not redraw.due():
+            redraw.wait()
+            # Nothing moved meanwhile, the idle time isn't simulated
+            last_render = last_fps = glfw.get_time()
+            frame_count = 0
+            continue
+
         # Keep track of elapsed time
         current_time = glfw.get_time()
         delta_time = current_time - last_render
@@ -432,6 +599,9 @@ def main():
                 print(
                     f"FPS: {frame_count}; Frame Time: {(current_time - last_fps) / frame_count * 1000:.4}ms"
                 )
+                if LOG_GL_CALLS:
+                    print(f"GL calls: {dict(gl_counter.counts.most_common())}")
+                    gl_counter.reset()
                 frame_count = 0
                 last_fps = glfw.get_time()
             else:
@@ -440,20 +610,44 @@ def main():
         # Get the events
         glfw.poll_events()
 
-        # Update the camera
-        camera.update(win, main_shader, delta_time)
+        # Simulate the steps due since the last frame
+        for _ in range(timestep.advance(delta_time)):
+            interpolator.save()
+
+            # Update the camera
+            camera.update(win, main_shader, timestep.step)
 
-        # Update elements
-        for entity in entities.values():
-            entity.update(delta_time, camera)
+            # Update elements
+            if not redraw.paused:
+                store.update(timestep.step, camera)
+        if baker is not None and baker.refresh(buffers):
+            redraw.request()
+
+        # Pick the quality from the last frames' cost
+        if governor is not None:
+            governor.update(cpu_time, gpu_timer.poll())
+            governor.apply(renderer, target)
+            gpu_timer.begin()
 
         # Clear the screen
+        window_size = glfw.get_framebuffer_size(win)
+        target.begin(window_size)
         renderer.pre_render()
 
-        # Render elements
-        for entity in entities.values():
-            renderer.draw_entity(entity, camera)
+        # Render elements, where they are between the last two steps
+        with interpolator.blend(timestep.alpha):
+            renderer.draw_packets(packets, camera, skybox)
+        target.end(window_size)
+
+        # Draw the HUD over the scene
+        renderer.stats.frame_time = delta_time
+        if governor is not None:
+            gpu_timer.end()
+            governor.report(renderer.stats)
+        hud.draw(win, renderer.stats)
 
+        # Swapping waits for vsync, the frame's own work ends here
+        cpu_time = glfw.get_time() - current_time
         glfw.swap_buffers(win)
         last_render = current_time
 
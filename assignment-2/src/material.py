@@ -3,16 +3,40 @@
 # D. H. Lelis - 12543822
 # Samuel Figueiredo Veronez - 12542626
 
-from typing import Optional, Iterable
+from typing import Dict, Optional, Iterable, Tuple
 
 import numpy as np
 from glfw import os
-import OpenGL.GL as gl
+from gl_backend import gl
+from gl_state import gl_state
 from PIL import Image
 
+from light_source import MAX_LIGHTS
 from shader import Shader
 from wavefront import load_mtllib
 
+# Sizes of the light arrays the lit shader variants are built with
+LIGHT_BUCKETS = (1, 2, MAX_LIGHTS)
+
+# How a material's fragments combine with what's behind them: fully opaque,
+# opaque where they aren't discarded, or blended
+OPAQUE = 0
+ALPHA_TESTED = 1
+BLENDED = 2
+
+# Share of a texture's texels that have to be translucent (alpha the alpha
+# test keeps, below 255) for its material to be blended. Below it, those
+# texels are drawn opaque
+BLENDED_TEXEL_FRACTION = 0.01
+
+
+def light_bucket(light_count: int) -> int:
+    """Smallest light array size able to hold `light_count` lights"""
+    for bucket in LIGHT_BUCKETS:
+        if light_count <= bucket:
+            return bucket
+    return MAX_LIGHTS
+
 
 class Material:
     shader: Shader
@@ -24,6 +48,12 @@ class Material:
     ns: float
     d: float
 
+    # Smallest alpha (0-255) of the texture, known once it is set up
+    min_alpha: int
+    # Share of the texture's texels that are translucent, likewise
+    translucent_texels: float
+    _variants: Dict[Tuple[bool, int, bool, bool], Shader]
+
     def __init__(
         self,
         shader: Shader,
@@ -40,11 +70,85 @@ class Material:
         self.texture_id = 0
         self.texture_path = texture_path
 
-        self.ka = ka
-        self.kd = kd
-        self.ks = ks
-        self.ns = ns
-        self.d = d
+        # Stored in the layout they are uploaded with
+        self.ka = np.asarray(ka, dtype=np.float32)
+        self.kd = np.asarray(kd, dtype=np.float32)
+        self.ks = np.asarray(ks, dtype=np.float32)
+        self.ns = float(ns)
+        self.d = float(d)
+
+        self.min_alpha = 255
+        self.translucent_texels = 0.0
+        self._variants = {}
+
+    @property
+    def textured(self) -> bool:
+        return self.texture_path is not None
+
+    @property
+    def opaque(self) -> bool:
+        """Whether every fragment is fully opaque, so blending changes nothing"""
+        return self.d >= 1.0 and self.min_alpha == 255
+
+    @property
+    def transparency(self) -> int:
+        """OPAQUE, ALPHA_TESTED or BLENDED, from `d` and the texture's alpha"""
+        if self.d < 1.0 or self.translucent_texels > BLENDED_TEXEL_FRACTION:
+            return BLENDED
+        if self.alpha_tested:
+            return ALPHA_TESTED
+        return OPAQUE
+
+    @property
+    def may_blend(self) -> bool:
+        """
+        Whether some fragments may be translucent, before the texture is set
+        up. Textures with an alpha channel are assumed to use it
+        """
+        if self.texture_id:
+            return not self.opaque
+        if self.d < 1.0:
+            return True
+        if self.texture_path is None or not os.path.isfile(self.texture_path):
+            return False
+        # Only reads the header
+        with Image.open(self.texture_path) as img:
+            return "A" in img.getbands() or "transparency" in img.info
+
+    @property
+    def alpha_tested(self) -> bool:
+        """Whether phong.frag may discard some of its fragments for their alpha"""
+        return self.d < 0.5 or self.min_alpha < 128
+
+    def select_shader(
+        self,
+        lit: bool,
+        light_count: int,
+        material_table: bool = False,
+        baked: bool = False,
+    ) -> Shader:
+        """
+        The cheapest variant of the material's shader that draws it correctly,
+        reading the material from the material table if `material_table`,
+        and adding the lighting baked in the vertices if `baked` (and `lit`),
+        `light_count` being the lights left
+        """
+        baked = baked and lit
+        bucket = light_bucket(light_count) if lit else 0
+        key = (lit, bucket, material_table, baked)
+        if key not in self._variants:
+            defines = {
+                "LIGHTING": "LIT" if lit else "UNLIT",
+                "TEXTURED": int(self.textured),
+                "ALPHA_TEST": int(self.alpha_tested),
+                "MATERIAL_TABLE": int(material_table),
+            }
+            if lit:
+                defines["MAX_LIGHTS"] = bucket
+            if baked:
+                defines["BAKED_LIGHTING"] = 1
+            self._variants[key] = self.shader.variant(**defines)
+        return self._variants[key]
 
     @staticmethod
     def from_texture(shader: Shader, texture_path: str) -> "Material":
@@ -94,6 +198,13 @@ class Material:
         for material in materials:
             material.setup_texture()
 
+    @staticmethod
+    def decode_texture(texture_path: str) -> tuple[int, int, bytes]:
+        """Decodes an image file into bottom-up RGBA rows, as OpenGL expects"""
+        img = Image.open(texture_path)
+        img_data = img.convert("RGBA").tobytes("raw", "RGBA", 0, -1)
+        return img.width, img.height, img_data
+
     def setup_texture(self) -> None:
         """Sets up a texture"""
         # Skip if there is no texture
@@ -105,11 +216,17 @@ class Material:
         self.texture_id = texture
 
         # Load the image
-        img = Image.open(self.texture_path)
-        img_data = img.convert("RGBA").tobytes("raw", "RGBA", 0, -1)
+        width, height, img_data = Material.decode_texture(self.texture_path)
+
+        # Scan the alpha channel, opaque textures get shaders without discard
+        # and cutouts are drawn without blending
+        alpha = np.frombuffer(img_data, dtype=np.uint8)[3::4]
+        self.min_alpha = int(alpha.min())
+        self.translucent_texels = float(np.mean((alpha >= 128) & (alpha < 255)))
+        self._variants.clear()
 
         # Select the texture
-        gl.glBindTexture(gl.GL_TEXTURE_2D, texture)
+        gl_state.bind_texture(gl.GL_TEXTURE_2D, texture)
 
         # Set the texture wrapping parameters
         gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_REPEAT)
@@ -124,8 +241,8 @@ class Material:
             gl.GL_TEXTURE_2D,
             0,
             gl.GL_RGBA,
-            img.width,
-            img.height,
+            width,
+            height,
             0,
             gl.GL_RGBA,
             gl.GL_UNSIGNED_BYTE,
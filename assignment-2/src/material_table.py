@@ -0,0 +1,108 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import Dict, Iterable, List, cast
+
+import numpy as np
+
+from gl_backend import gl
+from gl_state import gl_state
+from material import Material
+from model import Model
+
+# Texture unit the table is bound to, the material textures use unit 0
+MATERIAL_TABLE_UNIT = 1
+# RGBA32F texels per material: (ka, ns), (kd, d) and (ks, unused)
+TEXELS_PER_MATERIAL = 3
+
+
+def segment_materials(model: Model) -> List[Material]:
+    """
+    The material of each segment of the model's vertex data owner, as seen
+    by `model` (variants may draw the owner's segments with other materials)
+    """
+    owner = model if model.source is None else model.source
+    if owner is model:
+        return [material for _, _, material in model.segments]
+
+    owner_starts = [start for start, _, _ in owner.segments]
+    starts = sorted(model.material_swaps.keys())
+    assert set(starts) <= set(
+        owner_starts
+    ), "Model variants must switch materials where their source does"
+
+    materials = []
+    current = starts[0]
+    for start in owner_starts:
+        if start in model.material_swaps:
+            current = start
+        materials.append(model.materials[model.material_swaps[current]])
+    return materials
+
+
+class MaterialTable:
+    """
+    The materials of a set of models in a texture buffer, one row per segment
+    of each model. Vertices carry the index of their segment (see
+    `Buffers.setup_buffers`), so phong.frag built with MATERIAL_TABLE finds
+    its material at `u_materialBase + index` without any uniform per segment.
+    """
+
+    data: np.ndarray
+    # First row of each model, by id
+    bases: Dict[int, int]
+    buffer: int
+    texture: int
+
+    def __init__(self) -> None:
+        self.data = np.zeros((0, TEXELS_PER_MATERIAL, 4), dtype=np.float32)
+        self.bases = {}
+        self.buffer = 0
+        self.texture = 0
+
+    def build(self, models: Iterable[Model]) -> None:
+        """Lays out the rows of every model, variants included"""
+        rows = []
+        self.bases = {}
+        for model in models:
+            if id(model) in self.bases:
+                continue
+            self.bases[id(model)] = len(rows)
+            for material in segment_materials(model):
+                row = np.zeros((TEXELS_PER_MATERIAL, 4), dtype=np.float32)
+                row[0, :3] = material.ka[:3]
+                row[0, 3] = material.ns
+                row[1, :3] = material.kd[:3]
+                row[1, 3] = material.d
+                row[2, :3] = material.ks[:3]
+                rows.append(row)
+
+        self.data = np.array(rows, dtype=np.float32).reshape(-1, TEXELS_PER_MATERIAL, 4)
+
+    def base(self, model: Model) -> int:
+        return self.bases[id(model)]
+
+    def upload(self) -> None:
+        """Sends the table to the GPU, creating the buffer on first use"""
+        if self.buffer == 0:
+            self.buffer = cast(int, gl.glGenBuffers(1))
+            self.texture = cast(int, gl.glGenTextures(1))
+
+        gl.glBindBuffer(gl.GL_TEXTURE_BUFFER, self.buffer)
+        gl.glBufferData(
+            gl.GL_TEXTURE_BUFFER, self.data.nbytes, self.data, gl.GL_STATIC_DRAW
+        )
+
+        self.bind()
+        gl.glTexBuffer(gl.GL_TEXTURE_BUFFER, gl.GL_RGBA32F, self.buffer)
+        gl_state.active_texture(gl.GL_TEXTURE0)
+
+    def bind(self) -> bool:
+        """
+        Binds the table to its unit, leaving that unit active. Returns whether
+        it wasn't bound already
+        """
+        gl_state.active_texture(gl.GL_TEXTURE0 + MATERIAL_TABLE_UNIT)
+        return gl_state.bind_texture(gl.GL_TEXTURE_BUFFER, self.texture)
@@ -0,0 +1,75 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import hashlib
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Bump when the optimizer's or simplifier's output changes, so old results
+# are recomputed
+FORMAT_VERSION = 3
+
+
+class MeshCache:
+    """
+    Processed meshes (optimized, see `mesh_optimizer.optimize_mesh`, or
+    simplified) stored on disk as named arrays, keyed by the data they came
+    from and the settings used. Unreadable entries are dropped, so the mesh
+    is processed again.
+    """
+
+    directory: str
+    hits: int
+    misses: int
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *parts: Any) -> str:
+        digest = hashlib.sha256(f"mesh {FORMAT_VERSION}".encode())
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                digest.update(str(part.dtype).encode())
+                digest.update(str(part.shape).encode())
+                digest.update(np.ascontiguousarray(part).tobytes())
+            else:
+                digest.update(repr(part).encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".npz")
+
+    def load(self, key: str, *names: str) -> Optional[Dict[str, np.ndarray]]:
+        """The arrays stored under `key`, or None if any of `names` is missing"""
+        path = self._path(key)
+        if not os.path.isfile(path):
+            self.misses += 1
+            return None
+
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in names}
+        except (OSError, KeyError, ValueError):
+            # Corrupted, it will be replaced after processing
+            os.remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return arrays
+
+    def store(self, key: str, arrays: Dict[str, np.ndarray]) -> None:
+        # Write to a temporary file first, so readers never see partial meshes
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
@@ -0,0 +1,232 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from collections import deque
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+# Entries of the simulated post-transform vertex cache (FIFO)
+VERTEX_CACHE_SIZE = 16
+
+
+def index_vertices(
+    vertices: np.ndarray,
+    texture_coords: np.ndarray,
+    normals: np.ndarray,
+    keys: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merges identical flattened vertices. Vertices with different `keys` (e.g.
+    their segment) are never merged. Returns the index of the first copy of
+    each unique vertex, in order of first use, and the index buffer
+    """
+    rows = np.ascontiguousarray(
+        np.hstack(
+            [
+                vertices,
+                texture_coords,
+                normals,
+                keys.astype(np.uint32).view(np.float32).reshape(-1, 1),
+            ]
+        ).astype(np.float32, copy=False)
+    )
+    row_type = np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))
+    _, first, inverse = np.unique(
+        rows.view(row_type).ravel(), return_index=True, return_inverse=True
+    )
+
+    # np.unique sorts by value, keep the original order instead
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[inverse.ravel()].astype(np.uint32)
+
+
+def acmr(indices: np.ndarray, cache_size: int = VERTEX_CACHE_SIZE) -> float:
+    """Average cache miss ratio: vertices transformed per triangle"""
+    if len(indices) < 3:
+        return 0.0
+
+    cache: deque = deque()
+    cached = set()
+    misses = 0
+    for vertex in indices.tolist():
+        if vertex in cached:
+            continue
+        misses += 1
+        cache.append(vertex)
+        cached.add(vertex)
+        if len(cache) > cache_size:
+            cached.discard(cache.popleft())
+    return misses / (len(indices) // 3)
+
+
+def _vertex_triangles(
+    indices: np.ndarray, vertex_count: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Triangles using each vertex, as CSR offsets and triangle lists"""
+    triangles = np.argsort(indices, kind="stable") // 3
+    counts = np.bincount(indices, minlength=vertex_count)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return offsets, triangles
+
+
+def tipsify(
+    indices: np.ndarray, vertex_count: int, cache_size: int = VERTEX_CACHE_SIZE
+) -> Tuple[np.ndarray, List[int]]:
+    """
+    Reorders triangles for the post-transform vertex cache (Sander et al.,
+    "Fast Triangle Reordering for Vertex Locality and Reduced Overdraw").
+    Returns the new triangle order and where each cluster starts in it, the
+    clusters being split wherever the fan had to jump to a cold vertex
+    """
+    triangle_vertices = indices.reshape(-1, 3).tolist()
+    offsets, adjacency = _vertex_triangles(indices, vertex_count)
+    offsets = offsets.tolist()
+    adjacency = adjacency.tolist()
+
+    live = np.bincount(indices, minlength=vertex_count).tolist()
+    cache_time = [0] * vertex_count
+    emitted = [False] * len(triangle_vertices)
+    dead_end: List[int] = []
+    order: List[int] = []
+    clusters = [0]
+
+    time = cache_size + 1
+    cursor = 0
+    fan = int(indices[0]) if len(indices) else -1
+    while fan >= 0:
+        candidates = []
+        for triangle in adjacency[offsets[fan] : offsets[fan + 1]]:
+            if emitted[triangle]:
+                continue
+            for vertex in triangle_vertices[triangle]:
+                dead_end.append(vertex)
+                candidates.append(vertex)
+                live[vertex] -= 1
+                if time - cache_time[vertex] > cache_size:
+                    cache_time[vertex] = time
+                    time += 1
+            emitted[triangle] = True
+            order.append(triangle)
+
+        # The oldest candidate that stays cached while fanning around it
+        fan, priority = -1, -1
+        for vertex in candidates:
+            if live[vertex] > 0:
+                age = time - cache_time[vertex]
+                if age + 2 * live[vertex] <= cache_size and age > priority:
+                    fan, priority = vertex, age
+        if fan >= 0:
+            continue
+
+        # Dead end, go back to recent vertices or on to the next one left
+        while dead_end:
+            vertex = dead_end.pop()
+            if live[vertex] > 0:
+                fan = vertex
+                break
+        while fan < 0 and cursor < vertex_count:
+            if live[cursor] > 0:
+                fan = cursor
+            cursor += 1
+        if fan >= 0 and len(order) > clusters[-1]:
+            clusters.append(len(order))
+
+    return np.array(order, dtype=np.int64), clusters
+
+
+def sort_clusters(
+    positions: np.ndarray,
+    indices: np.ndarray,
+    clusters: List[int],
+    center: np.ndarray,
+) -> np.ndarray:
+    """
+    Orders the clusters of a triangle list so the ones facing out of the mesh
+    (which tend to occlude the others) come first, reducing overdraw. Returns
+    the new triangle order
+    """
+    triangles = positions[indices.reshape(-1, 3)]
+    # Area weighted normals and centroids of each triangle
+    normals = np.cross(
+        triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+    )
+    areas = np.linalg.norm(normals, axis=1)
+    centroids = triangles.mean(axis=1)
+
+    starts = np.array(clusters)
+    cluster_normals = np.add.reduceat(normals, starts)
+    cluster_areas = np.add.reduceat(areas, starts)
+    cluster_centroids = np.add.reduceat(centroids * areas[:, None], starts)
+    cluster_centroids /= np.maximum(cluster_areas, 1e-12)[:, None]
+
+    lengths = np.linalg.norm(cluster_normals, axis=1)
+    cluster_normals /= np.maximum(lengths, 1e-12)[:, None]
+    facing = np.einsum("ij,ij->i", cluster_centroids - center, cluster_normals)
+
+    ends = np.append(starts[1:], len(triangles))
+    ranges = [np.arange(starts[i], ends[i]) for i in np.argsort(-facing, kind="stable")]
+    return np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64)
+
+
+def reorder_vertex_fetch(indices: np.ndarray, vertex_count: int) -> np.ndarray:
+    """
+    The order of the vertices by first use in the index buffer, so they're
+    fetched sequentially. Unused vertices go last
+    """
+    first_use = np.full(vertex_count, len(indices), dtype=np.int64)
+    np.minimum.at(first_use, indices, np.arange(len(indices)))
+    return np.argsort(first_use, kind="stable")
+
+
+def optimize_mesh(
+    vertices: np.ndarray,
+    texture_coords: np.ndarray,
+    normals: np.ndarray,
+    segment_starts: List[int],
+    cache_size: int = VERTEX_CACHE_SIZE,
+    ordered_segments: Iterable[int] = (),
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Indexes a flattened triangle list and reorders it for the vertex cache,
+    overdraw and vertex fetching. Triangles only move within their segment
+    (a range starting at each of `segment_starts`), so the index buffer keeps
+    the segments of the flattened data. Segments starting at one of
+    `ordered_segments` keep their triangle order (blending depends on it).
+    Returns the unique vertices, texture coordinates and normals, and the
+    index buffer
+    """
+    count = len(vertices)
+    bounds = sorted(segment_starts) + [count]
+    keys = np.zeros(count, dtype=np.uint32)
+    for i in range(len(bounds) - 1):
+        keys[bounds[i] : bounds[i + 1]] = i
+
+    unique, indices = index_vertices(vertices, texture_coords, normals, keys)
+    positions = vertices[unique]
+    center = positions.mean(axis=0) if len(positions) else np.zeros(3)
+
+    ordered_segments = set(ordered_segments)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        segment = indices[start:end]
+        if len(segment) < 3 or start in ordered_segments:
+            continue
+        order, clusters = tipsify(segment, len(unique), cache_size)
+        segment = segment.reshape(-1, 3)[order].ravel()
+        order = sort_clusters(positions, segment, clusters, center)
+        indices[start:end] = segment.reshape(-1, 3)[order].ravel()
+
+    fetch = reorder_vertex_fetch(indices, len(unique))
+    remap = np.empty_like(fetch)
+    remap[fetch] = np.arange(len(fetch))
+    unique = unique[fetch]
+    return (
+        vertices[unique],
+        texture_coords[unique],
+        normals[unique],
+        remap[indices].astype(np.uint32),
+    )
@@ -0,0 +1,214 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import Tuple
+
+import numpy as np
+
+# Triangles whose normal turns more than this (cosine) are considered flipped
+FLIP_THRESHOLD = 0.2
+
+
+def _unique_rows(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct rows and the index of each row among them"""
+    unique, inverse = np.unique(rows, axis=0, return_inverse=True)
+    return unique, inverse.ravel()
+
+
+def _degenerate(triangles: np.ndarray) -> np.ndarray:
+    return (
+        (triangles[:, 0] == triangles[:, 1])
+        | (triangles[:, 1] == triangles[:, 2])
+        | (triangles[:, 2] == triangles[:, 0])
+    )
+
+
+def _quadrics(positions: np.ndarray, triangles: np.ndarray, count: int) -> np.ndarray:
+    """Area weighted sum of the plane quadrics around each vertex"""
+    points = positions[triangles]
+    normals = np.cross(points[:, 1] - points[:, 0], points[:, 2] - points[:, 0])
+    areas = np.linalg.norm(normals, axis=1)
+    normals /= np.maximum(areas, 1e-12)[:, None]
+    planes = np.hstack(
+        [normals, -np.einsum("ij,ij->i", normals, points[:, 0])[:, None]]
+    )
+    fundamental = areas[:, None, None] * planes[:, :, None] * planes[:, None, :]
+
+    quadrics = np.zeros((count, 4, 4))
+    for corner in range(3):
+        np.add.at(quadrics, triangles[:, corner], fundamental)
+    return quadrics
+
+
+def _flipped(
+    positions: np.ndarray, before: np.ndarray, after: np.ndarray
+) -> np.ndarray:
+    """Which triangles turn over (or collapse to a line) going from `before`"""
+    old = positions[before]
+    new = positions[after]
+    old_normals = np.cross(old[:, 1] - old[:, 0], old[:, 2] - old[:, 0])
+    new_normals = np.cross(new[:, 1] - new[:, 0], new[:, 2] - new[:, 0])
+    dot = np.einsum("ij,ij->i", old_normals, new_normals)
+    lengths = np.linalg.norm(old_normals, axis=1) * np.linalg.norm(new_normals, axis=1)
+    return dot <= FLIP_THRESHOLD * lengths
+
+
+def _corners(positions: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Groups the vertices (wedges) sharing a position and key, which have to
+    move together. Returns the group of each vertex, and which groups are
+    locked: those sharing their position with another group (different keys,
+    e.g. materials) and those on an open boundary
+    """
+    rows = np.hstack([positions, keys.astype(np.float64)[:, None]])
+    unique, groups = _unique_rows(rows)
+    _, coordinates = _unique_rows(unique[:, :3])
+    locked = np.bincount(coordinates)[coordinates] > 1
+    return groups, locked
+
+
+def simplify(
+    positions: np.ndarray,
+    indices: np.ndarray,
+    target_triangles: int,
+    keys: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduces an indexed triangle list to about `target_triangles` with quadric
+    error metrics (Garland and Heckbert).
+
+    Edges collapse onto one of their endpoints, so kept vertices keep their
+    attributes. Vertices at the same position (UV or normal seams) collapse
+    together, and only if each of them has a matching vertex at the other end
+    of the edge, so seams stay where they are. Positions shared by vertices
+    with different `keys` (material boundaries) and open boundaries never
+    move. Each pass collapses the cheapest edges among a set whose
+    neighborhoods don't overlap, all at once.
+
+    Returns the surviving triangles, in their original order, as indices
+    into the same vertices, and which input triangle each of them was
+    """
+    positions = positions.astype(np.float64)
+    triangles = indices.reshape(-1, 3).astype(np.int64)
+    survivors = np.arange(len(triangles))
+
+    groups, locked = _corners(positions, keys)
+    group_count = len(locked)
+    group_positions = np.zeros((group_count, 3))
+    group_positions[groups] = positions
+    homogeneous = np.hstack([group_positions, np.ones((group_count, 1))])
+
+    # Open boundaries, edges used by a single triangle
+    group_triangles = groups[triangles]
+    edges = np.sort(
+        np.concatenate([group_triangles[:, [i, (i + 1) % 3]] for i in range(3)]),
+        axis=1,
+    )
+    boundary, edge_counts = np.unique(edges, axis=0, return_counts=True)
+    locked[boundary[edge_counts == 1].ravel()] = True
+
+    # Planes of the original faces, a collapse hands those of the group that
+    # goes to the one it lands on, so the error adds up over the collapses
+    quadrics = _quadrics(group_positions, group_triangles, group_count)
+    # Groups whose collapses were all undone, skipped until something changes
+    blocked = np.zeros(group_count, dtype=bool)
+
+    while len(triangles) > target_triangles:
+        group_triangles = groups[triangles]
+
+        # Every (group a, group b, vertex at a, vertex at b) of each corner pair
+        pairs = np.concatenate(
+            [
+                np.stack(
+                    [
+                        group_triangles[:, i],
+                        group_triangles[:, j],
+                        triangles[:, i],
+                        triangles[:, j],
+                    ],
+                    axis=1,
+                )
+                for i in range(3)
+                for j in range(3)
+                if i != j
+            ]
+        )
+        pairs, _ = _unique_rows(pairs)
+        mapped, mapped_inverse = _unique_rows(pairs[:, :3])
+        ambiguous = np.bincount(mapped_inverse) > 1
+        edges, edge_inverse = _unique_rows(mapped[:, :2])
+
+        # a collapses onto b if every vertex at a maps to a single one at b
+        live = np.unique(triangles)
+        vertices_per_group = np.bincount(groups[live], minlength=group_count)
+        mapped_count = np.bincount(edge_inverse, minlength=len(edges))
+        valid = (
+            (mapped_count == vertices_per_group[edges[:, 0]])
+            & (np.bincount(edge_inverse, weights=ambiguous, minlength=len(edges)) == 0)
+            & ~locked[edges[:, 0]]
+            & ~blocked[edges[:, 0]]
+        )
+        candidates = np.flatnonzero(valid)
+        if len(candidates) == 0:
+            break
+
+        targets = homogeneous[edges[candidates, 1]]
+        combined = quadrics[edges[candidates, 0]] + quadrics[edges[candidates, 1]]
+        costs = np.einsum("ij,ijk,ik->i", targets, combined, targets)
+
+        # Neighbors of each group, to keep the collapses independent
+        neighbor_offsets = np.searchsorted(
+            edges[:, 0], np.arange(group_count + 1)
+        ).tolist()
+        neighbors = edges[:, 1].tolist()
+
+        # Each collapse removes about two triangles
+        budget = max((len(triangles) - target_triangles) // 2, 1)
+        touched = np.zeros(group_count, dtype=bool)
+        selected = np.zeros(len(edges), dtype=bool)
+        collapses = 0
+        for candidate in candidates[np.argsort(costs, kind="stable")].tolist():
+            source, destination = edges[candidate].tolist()
+            if touched[source] or touched[destination]:
+                continue
+            selected[candidate] = True
+            touched[source] = touched[destination] = True
+            touched[
+                neighbors[neighbor_offsets[source] : neighbor_offsets[source + 1]]
+            ] = True
+            collapses += 1
+            if collapses >= budget:
+                break
+
+        # Move every vertex of the collapsed groups
+        moves = pairs[selected[edge_inverse[mapped_inverse]]]
+        remap = np.arange(len(positions))
+        remap[moves[:, 2]] = moves[:, 3]
+        collapsed = remap[triangles]
+
+        # Undo the collapses that would turn a triangle over
+        moved = np.any(collapsed != triangles, axis=1) & ~_degenerate(collapsed)
+        flipped = moved.copy()
+        flipped[moved] = _flipped(positions, triangles[moved], collapsed[moved])
+        sources = triangles[flipped][collapsed[flipped] != triangles[flipped]]
+        rejected = np.isin(groups, groups[sources])
+        remap[rejected] = np.flatnonzero(rejected)
+        if np.all(remap == np.arange(len(positions))):
+            # Try the next cheapest edges rather than the same ones again
+            blocked[np.unique(groups[sources])] = True
+            continue
+        blocked[:] = False
+
+        # Destinations are distinct, none of them is also a source
+        accepted = edges[selected]
+        accepted = accepted[~np.isin(accepted[:, 0], groups[sources])]
+        quadrics[accepted[:, 1]] += quadrics[accepted[:, 0]]
+
+        collapsed = remap[triangles]
+        kept = ~_degenerate(collapsed)
+        triangles = collapsed[kept]
+        survivors = survivors[kept]
+
+    return triangles.ravel().astype(np.uint32), survivors
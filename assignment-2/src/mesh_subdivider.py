@@ -0,0 +1,92 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import List, Tuple
+
+import numpy as np
+
+# Children of a triangle (a, b, c) by which of its edges are split, as corners:
+# 0-2 are a, b and c, 3-5 the midpoints of ab, bc and ca. Split edges are
+# bits 1 (ab), 2 (bc) and 4 (ca). Every child keeps the parent's winding
+_CHILDREN = {
+    0b000: [(0, 1, 2)],
+    0b001: [(0, 3, 2), (3, 1, 2)],
+    0b010: [(1, 4, 0), (4, 2, 0)],
+    0b100: [(2, 5, 1), (5, 0, 1)],
+    0b011: [(1, 4, 3), (2, 0, 3), (2, 3, 4)],
+    0b110: [(2, 5, 4), (0, 1, 4), (0, 4, 5)],
+    0b101: [(0, 3, 5), (1, 2, 5), (1, 5, 3)],
+    0b111: [(0, 3, 5), (3, 1, 4), (5, 4, 2), (3, 4, 5)],
+}
+
+
+def _split_once(
+    corners: np.ndarray, triangle_starts: np.ndarray, max_edge: float
+) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """
+    One round of splitting every edge longer than `max_edge` at its
+    midpoint. `corners` holds the attributes of each triangle's corners
+    (triangles x 3 x attributes, positions first). Returns the new corners,
+    the new index of each triangle in `triangle_starts`, and whether any
+    edge was split
+    """
+    positions = corners[:, :, :3]
+    lengths = np.linalg.norm(positions - np.roll(positions, -1, axis=1), axis=2)
+    split = lengths > max_edge
+    if not split.any():
+        return corners, triangle_starts, False
+
+    # The same edge has the same length and midpoint seen from either of its
+    # triangles, so neighbors always agree and no cracks open
+    midpoints = (corners + np.roll(corners, -1, axis=1)) * 0.5
+    points = np.concatenate([corners, midpoints], axis=1)
+    cases = split[:, 0] * 1 + split[:, 1] * 2 + split[:, 2] * 4
+
+    counts = np.array([len(_CHILDREN[case]) for case in range(8)])[cases]
+    first_child = np.concatenate([[0], np.cumsum(counts)])
+    result = np.empty((first_child[-1], 3, corners.shape[2]), dtype=corners.dtype)
+    for case, children in _CHILDREN.items():
+        parents = np.nonzero(cases == case)[0]
+        if len(parents) == 0:
+            continue
+        for i, child in enumerate(children):
+            result[first_child[parents] + i] = points[parents][:, child]
+    return result, first_child[triangle_starts], True
+
+
+def subdivide(
+    vertices: np.ndarray,
+    texture_coords: np.ndarray,
+    normals: np.ndarray,
+    starts: List[int],
+    max_edge: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[int]]:
+    """
+    Splits the triangles of a flattened mesh until no edge is longer than
+    `max_edge`, always at the middle of an edge so the shared edges of
+    neighboring triangles split the same way. Attributes are interpolated
+    linearly, like the rasterizer does, so the mesh is drawn the same.
+    Triangles are replaced in place by their pieces, keeping the order of
+    the segments starting at (corner) indices `starts`. Returns the new
+    flattened attributes and segment starts
+    """
+    corners = np.concatenate(
+        [vertices, texture_coords, normals], axis=1, dtype=np.float32
+    ).reshape(-1, 3, 8)
+    triangle_starts = np.array(starts, dtype=np.int64) // 3
+
+    split = True
+    while split:
+        corners, triangle_starts, split = _split_once(
+            corners, triangle_starts, max_edge
+        )
+
+    corners = corners.reshape(-1, 8)
+    return (
+        np.ascontiguousarray(corners[:, :3]),
+        np.ascontiguousarray(corners[:, 3:5]),
+        np.ascontiguousarray(corners[:, 5:]),
+        (triangle_starts * 3).tolist(),
+    )
@@ -3,20 +3,48 @@
 # D. H. Lelis - 12543822
 # Samuel Figueiredo Veronez - 12542626
 
-from typing import Any, Dict, Iterable, List, cast, Optional
+from typing import Any, Dict, Iterable, List, Tuple, cast, Optional
 
 import numpy as np
-import OpenGL.GL as gl
+from gl_backend import gl
+from gl_state import gl_state
 
 from shader import Shader
 from material import Material
-from wavefront import load_obj
+from mesh_cache import MeshCache
+from mesh_optimizer import VERTEX_CACHE_SIZE, index_vertices, optimize_mesh
+from mesh_simplifier import simplify
+from mesh_subdivider import subdivide
+from wavefront import group_faces_by_material, load_obj, material_runs
+
+# Vertex attribute locations, must match the layout qualifiers in phong.vert
+POSITION_LOCATION = 0
+TEXTURE_COORD_LOCATION = 1
+NORMAL_LOCATION = 2
+MATERIAL_INDEX_LOCATION = 3
+# Static lighting baked into the vertices (see `light_baker`), only read by
+# the BAKED_LIGHTING variants
+BAKED_DIFFUSE_LOCATION = 4
+BAKED_DIRECTION_LOCATION = 5
+BAKED_SPECULAR_LOCATION = 6
+
+# Floats of baked lighting per vertex: diffuse, direction and specular
+BAKED_FLOATS = 9
+
+# Models are drawn from a GL_UNSIGNED_INT index buffer
+INDEX_SIZE = 4
+
+# Fraction of the triangles kept by each level of detail after the full one
+LOD_RATIOS = (0.5, 0.25, 0.125)
 
 
 class Model:
     vertices: np.ndarray
     texture_coords: np.ndarray
     normals: np.ndarray
+    # The vertices of each primitive (uint32). Material swaps, segments and
+    # `offset` refer to positions in it
+    indices: np.ndarray
     materials: Dict[Any, Material]
     material_swaps: Dict[int, Any]
     draw_mode: int
@@ -25,8 +53,27 @@ class Model:
     ks_override: Optional[float]
     ns_override: Optional[float]
 
+    # First index of the model in the index buffer
     offset: int
+    # First vertex of the model in the vertex buffers
+    base_vertex: int
     texture_offset: int
+    vao: int
+
+    # Model whose vertex data this one shares (only the materials differ)
+    source: Optional["Model"]
+    # Simplified versions of the model, most detailed first (see `build_lods`)
+    lods: List["Model"]
+    # Radius of the bounding sphere around the model's origin
+    radius: float
+    # Corners (min, max) of the axis aligned bounding box, 2 x 3
+    bounds: np.ndarray
+    # Static lighting of each vertex, vertices x BAKED_FLOATS (see
+    # `light_baker.LightBaker`), None if nothing was baked
+    baked: Optional[np.ndarray]
+
+    # (first vertex, vertex count, material) of each run of the same material
+    segments: List[Tuple[int, int, Material]]
 
     def __init__(
         self,
@@ -40,7 +87,12 @@ class Model:
         kd_override: Optional[float] = None,
         ks_override: Optional[float] = None,
         ns_override: Optional[float] = None,
+        source: Optional["Model"] = None,
+        indices: Optional[np.ndarray] = None,
     ):
+        if indices is None:
+            indices = np.arange(len(vertices), dtype=np.uint32)
+
         assert len(vertices) == len(
             texture_coords
         ), "Vertices and texture coordinates must have the same length"
@@ -51,8 +103,8 @@ class Model:
             len(material_swaps) == 0 or min(material_swaps.keys()) >= 0
         ), "Material swaps must have non-negative keys"
         assert len(material_swaps) == 0 or max(material_swaps.keys()) < len(
-            vertices
-        ), "Material swaps must have keys less than the number of vertices"
+            indices
+        ), "Material swaps must have keys less than the number of indices"
 
         for material in material_swaps.values():
             if material not in materials:
@@ -62,18 +114,266 @@ class Model:
             [material in materials for material in material_swaps.values()]
         ), "Material swaps must have valid materials"
 
-        self.vertices = vertices.astype(np.float32)
-        self.normals = normals.astype(np.float32)
-        self.texture_coords = texture_coords.astype(np.float32)
+        self.vertices = vertices.astype(np.float32, copy=False)
+        self.normals = normals.astype(np.float32, copy=False)
+        self.texture_coords = texture_coords.astype(np.float32, copy=False)
+        self.indices = indices.astype(np.uint32, copy=False)
         self.materials = materials
         self.material_swaps = material_swaps
         self.draw_mode = draw_mode
         self.offset = 0
+        self.base_vertex = 0
         self.texture_offset = 0
+        self.vao = 0
         self.ka_override = ka_override
         self.kd_override = kd_override
         self.ks_override = ks_override
         self.ns_override = ns_override
+        self.source = source
+        self.lods = []
+        self.radius = (
+            float(np.linalg.norm(self.vertices, axis=1).max())
+            if len(self.vertices)
+            else 0.0
+        )
+        self.bounds = (
+            np.stack([self.vertices.min(axis=0), self.vertices.max(axis=0)])
+            if len(self.vertices)
+            else np.zeros((2, 3), dtype=np.float32)
+        )
+        self.baked = None
+        self.segments = self._build_segments()
+
+    def _build_segments(self) -> List[Tuple[int, int, Material]]:
+        starts = sorted(self.material_swaps.keys()) + [len(self.indices)]
+        return [
+            (
+                starts[i],
+                starts[i + 1] - starts[i],
+                self.materials[self.material_swaps[starts[i]]],
+            )
+            for i in range(len(starts) - 1)
+        ]
+
+    def segment_indices(self) -> np.ndarray:
+        """The index of the segment each vertex belongs to"""
+        indices = np.zeros(len(self.vertices), dtype=np.uint16)
+        for i, (start, count, _) in enumerate(self.segments):
+            indices[self.indices[start : start + count]] = i
+        return indices
+
+    def range_center(self, start: int, count: int) -> np.ndarray:
+        """The center of the bounding box of a range of the index buffer"""
+        positions = self.vertices[self.indices[start : start + count]]
+        if len(positions) == 0:
+            return np.zeros(3, dtype=np.float32)
+        return (positions.min(axis=0) + positions.max(axis=0)) / 2
+
+    def optimize(
+        self, cache: Optional[MeshCache] = None, cache_size: int = VERTEX_CACHE_SIZE
+    ) -> None:
+        """
+        Indexes the model's triangles and reorders them for the vertex cache,
+        overdraw and vertex fetching (see `mesh_optimizer.optimize_mesh`),
+        keeping its segments and the triangle order of those that may blend.
+        With a `cache`, results are reused across runs.
+        Variants must be made after optimizing, they share the vertex data
+        """
+        assert self.source is None, "Only the owner of vertex data can optimize it"
+        if self.draw_mode != gl.GL_TRIANGLES:
+            return
+
+        starts = [start for start, _, _ in self.segments]
+        ordered = [start for start, _, material in self.segments if material.may_blend]
+        flattened = (
+            self.vertices[self.indices],
+            self.texture_coords[self.indices],
+            self.normals[self.indices],
+        )
+
+        names = ("vertices", "texture_coords", "normals", "indices")
+        arrays = None
+        if cache is not None:
+            key = cache.key("optimize", *flattened, starts, cache_size, ordered)
+            arrays = cache.load(key, *names)
+        if arrays is None:
+            arrays = dict(
+                zip(names, optimize_mesh(*flattened, starts, cache_size, ordered))
+            )
+            if cache is not None:
+                cache.store(key, arrays)
+
+        self.vertices = arrays["vertices"]
+        self.texture_coords = arrays["texture_coords"]
+        self.normals = arrays["normals"]
+        self.indices = arrays["indices"]
+
+    def subdivide(
+        self,
+        max_edge: float,
+        cache: Optional[MeshCache] = None,
+        optimize: bool = True,
+    ) -> None:
+        """
+        Splits the model's triangles until no edge is longer than `max_edge`
+        (see `mesh_subdivider.subdivide`), so what is stored per vertex can
+        vary across large faces. It is drawn the same. With a `cache`,
+        results are reused across runs, and with `optimize` the model goes
+        through `Model.optimize` again. Variants must be made after
+        subdividing, they share the vertex data
+        """
+        assert self.source is None, "Only the owner of vertex data can subdivide it"
+        if self.draw_mode != gl.GL_TRIANGLES:
+            return
+
+        names = [name for _, name in sorted(self.material_swaps.items())]
+        starts = [start for start, _, _ in self.segments]
+        flattened = (
+            self.vertices[self.indices],
+            self.texture_coords[self.indices],
+            self.normals[self.indices],
+        )
+
+        array_names = ("vertices", "texture_coords", "normals", "starts")
+        arrays = None
+        if cache is not None:
+            key = cache.key("subdivide", *flattened, starts, max_edge)
+            arrays = cache.load(key, *array_names)
+        if arrays is None:
+            vertices, texture_coords, normals, new_starts = subdivide(
+                *flattened, starts, max_edge
+            )
+            arrays = {
+                "vertices": vertices,
+                "texture_coords": texture_coords,
+                "normals": normals,
+                "starts": np.array(new_starts, dtype=np.int64),
+            }
+            if cache is not None:
+                cache.store(key, arrays)
+
+        self.vertices = arrays["vertices"]
+        self.texture_coords = arrays["texture_coords"]
+        self.normals = arrays["normals"]
+        self.indices = np.arange(len(self.vertices), dtype=np.uint32)
+        self.material_swaps = dict(zip(arrays["starts"].tolist(), names))
+        self.segments = self._build_segments()
+        if optimize:
+            self.optimize(cache)
+
+    def build_lods(
+        self,
+        ratios: Iterable[float] = LOD_RATIOS,
+        cache: Optional[MeshCache] = None,
+        optimize: bool = True,
+    ) -> None:
+        """
+        Simplifies the model keeping each fraction of its triangles in
+        `ratios` (see `mesh_simplifier.simplify`), preserving its UV and
+        material seams. Segments left without triangles are dropped. With a
+        `cache`, results are reused across runs, and with `optimize` each level
+        goes through `Model.optimize` too
+        """
+        assert self.source is None, "Only the owner of vertex data can have LODs"
+        self.lods = []
+        if self.draw_mode != gl.GL_TRIANGLES:
+            return
+
+        flattened = (
+            self.vertices[self.indices],
+            self.texture_coords[self.indices],
+            self.normals[self.indices],
+        )
+        vertices, texture_coords, normals = flattened
+        names = [name for _, name in sorted(self.material_swaps.items())]
+        segment_keys = np.repeat(
+            np.arange(len(self.segments)), [count for _, count, _ in self.segments]
+        )
+        starts = [start for start, _, _ in self.segments]
+
+        welded = None
+        for ratio in ratios:
+            array_names = ("vertices", "texture_coords", "normals", "segment_counts")
+            arrays = None
+            if cache is not None:
+                key = cache.key("lod", *flattened, starts, ratio)
+                arrays = cache.load(key, *array_names)
+
+            if arrays is None:
+                # Normals are left out, so hard edges don't lock the vertices
+                if welded is None:
+                    welded, indices = index_vertices(
+                        vertices, texture_coords, np.zeros_like(vertices), segment_keys
+                    )
+                kept, survivors = simplify(
+                    vertices[welded],
+                    indices,
+                    int(len(indices) // 3 * ratio),
+                    segment_keys[welded],
+                )
+
+                # Corners that moved take the average normal of their vertex
+                corners = (survivors[:, None] * 3 + np.arange(3)).ravel()
+                welded_normals = np.zeros((len(welded), 3), dtype=np.float32)
+                np.add.at(welded_normals, indices, normals)
+                welded_normals /= np.maximum(
+                    np.linalg.norm(welded_normals, axis=1), 1e-12
+                )[:, None]
+                arrays = {
+                    "vertices": vertices[welded][kept],
+                    "texture_coords": texture_coords[welded][kept],
+                    "normals": np.where(
+                        (kept == indices[corners])[:, None],
+                        normals[corners],
+                        welded_normals[kept],
+                    ),
+                    "segment_counts": np.bincount(
+                        segment_keys[corners[::3]], minlength=len(names)
+                    )
+                    * 3,
+                }
+                if cache is not None:
+                    cache.store(key, arrays)
+
+            material_swaps = {}
+            start = 0
+            for name, count in zip(names, arrays["segment_counts"].tolist()):
+                if count > 0:
+                    material_swaps[start] = name
+                    start += count
+
+            lod = Model(
+                arrays["vertices"],
+                arrays["texture_coords"],
+                arrays["normals"],
+                self.materials,
+                material_swaps,
+                self.draw_mode,
+            )
+            if optimize:
+                lod.optimize(cache)
+            self.lods.append(lod)
+
+    def lod(self, level: int) -> "Model":
+        """The model drawn at a level of detail, 0 being the full one"""
+        if level <= 0 or not self.lods:
+            return self
+        return self.lods[min(level, len(self.lods)) - 1]
+
+    def with_materials(
+        self, materials: Dict[str, Material], material_swaps: Dict[int, str]
+    ) -> "Model":
+        """A model sharing this one's vertex data, but drawn with other materials"""
+        return Model(
+            self.vertices,
+            self.texture_coords,
+            self.normals,
+            materials,
+            material_swaps,
+            self.draw_mode,
+            source=self if self.source is None else self.source,
+            indices=self.indices,
+        )
 
     @classmethod
     def load_obj(
@@ -83,7 +383,18 @@ class Model:
         prefix_materials: str = "",
         prefix_models: str = "",
         split_objects=False,
+        group_materials=False,
+        optimize=False,
+        mesh_cache: Optional[MeshCache] = None,
     ) -> Dict[str, "Model"]:
+        """
+        Loads the models of an OBJ file. With `group_materials`, the faces of
+        each model are reordered so every material is a single segment (and
+        so a single draw), reporting the segment counts before and after.
+        Blending between faces of different translucent materials may change
+        order. With `optimize`, each model goes through `Model.optimize`,
+        using `mesh_cache` if given
+        """
         models = load_obj(filepath, split_objects)
         result = {}
         for model in models:
@@ -94,7 +405,14 @@ class Model:
             material_swaps = {}
             last_material = None
 
-            for i, face in enumerate(model["faces"]):
+            faces = model["faces"]
+            if group_materials:
+                before = material_runs(faces)
+                faces = group_faces_by_material(faces)
+                name = prefix_models + model["name"] if split_objects else prefix_models
+                print(f"{name}: {before} -> {material_runs(faces)} material segments")
+
+            for i, face in enumerate(faces):
                 cur_material = prefix_materials + face[3]
                 if last_material != cur_material:
                     material_swaps[i * 3] = cur_material
@@ -109,88 +427,166 @@ class Model:
             vertices = np.array(vertices, dtype=np.float32)
             texture_coords = np.array(texture_coords, dtype=np.float32)
             normals = np.array(normals, dtype=np.float32)
-            if split_objects:
-                result[prefix_models + model["name"]] = Model(
-                    vertices, texture_coords, normals, materials, material_swaps
-                )
-            else:
-                result[prefix_models] = Model(
-                    vertices, texture_coords, normals, materials, material_swaps
-                )
+            name = prefix_models + model["name"] if split_objects else prefix_models
+            result[name] = Model(
+                vertices, texture_coords, normals, materials, material_swaps
+            )
+            if optimize:
+                result[name].optimize(mesh_cache)
 
         return result
 
 
 class Buffers:
+    vao: int
     vertex_buffer: int
     texture_map_buffer: int
     normal_buffer: int
+    # Index of each vertex's segment within its model (uint16)
+    material_index_buffer: int
+    # Baked static lighting of each vertex (float32 x BAKED_FLOATS), zero for
+    # the models without it
+    baked_buffer: int
+    index_buffer: int
 
     def __init__(
-        self, vertex_buffer: int, texture_map_buffer: int, normal_buffer: int
+        self,
+        vao: int,
+        vertex_buffer: int,
+        texture_map_buffer: int,
+        normal_buffer: int,
+        material_index_buffer: int,
+        baked_buffer: int,
+        index_buffer: int,
     ) -> None:
+        self.vao = vao
         self.vertex_buffer = vertex_buffer
         self.texture_map_buffer = texture_map_buffer
         self.normal_buffer = normal_buffer
+        self.material_index_buffer = material_index_buffer
+        self.baked_buffer = baked_buffer
+        self.index_buffer = index_buffer
 
     def bind(self, shader: Shader):
         """Associates a model with a shader"""
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vertex_buffer)
-        loc = gl.glGetAttribLocation(shader.program_id, "position")
-        gl.glEnableVertexAttribArray(loc)
-        gl.glVertexAttribPointer(loc, 3, gl.GL_FLOAT, False, 12, gl.ctypes.c_void_p(0))
+        gl_state.bind_vertex_array(self.vao)
+
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, self.vertex_buffer)
+        gl.glEnableVertexAttribArray(POSITION_LOCATION)
+        gl.glVertexAttribPointer(
+            POSITION_LOCATION, 3, gl.GL_FLOAT, False, 12, gl.ctypes.c_void_p(0)
+        )
 
         if shader.has_texture:
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.texture_map_buffer)
-            loc = gl.glGetAttribLocation(shader.program_id, "texture_coord")
-            gl.glEnableVertexAttribArray(loc)
+            gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, self.texture_map_buffer)
+            gl.glEnableVertexAttribArray(TEXTURE_COORD_LOCATION)
             gl.glVertexAttribPointer(
-                loc, 2, gl.GL_FLOAT, False, 8, gl.ctypes.c_void_p(0)
+                TEXTURE_COORD_LOCATION, 2, gl.GL_FLOAT, False, 8, gl.ctypes.c_void_p(0)
             )
 
-        try:
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.normal_buffer)
-            loc = gl.glGetAttribLocation(shader.program_id, "normal")
-            gl.glEnableVertexAttribArray(loc)
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, self.normal_buffer)
+        gl.glEnableVertexAttribArray(NORMAL_LOCATION)
+        gl.glVertexAttribPointer(
+            NORMAL_LOCATION, 3, gl.GL_FLOAT, False, 12, gl.ctypes.c_void_p(0)
+        )
+
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, self.material_index_buffer)
+        gl.glEnableVertexAttribArray(MATERIAL_INDEX_LOCATION)
+        gl.glVertexAttribIPointer(
+            MATERIAL_INDEX_LOCATION, 1, gl.GL_UNSIGNED_SHORT, 2, gl.ctypes.c_void_p(0)
+        )
+
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, self.baked_buffer)
+        stride = BAKED_FLOATS * 4
+        for i, location in enumerate(
+            (BAKED_DIFFUSE_LOCATION, BAKED_DIRECTION_LOCATION, BAKED_SPECULAR_LOCATION)
+        ):
+            gl.glEnableVertexAttribArray(location)
             gl.glVertexAttribPointer(
-                loc, 3, gl.GL_FLOAT, False, 12, gl.ctypes.c_void_p(0)
+                location, 3, gl.GL_FLOAT, False, stride, gl.ctypes.c_void_p(i * 12)
             )
-        except Exception as e:
-            print(e)
+
+    def update_baked(self, model: Model) -> None:
+        """Uploads the baked lighting of a model again, after baking it anew"""
+        owner = model if model.source is None else model.source
+        if owner.baked is None:
+            baked = np.zeros((len(owner.vertices), BAKED_FLOATS), dtype=np.float32)
+        else:
+            baked = np.ascontiguousarray(owner.baked, dtype=np.float32)
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, self.baked_buffer)
+        gl.glBufferSubData(
+            gl.GL_ARRAY_BUFFER,
+            owner.base_vertex * baked.itemsize * BAKED_FLOATS,
+            baked.nbytes,
+            baked,
+        )
 
     @staticmethod
     def setup_buffers(models: Iterable[Model] = []) -> "Buffers":
         """Sets up the buffers"""
         # Create buffer slot
-        vertex_buffer, texture_map_buffer, normal_buffer = cast(
-            List[int], gl.glGenBuffers(3)
-        )
+        (
+            vertex_buffer,
+            texture_map_buffer,
+            normal_buffer,
+            material_index_buffer,
+            baked_buffer,
+            index_buffer,
+        ) = cast(List[int], gl.glGenBuffers(6))
 
         # Bind the Vertex Array Object
         vao = gl.glGenVertexArrays(1)
-        gl.glBindVertexArray(vao)
+        gl_state.bind_vertex_array(vao)
 
-        # Setup vertices
-        vertices = np.ndarray([0, 3], dtype=np.float32)
+        # Models sharing another's vertex data are only uploaded once, levels
+        # of detail are uploaded along with their model
+        models = list(models)
+        models += [lod for model in models for lod in model.lods]
+        owners: Dict[int, Model] = {}
         for model in models:
-            model.offset = len(vertices)
-            vertices = np.concatenate([vertices, model.vertices], dtype=np.float32)
+            owner = model if model.source is None else model.source
+            owners.setdefault(id(owner), owner)
+        uploaded = list(owners.values())
+
+        offset = 0
+        base_vertices = []
+        base_vertex = 0
+        for model in uploaded:
+            model.offset = offset
+            model.base_vertex = base_vertex
+            model.vao = vao
+            offset += len(model.indices)
+            base_vertices.append(base_vertex)
+            base_vertex += len(model.vertices)
+
+        for model in models:
+            if model.source is not None:
+                model.offset = model.source.offset
+                model.base_vertex = model.source.base_vertex
+                model.vao = vao
+
+        # Setup vertices
+        vertices = np.concatenate(
+            [np.ndarray([0, 3], dtype=np.float32)]
+            + [model.vertices for model in uploaded],
+            dtype=np.float32,
+        )
 
         # Make this the current buffer and upload the data
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, vertex_buffer)
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, vertex_buffer)
         gl.glBufferData(
             gl.GL_ARRAY_BUFFER, vertices.nbytes, vertices, gl.GL_STATIC_DRAW
         )
 
         # Setup texture mappings
-        texture_coords = np.ndarray([0, 2], dtype=np.float32)
-        for model in models:
-            texture_coords = np.concatenate(
-                [texture_coords, model.texture_coords], dtype=np.float32
-            )
+        texture_coords = np.concatenate(
+            [np.ndarray([0, 2], dtype=np.float32)]
+            + [model.texture_coords for model in uploaded],
+            dtype=np.float32,
+        )
 
         # Make this the current buffer and upload the texture data
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, texture_map_buffer)
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, texture_map_buffer)
         gl.glBufferData(
             gl.GL_ARRAY_BUFFER,
             texture_coords.nbytes,
@@ -199,13 +595,65 @@ class Buffers:
         )
 
         # Setup normals
-        normals = np.ndarray([0, 3], dtype=np.float32)
-        for model in models:
-            model.offset = len(normals)
-            normals = np.concatenate([normals, model.normals], dtype=np.float32)
+        normals = np.concatenate(
+            [np.ndarray([0, 3], dtype=np.float32)]
+            + [model.normals for model in uploaded],
+            dtype=np.float32,
+        )
 
         # Make this the current buffer and upload the data
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, normal_buffer)
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, normal_buffer)
         gl.glBufferData(gl.GL_ARRAY_BUFFER, normals.nbytes, normals, gl.GL_STATIC_DRAW)
 
-        return Buffers(vertex_buffer, texture_map_buffer, normal_buffer)
+        # Setup the segment of each vertex, to find its material in a table
+        material_indices = np.concatenate(
+            [np.ndarray([0], dtype=np.uint16)]
+            + [model.segment_indices() for model in uploaded],
+        )
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, material_index_buffer)
+        gl.glBufferData(
+            gl.GL_ARRAY_BUFFER,
+            material_indices.nbytes,
+            material_indices,
+            gl.GL_STATIC_DRAW,
+        )
+
+        # Setup the baked lighting, zero where there is none
+        baked = np.concatenate(
+            [np.ndarray([0, BAKED_FLOATS], dtype=np.float32)]
+            + [
+                (
+                    np.zeros((len(model.vertices), BAKED_FLOATS), dtype=np.float32)
+                    if model.baked is None
+                    else model.baked
+                )
+                for model in uploaded
+            ],
+            dtype=np.float32,
+        )
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, baked_buffer)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, baked.nbytes, baked, gl.GL_STATIC_DRAW)
+
+        # Setup indices, rebased onto the shared vertex buffer. The element
+        # array binding is part of the vertex array object
+        indices = np.concatenate(
+            [np.ndarray([0], dtype=np.uint32)]
+            + [
+                model.indices + np.uint32(base)
+                for model, base in zip(uploaded, base_vertices)
+            ],
+        )
+        gl_state.bind_buffer(gl.GL_ELEMENT_ARRAY_BUFFER, index_buffer)
+        gl.glBufferData(
+            gl.GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, gl.GL_STATIC_DRAW
+        )
+
+        return Buffers(
+            vao,
+            vertex_buffer,
+            texture_map_buffer,
+            normal_buffer,
+            material_index_buffer,
+            baked_buffer,
+            index_buffer,
+        )
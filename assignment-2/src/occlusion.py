@@ -0,0 +1,330 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from entity import Entity
+from material import OPAQUE
+
+# Resolution of the software depth buffer
+OCCLUSION_WIDTH = 128
+OCCLUSION_HEIGHT = 72
+# Smallest triangle (in the model's units) kept as an occluder, walls and
+# floors rather than the props in front of them
+OCCLUDER_MIN_AREA = 0.5
+# Texels read along each axis to bound a rectangle in the depth pyramid
+PYRAMID_TAPS = 8
+
+# Corners of the unit box, as (x, y, z) picks of (min, max)
+_BOX_CORNERS = np.array(
+    [[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.intp
+)
+
+
+def _homogeneous(points: np.ndarray) -> np.ndarray:
+    return np.concatenate([points, np.ones(points.shape[:-1] + (1,))], axis=-1)
+
+
+def box_corners(bounds: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """
+    The 8 corners of a (min, max) box transformed by a 4x4 matrix, or of
+    n boxes (n x 2 x 3) by n matrices (n x 4 x 4)
+    """
+    corners = bounds[..., _BOX_CORNERS, [0, 1, 2]]
+    rotation = np.swapaxes(matrix[..., :3, :3], -1, -2)
+    return corners @ rotation + matrix[..., np.newaxis, :3, 3]
+
+
+def clip_near(triangles: np.ndarray) -> np.ndarray:
+    """
+    Clips clip space triangles (n x 3 x 4) against the near plane (z = -w).
+    A triangle with one corner in front stays a triangle, one with two
+    becomes two
+    """
+    distances = triangles[:, :, 2] + triangles[:, :, 3]
+    inside = distances > 0
+    count = inside.sum(axis=1)
+    kept = [triangles[count == 3]]
+
+    for corners_in in (1, 2):
+        selected = count == corners_in
+        if not np.any(selected):
+            continue
+        tris = triangles[selected]
+        dist = distances[selected]
+        # Rotate so the odd corner out comes first, keeping the winding
+        odd = inside[selected] if corners_in == 1 else ~inside[selected]
+        first = np.argmax(odd, axis=1)
+        order = (first[:, None] + np.arange(3)) % 3
+        tris = np.take_along_axis(tris, order[:, :, None], axis=1)
+        dist = np.take_along_axis(dist, order, axis=1)
+
+        a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+        ab = a + (b - a) * (dist[:, 0] / (dist[:, 0] - dist[:, 1]))[:, None]
+        ac = a + (c - a) * (dist[:, 0] / (dist[:, 0] - dist[:, 2]))[:, None]
+        if corners_in == 1:
+            kept.append(np.stack([a, ab, ac], axis=1))
+        else:
+            kept.append(np.stack([ab, b, c], axis=1))
+            kept.append(np.stack([ab, c, ac], axis=1))
+    return np.concatenate(kept)
+
+
+def rasterize(
+    triangles: np.ndarray, depth: np.ndarray, view_projection: np.ndarray
+) -> None:
+    """
+    Draws world space triangles (n x 3 x 3) into `depth`, keeping the
+    nearest. Pixels are covered by their center, and get the farthest depth
+    the triangle's plane reaches over them, so the buffer never claims more
+    than the triangles hide
+    """
+    height, width = depth.shape
+    clip = clip_near(_homogeneous(triangles) @ view_projection.T)
+    if len(clip) == 0:
+        return
+
+    ndc = clip[:, :, :3] / clip[:, :, 3:]
+    x = (ndc[:, :, 0] * 0.5 + 0.5) * width
+    y = (ndc[:, :, 1] * 0.5 + 0.5) * height
+    z = ndc[:, :, 2] * 0.5 + 0.5
+
+    # Pixels whose center is inside each triangle's bounding box
+    x0 = np.maximum(np.ceil(x.min(axis=1) - 0.5), 0).astype(np.int64)
+    x1 = np.minimum(np.floor(x.max(axis=1) - 0.5), width - 1).astype(np.int64)
+    y0 = np.maximum(np.ceil(y.min(axis=1) - 0.5), 0).astype(np.int64)
+    y1 = np.minimum(np.floor(y.max(axis=1) - 0.5), height - 1).astype(np.int64)
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (
+        y[:, 1] - y[:, 0]
+    )
+    drawn = (x0 <= x1) & (y0 <= y1) & (np.abs(area) > 1e-12)
+    if not np.any(drawn):
+        return
+    x, y, z = x[drawn], y[drawn], z[drawn]
+    x0, x1, y0, y1, area = x0[drawn], x1[drawn], y0[drawn], y1[drawn], area[drawn]
+
+    # Barycentric weights as planes over the screen, w = a x + b y + c
+    a = np.stack([y[:, 1] - y[:, 2], y[:, 2] - y[:, 0], y[:, 0] - y[:, 1]], axis=1)
+    b = np.stack([x[:, 2] - x[:, 1], x[:, 0] - x[:, 2], x[:, 1] - x[:, 0]], axis=1)
+    c = np.stack(
+        [
+            x[:, 1] * y[:, 2] - x[:, 2] * y[:, 1],
+            x[:, 2] * y[:, 0] - x[:, 0] * y[:, 2],
+            x[:, 0] * y[:, 1] - x[:, 1] * y[:, 0],
+        ],
+        axis=1,
+    )
+    a, b, c = a / area[:, None], b / area[:, None], c / area[:, None]
+    # Depth's plane, and how much it grows across half a pixel
+    dzdx = np.einsum("ij,ij->i", a, z)
+    dzdy = np.einsum("ij,ij->i", b, z)
+    z0 = np.einsum("ij,ij->i", c, z)
+    slope = 0.5 * (np.abs(dzdx) + np.abs(dzdy))
+
+    # Each row of each bounding box, and the span of it inside the triangle:
+    # where every weight is positive
+    heights = y1 - y0 + 1
+    triangle = np.repeat(np.arange(len(heights)), heights)
+    py = (
+        y0[triangle]
+        + np.arange(len(triangle))
+        - np.repeat(np.cumsum(heights) - heights, heights)
+    )
+    cy = py + 0.5
+    offset = b[triangle] * cy[:, None] + c[triangle]
+    edge = a[triangle]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bound = -offset / edge
+    lower = np.where(edge > 0, bound, -np.inf)
+    lower = np.where((edge == 0) & (offset < 0), np.inf, lower)
+    upper = np.where(edge < 0, bound, np.inf)
+    left = np.maximum(np.ceil(lower.max(axis=1) - 0.5 - 1e-6), x0[triangle])
+    right = np.minimum(np.floor(upper.min(axis=1) - 0.5 + 1e-6), x1[triangle])
+    covered = right >= left
+    triangle, py, cy = triangle[covered], py[covered], cy[covered]
+    left = left[covered].astype(np.int64)
+    widths = right[covered].astype(np.int64) - left + 1
+
+    # Every pixel of the spans
+    row = np.repeat(np.arange(len(widths)), widths)
+    px = left[row] + np.arange(len(row)) - np.repeat(np.cumsum(widths) - widths, widths)
+    row_depth = z0[triangle] + dzdy[triangle] * cy + slope[triangle]
+    pixel_depth = np.minimum(
+        row_depth[row] + dzdx[triangle][row] * (px + 0.5),
+        z.max(axis=1)[triangle][row],
+    )
+    np.minimum.at(depth.reshape(-1), py[row] * width + px, pixel_depth)
+
+
+class DepthPyramid:
+    """
+    Mip chain of a depth buffer where each texel is the farthest of the 2x2
+    below it, so a few texels bound the occluders over any rectangle
+    """
+
+    # Every level, flattened one after another
+    texels: np.ndarray
+    offsets: np.ndarray
+    widths: np.ndarray
+
+    def __init__(self, depth: np.ndarray) -> None:
+        levels = [depth]
+        while levels[-1].shape != (1, 1):
+            level = levels[-1]
+            height, width = level.shape
+            # Texels past the edge are never looked at, they can't hide anything
+            padded = np.zeros((height + height % 2, width + width % 2))
+            padded[:height, :width] = level
+            levels.append(
+                padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).max(
+                    axis=(1, 3)
+                )
+            )
+        sizes = [level.size for level in levels]
+        self.texels = np.concatenate([level.ravel() for level in levels])
+        self.offsets = np.cumsum([0] + sizes[:-1])
+        self.widths = np.array([level.shape[1] for level in levels])
+
+    @property
+    def level_count(self) -> int:
+        return len(self.widths)
+
+    def farthest(
+        self, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray
+    ) -> np.ndarray:
+        """
+        The farthest depth over each rectangle of pixels (inclusive), read
+        from the finest level where it spans at most `PYRAMID_TAPS` texels
+        each way. Coarser levels would mix in what's around the rectangle
+        """
+        span = np.maximum(x1 - x0, y1 - y0) + 1
+        level = np.clip(
+            np.ceil(np.log2(span / (PYRAMID_TAPS - 1))).astype(np.int64),
+            0,
+            self.level_count - 1,
+        )
+        left, right = x0 >> level, x1 >> level
+        bottom, top = y0 >> level, y1 >> level
+        steps = np.arange(PYRAMID_TAPS)
+        columns = np.minimum(left[:, None] + steps, right[:, None])
+        rows = np.minimum(bottom[:, None] + steps, top[:, None])
+        indices = (
+            self.offsets[level][:, None, None]
+            + rows[:, :, None] * self.widths[level][:, None, None]
+            + columns[:, None, :]
+        )
+        return self.texels[indices].max(axis=(1, 2))
+
+
+class Occluder:
+    """
+    The large opaque triangles of an entity's model, what is drawn into the
+    software depth buffer on its behalf
+    """
+
+    entity: Entity
+    # Model space triangles, n x 3 x 3
+    triangles: np.ndarray
+
+    def __init__(self, entity: Entity, triangles: np.ndarray) -> None:
+        self.entity = entity
+        self.triangles = triangles
+
+    @staticmethod
+    def from_entity(entity: Entity, min_area: float = OCCLUDER_MIN_AREA) -> "Occluder":
+        """
+        Keeps the triangles of the entity's opaque segments at least
+        `min_area` large: a subset of what the model covers, so the entity
+        hides at least what its occluder does
+        """
+        model = entity.model
+        triangles = []
+        for start, count, material in model.segments:
+            if material.transparency != OPAQUE:
+                continue
+            corners = model.vertices[model.indices[start : start + count]]
+            corners = corners.reshape(-1, 3, 3).astype(np.float64)
+            normals = np.cross(
+                corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+            )
+            areas = np.linalg.norm(normals, axis=1) / 2
+            triangles.append(corners[areas >= min_area])
+        return Occluder(entity, np.concatenate(triangles or [np.zeros((0, 3, 3))]))
+
+
+class OcclusionCuller:
+    """
+    Hierarchical Z occlusion culling on the CPU: the occluders are drawn
+    into a small depth buffer, whose `DepthPyramid` then tells whether an
+    object's bounding box is behind them. Boxes crossing the near plane or
+    off the screen are never occluded.
+
+    Everything runs with NumPy, the GPU isn't involved.
+    """
+
+    width: int
+    height: int
+    occluders: List[Occluder]
+    depth: np.ndarray
+    pyramid: DepthPyramid
+
+    _view_projection: np.ndarray
+
+    def __init__(
+        self,
+        occluders: List[Occluder],
+        width: int = OCCLUSION_WIDTH,
+        height: int = OCCLUSION_HEIGHT,
+    ) -> None:
+        self.width = width
+        self.height = height
+        self.occluders = occluders
+        self.depth = np.ones((height, width))
+        self.pyramid = DepthPyramid(self.depth)
+        self._view_projection = np.eye(4)
+
+    def render(
+        self,
+        view_projection: np.ndarray,
+        occluders: Iterable[Tuple[np.ndarray, np.ndarray]],
+    ) -> None:
+        """Draws the (triangles, model matrix) of the occluders for a camera"""
+        self._view_projection = view_projection.astype(np.float64)
+        self.depth = np.ones((self.height, self.width))
+        for triangles, matrix in occluders:
+            world = triangles @ matrix[:3, :3].T + matrix[:3, 3]
+            rasterize(world, self.depth, self._view_projection)
+        self.pyramid = DepthPyramid(self.depth)
+
+    def occluded(self, corners: np.ndarray) -> np.ndarray:
+        """Which of the world space boxes (n x 8 x 3 corners) are hidden"""
+        hidden = np.zeros(len(corners), dtype=bool)
+        if len(corners) == 0:
+            return hidden
+
+        clip = _homogeneous(corners) @ self._view_projection.T
+        in_front = np.all(clip[:, :, 2] + clip[:, :, 3] > 0, axis=1)
+        clip = clip[in_front]
+        ndc = clip[:, :, :3] / clip[:, :, 3:]
+        x = (ndc[:, :, 0] * 0.5 + 0.5) * self.width
+        y = (ndc[:, :, 1] * 0.5 + 0.5) * self.height
+        nearest = (ndc[:, :, 2] * 0.5 + 0.5).min(axis=1)
+
+        # One more pixel around, the buffer is only exact at pixel centers
+        x0 = np.floor(x.min(axis=1)).astype(np.int64) - 1
+        x1 = np.floor(x.max(axis=1)).astype(np.int64) + 1
+        y0 = np.floor(y.min(axis=1)).astype(np.int64) - 1
+        y1 = np.floor(y.max(axis=1)).astype(np.int64) + 1
+        on_screen = (x1 >= 0) & (x0 < self.width) & (y1 >= 0) & (y0 < self.height)
+        x0 = np.clip(x0, 0, self.width - 1)
+        x1 = np.clip(x1, 0, self.width - 1)
+        y0 = np.clip(y0, 0, self.height - 1)
+        y1 = np.clip(y1, 0, self.height - 1)
+
+        behind = on_screen & (nearest > self.pyramid.farthest(x0, y0, x1, y1))
+        hidden[np.flatnonzero(in_front)[behind]] = True
+        return hidden
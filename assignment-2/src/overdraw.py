@@ -0,0 +1,89 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import List, Optional
+
+from gl_backend import gl
+
+# The pre-pass is turned on when the opaque pass shades more than this many
+# samples per covered pixel, and off again under the second threshold
+PREPASS_ON_OVERDRAW = 1.5
+PREPASS_OFF_OVERDRAW = 1.25
+# While it's off, every this many frames still run it to measure again
+PROBE_INTERVAL = 60
+
+# Query around the depth pre-pass, and around the opaque color pass after it
+DEPTH_QUERY = 0
+COLOR_QUERY = 1
+
+
+class OverdrawProbe:
+    """
+    Measures the overdraw of the opaque pass with two occlusion queries, and
+    decides from it whether the depth pre-pass pays off.
+
+    The samples passing the pre-pass are every surface nearer than whatever
+    was drawn before it, what the color pass shades without the pre-pass.
+    Those passing the equality test afterwards are one per covered pixel.
+    Results are read once the GPU has them, a frame or more later, so
+    measuring never stalls the CPU.
+    """
+
+    # Whether the pre-pass should run, as of the last measurement
+    enabled: bool
+    # Shaded samples per covered pixel, 0.0 until measured
+    overdraw: float
+    # Whether the queries are in flight
+    pending: bool
+
+    _queries: Optional[List[int]]
+    _frames_off: int
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.overdraw = 0.0
+        self.pending = False
+        self._queries = None
+        # Measure on the first frame
+        self._frames_off = PROBE_INTERVAL
+
+    def due(self) -> bool:
+        """Whether this frame should run the pre-pass, called once per frame"""
+        if self.enabled:
+            return True
+        if self.pending:
+            return False
+        self._frames_off += 1
+        if self._frames_off < PROBE_INTERVAL:
+            return False
+        self._frames_off = 0
+        return True
+
+    def begin(self, query: int) -> None:
+        if self._queries is None:
+            self._queries = [int(query_id) for query_id in gl.glGenQueries(2)]
+        gl.glBeginQuery(gl.GL_SAMPLES_PASSED, self._queries[query])
+
+    def end(self) -> None:
+        gl.glEndQuery(gl.GL_SAMPLES_PASSED)
+        self.pending = True
+
+    def poll(self) -> None:
+        """Reads the last measurement if the GPU finished it"""
+        if not self.pending or self._queries is None:
+            return
+        depth_query, color_query = self._queries
+        if not gl.glGetQueryObjectuiv(color_query, gl.GL_QUERY_RESULT_AVAILABLE):
+            return
+        self.pending = False
+
+        depth = gl.glGetQueryObjectuiv(depth_query, gl.GL_QUERY_RESULT)
+        color = gl.glGetQueryObjectuiv(color_query, gl.GL_QUERY_RESULT)
+        self.overdraw = depth / color if color > 0 else 0.0
+        if self.overdraw > PREPASS_ON_OVERDRAW:
+            self.enabled = True
+        elif self.overdraw < PREPASS_OFF_OVERDRAW:
+            self.enabled = False
+            self._frames_off = 0
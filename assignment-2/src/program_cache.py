@@ -0,0 +1,135 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import ctypes
+import hashlib
+import os
+import struct
+from typing import Any, Dict, Optional, cast
+
+from OpenGL.error import GLError
+
+from gl_backend import gl
+
+# File header: the binary format enum
+HEADER = struct.Struct("<I")
+
+
+class ProgramCache:
+    """
+    Linked program binaries (glGetProgramBinary) stored on disk, keyed by the
+    shader sources, their defines and the GL driver that produced them.
+
+    Binaries from another driver, or that fail to load for any other reason,
+    are dropped and the program is compiled from source again.
+    """
+
+    directory: str
+    hits: int
+    misses: int
+    _driver: Optional[str]
+    _supported: Optional[bool]
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._driver = None
+        self._supported = None
+
+    @property
+    def supported(self) -> bool:
+        """Whether the current context can save and load program binaries"""
+        if self._supported is None:
+            formats = gl.glGetIntegerv(gl.GL_NUM_PROGRAM_BINARY_FORMATS)
+            self._supported = int(formats) > 0
+        return self._supported
+
+    @property
+    def driver(self) -> str:
+        """Identifies the driver build, binaries aren't portable across them"""
+        if self._driver is None:
+            self._driver = "\n".join(
+                cast(bytes, gl.glGetString(name) or b"").decode()
+                for name in (gl.GL_VENDOR, gl.GL_RENDERER, gl.GL_VERSION)
+            )
+        return self._driver
+
+    def key(
+        self, vertex_source: str, fragment_source: str, defines: Dict[str, Any]
+    ) -> str:
+        digest = hashlib.sha256()
+        for part in (
+            self.driver,
+            vertex_source,
+            fragment_source,
+            repr(sorted(defines.items())),
+        ):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".bin")
+
+    def load(self, key: str) -> Optional[int]:
+        """A linked program from the cached binary, or None on a miss"""
+        path = self._path(key)
+        if not self.supported or not os.path.isfile(path):
+            self.misses += 1
+            return None
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        if len(data) > HEADER.size:
+            (binary_format,) = HEADER.unpack_from(data)
+            binary = data[HEADER.size :]
+            program_id = cast(int, gl.glCreateProgram())
+            try:
+                # A format the driver no longer accepts is an error, not a
+                # failed link
+                gl.glProgramBinary(program_id, binary_format, binary, len(binary))
+                linked = gl.glGetProgramiv(program_id, gl.GL_LINK_STATUS)
+            except GLError:
+                linked = False
+            if linked:
+                self.hits += 1
+                return program_id
+            gl.glDeleteProgram(program_id)
+
+        # Stale or corrupted, it will be replaced after compiling
+        os.remove(path)
+        self.misses += 1
+        return None
+
+    def store(self, key: str, program_id: int) -> None:
+        """Saves the binary of a linked program"""
+        if not self.supported:
+            return
+
+        size = int(gl.glGetProgramiv(program_id, gl.GL_PROGRAM_BINARY_LENGTH))
+        if size == 0:
+            return
+
+        binary = ctypes.create_string_buffer(size)
+        length = ctypes.c_int()
+        binary_format = ctypes.c_uint()
+        gl.glGetProgramBinary(
+            program_id,
+            size,
+            ctypes.byref(length),
+            ctypes.byref(binary_format),
+            binary,
+        )
+
+        # Write to a temporary file first, so readers never see partial binaries
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(binary_format.value))
+            f.write(binary.raw[: length.value])
+        os.replace(temp_path, path)
@@ -0,0 +1,227 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import ctypes
+from typing import List, NamedTuple, Optional, Sequence
+
+from gl_backend import gl
+from light_source import MAX_LIGHTS
+from render_stats import RenderStats
+from render_target import RenderTarget
+from renderer import Renderer
+
+
+class QualityLevel(NamedTuple):
+    # Fraction of the window's resolution the scene is drawn at
+    render_scale: float
+    # Samples per pixel, 0 without multisampling
+    samples: int
+    # Levels of detail added to the ones picked by size
+    lod_bias: int
+    # Lights shaded per fragment at most
+    max_lights: int
+
+
+# From best to cheapest. The first is what the window had before: full
+# resolution and 4x multisampling. Multisampling goes first, it costs the most
+# for the least visible difference, then resolution, detail and lights
+QUALITY_LEVELS = (
+    QualityLevel(1.0, 4, 0, MAX_LIGHTS),
+    QualityLevel(1.0, 2, 0, MAX_LIGHTS),
+    QualityLevel(1.0, 0, 0, MAX_LIGHTS),
+    QualityLevel(0.85, 0, 0, MAX_LIGHTS),
+    QualityLevel(0.7, 0, 1, MAX_LIGHTS),
+    QualityLevel(0.6, 0, 1, 2),
+    QualityLevel(0.5, 0, 2, 1),
+)
+
+# How much each frame moves the smoothed frame cost
+SMOOTHING = 0.1
+# The level goes down once the smoothed cost stays over the budget for this
+# many frames, and back up once it stays under this fraction of it for more
+# (so a level that barely fits isn't left only to be dropped again)
+DOWNGRADE_FRAMES = 10
+UPGRADE_RATIO = 0.7
+UPGRADE_FRAMES = 60
+# Each time a level goes back down right after going up, the next try waits
+# twice as long, up to this many times UPGRADE_FRAMES
+MAX_UPGRADE_BACKOFF = 16
+# Frames ignored after a change, until the GPU timings reflect it
+SETTLE_FRAMES = 5
+
+# Timer queries in flight, results are read this many frames late
+TIMER_QUERIES = 3
+
+
+class GpuFrameTimer:
+    """
+    Measures the GPU time of each frame with GL_TIME_ELAPSED queries, a few
+    in flight at once. Results are read once the GPU has them, a couple of
+    frames later, so measuring never stalls the CPU.
+    """
+
+    # Last measured GPU time, None until one is available
+    gpu_time: Optional[float]
+
+    _queries: Optional[List[int]]
+    _next: int
+    _pending: List[int]
+    # Whether a query was begun this frame
+    _timing: bool
+
+    def __init__(self) -> None:
+        self.gpu_time = None
+        self._queries = None
+        self._next = 0
+        self._pending = []
+        self._timing = False
+
+    def begin(self) -> None:
+        if self._queries is None:
+            self._queries = [int(query) for query in gl.glGenQueries(TIMER_QUERIES)]
+        # Every query is still in flight: skip timing this frame
+        self._timing = len(self._pending) < TIMER_QUERIES
+        if not self._timing:
+            return
+        query = self._queries[self._next]
+        self._next = (self._next + 1) % TIMER_QUERIES
+        gl.glBeginQuery(gl.GL_TIME_ELAPSED, query)
+        self._pending.append(query)
+
+    def end(self) -> None:
+        if self._timing:
+            gl.glEndQuery(gl.GL_TIME_ELAPSED)
+            self._timing = False
+
+    def poll(self) -> Optional[float]:
+        """Reads the finished queries, returns the latest GPU time known"""
+        while self._pending:
+            query = self._pending[0]
+            if not gl.glGetQueryObjectuiv(query, gl.GL_QUERY_RESULT_AVAILABLE):
+                break
+            # PyOpenGL can't allocate 64 bit outputs itself
+            result = ctypes.c_uint64()
+            gl.glGetQueryObjectui64v(query, gl.GL_QUERY_RESULT, ctypes.byref(result))
+            self.gpu_time = result.value / 1e9
+            self._pending.pop(0)
+        return self.gpu_time
+
+
+class QualityGovernor:
+    """
+    Keeps frames within a time budget by walking a ladder of quality levels:
+    render scale (through a `RenderTarget`), multisampling, level of detail
+    bias and lights per fragment.
+
+    Each frame costs the larger of its CPU time and its GPU time: with vsync
+    the time between frames only shows the refresh rate, not how close the
+    frame came to missing it. The cost is smoothed, and the level changes
+    one step at a time with hysteresis: it drops after a few frames over the
+    budget, and only rises after many well under it. Levels can cost far
+    apart, so rising into one that is then dropped again backs off the next
+    try.
+    """
+
+    budget: float
+    levels: Sequence[QualityLevel]
+    level: int
+    # Smoothed cost of the last frames, in seconds
+    frame_cost: float
+    # Times the level changed
+    changes: int
+
+    _over: int
+    _under: int
+    _settle: int
+    # Frames under the budget needed to rise, with the backoff
+    _upgrade_frames: int
+    # Frames at the current level, and whether it was reached by rising
+    _held: int
+    _rose: bool
+
+    def __init__(
+        self,
+        budget: float = 1 / 60,
+        levels: Sequence[QualityLevel] = QUALITY_LEVELS,
+        level: int = 0,
+    ) -> None:
+        self.budget = budget
+        self.levels = levels
+        self.level = level
+        self.frame_cost = 0.0
+        self.changes = 0
+        self._over = 0
+        self._under = 0
+        self._settle = SETTLE_FRAMES
+        self._upgrade_frames = UPGRADE_FRAMES
+        self._held = 0
+        self._rose = False
+
+    @property
+    def settings(self) -> QualityLevel:
+        return self.levels[self.level]
+
+    def update(self, cpu_time: float, gpu_time: Optional[float] = None) -> bool:
+        """
+        Accounts for the last frame's cost, returns whether the level changed
+        """
+        self._held += 1
+        if self._rose and self._held >= UPGRADE_FRAMES:
+            # The level held up, the next rise doesn't have to wait as long
+            self._rose = False
+            self._upgrade_frames = UPGRADE_FRAMES
+        if self._settle > 0:
+            self._settle -= 1
+            return False
+
+        cost = max(cpu_time, gpu_time or 0.0)
+        if self.frame_cost == 0.0:
+            self.frame_cost = cost
+        else:
+            self.frame_cost += (cost - self.frame_cost) * SMOOTHING
+
+        self._over = self._over + 1 if self.frame_cost > self.budget else 0
+        self._under = (
+            self._under + 1 if self.frame_cost < self.budget * UPGRADE_RATIO else 0
+        )
+        if self._over >= DOWNGRADE_FRAMES and self.level < len(self.levels) - 1:
+            if self._rose:
+                self._upgrade_frames = min(
+                    self._upgrade_frames * 2, UPGRADE_FRAMES * MAX_UPGRADE_BACKOFF
+                )
+            return self._change(self.level + 1)
+        if self._under >= self._upgrade_frames and self.level > 0:
+            return self._change(self.level - 1)
+        return False
+
+    def _change(self, level: int) -> bool:
+        self._rose = level < self.level
+        self._held = 0
+        self.level = level
+        self.changes += 1
+        self._over = 0
+        self._under = 0
+        # The old level's cost says nothing about the new one
+        self.frame_cost = 0.0
+        self._settle = SETTLE_FRAMES
+        return True
+
+    def apply(self, renderer: Renderer, target: RenderTarget) -> None:
+        """Sets the current level on the renderer and the render target"""
+        settings = self.settings
+        target.scale = settings.render_scale
+        target.samples = settings.samples
+        renderer.lod_bias = settings.lod_bias
+        renderer.max_lights = settings.max_lights
+
+    def report(self, stats: RenderStats) -> None:
+        """Exposes the current decisions through the frame's stats"""
+        settings = self.settings
+        stats.quality_level = self.level
+        stats.render_scale = settings.render_scale
+        stats.msaa_samples = settings.samples
+        stats.lod_bias = settings.lod_bias
+        stats.max_lights = settings.max_lights
+        stats.frame_cost = self.frame_cost
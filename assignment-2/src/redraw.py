@@ -0,0 +1,116 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import Any, Callable, Iterable, List, Optional
+
+import glfw
+
+from camera import Camera
+from entity import Entity
+
+# Longest wait for events while idle, so the main loop still checks on the
+# window now and then
+IDLE_TIMEOUT = 0.5
+# Frames still drawn once nothing changes anymore: the last simulation step
+# is only fully reached by the frame after it, and both buffers of the swap
+# chain should hold the final image
+TRAILING_FRAMES = 2
+
+
+class RedrawScheduler:
+    """
+    Decides which frames need drawing, for on-demand redraw: only those
+    after input arrives, the window asks for it or something requests one,
+    and while the camera or an entity is animating (see `Entity.animating`).
+    Otherwise the main loop sleeps in `wait` until an event comes.
+
+    `paused` freezes the entities' animations (toggled with `pause_key`), so
+    a scene that always animates can still go idle.
+    """
+
+    entities: List[Entity]
+    camera: Optional[Camera]
+    # Draw only when needed, False to draw every frame
+    enabled: bool
+    paused: bool
+    pause_key: int
+    timeout: float
+    # Times the loop slept waiting for events
+    waits: int
+
+    _requested: bool
+    _trailing: int
+    _wait: Callable[[float], None]
+
+    def __init__(
+        self,
+        entities: Iterable[Entity],
+        camera: Optional[Camera] = None,
+        enabled: bool = True,
+        timeout: float = IDLE_TIMEOUT,
+        pause_key: int = glfw.KEY_T,
+        wait: Callable[[float], None] = glfw.wait_events_timeout,
+    ) -> None:
+        self.entities = list(entities)
+        self.camera = camera
+        self.enabled = enabled
+        self.paused = False
+        self.pause_key = pause_key
+        self.timeout = timeout
+        self.waits = 0
+        # Draw the first frame
+        self._requested = True
+        self._trailing = 0
+        self._wait = wait
+
+    def request(self) -> None:
+        """Asks for the next frame to be drawn"""
+        self._requested = True
+
+    def animating(self) -> bool:
+        """Whether the camera or any (unpaused) entity changes by itself"""
+        if self.camera is not None and self.camera.animating():
+            return True
+        return not self.paused and any(entity.animating() for entity in self.entities)
+
+    def due(self) -> bool:
+        """Whether the next frame has to be drawn, called once per frame"""
+        if not self.enabled:
+            return True
+        if self._requested or self.animating():
+            self._requested = False
+            self._trailing = TRAILING_FRAMES
+            return True
+        if self._trailing > 0:
+            self._trailing -= 1
+            return True
+        return False
+
+    def wait(self) -> None:
+        """Sleeps until an event arrives, or `timeout` passes"""
+        self.waits += 1
+        self._wait(self.timeout)
+
+    def key_handler(
+        self,
+        win: Any,
+        key: int,
+        scancode: int,
+        action: int,
+        mods: int,
+    ) -> None:
+        """Redraws on any key, and pauses the animations with `pause_key`"""
+        if key == self.pause_key and action == glfw.PRESS:
+            self.paused = not self.paused
+        self.request()
+
+    def cursor_handler(
+        self, win: Any, x: float, y: float, rel_x: float, rel_y: float
+    ) -> None:
+        self.request()
+
+    def refresh_handler(self, win: Any) -> None:
+        """Redraws when the window system lost the window's contents"""
+        self.request()
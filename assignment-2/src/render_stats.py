@@ -0,0 +1,126 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import Dict, List
+
+from gl_backend import gl
+from light_source import MAX_LIGHTS
+
+
+class RenderStats:
+    """Counters of the work submitted to the GPU during a single frame"""
+
+    draw_calls: int
+    triangles: int
+    program_switches: int
+    texture_binds: int
+    uniform_uploads: int
+    # Uniform uploads skipped because the program already had the value
+    uniform_skips: int
+    culled_entities: int
+    # Entities skipped because the occluders hide them
+    occluded_entities: int
+    # Entities skipped because their cell is out of view, and the cells in it
+    cell_culled_entities: int
+    visible_cells: int
+    buffer_uploads: int
+    # Whether the depth pre-pass ran, and the last overdraw it measured
+    depth_prepass: bool
+    overdraw: float
+    frame_time: float
+    # Decisions of the quality governor (see `quality_governor`), and the
+    # frame cost it last measured. Left at full quality without one
+    quality_level: int
+    render_scale: float
+    msaa_samples: int
+    lod_bias: int
+    max_lights: int
+    frame_cost: float
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """Zeroes all the counters, called at the start of every frame"""
+        self.draw_calls = 0
+        self.triangles = 0
+        self.program_switches = 0
+        self.texture_binds = 0
+        self.uniform_uploads = 0
+        self.uniform_skips = 0
+        self.culled_entities = 0
+        self.occluded_entities = 0
+        self.cell_culled_entities = 0
+        self.visible_cells = 0
+        self.buffer_uploads = 0
+        self.depth_prepass = False
+        self.overdraw = 0.0
+        self.frame_time = 0.0
+        self.quality_level = 0
+        self.render_scale = 1.0
+        self.msaa_samples = 0
+        self.lod_bias = 0
+        self.max_lights = MAX_LIGHTS
+        self.frame_cost = 0.0
+
+    def record_draw(self, draw_mode: int, count: int) -> None:
+        """Accounts for a draw call of `count` vertices"""
+        self.draw_calls += 1
+        if draw_mode == gl.GL_TRIANGLES:
+            self.triangles += count // 3
+        elif draw_mode in (gl.GL_TRIANGLE_STRIP, gl.GL_TRIANGLE_FAN):
+            self.triangles += max(count - 2, 0)
+
+    def record_uniforms(self, issued: int, total: int) -> None:
+        """Accounts for `total` uniform updates, of which `issued` reached GL"""
+        self.uniform_uploads += issued
+        self.uniform_skips += total - issued
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "draw_calls": self.draw_calls,
+            "triangles": self.triangles,
+            "program_switches": self.program_switches,
+            "texture_binds": self.texture_binds,
+            "uniform_uploads": self.uniform_uploads,
+            "uniform_skips": self.uniform_skips,
+            "culled_entities": self.culled_entities,
+            "occluded_entities": self.occluded_entities,
+            "cell_culled_entities": self.cell_culled_entities,
+            "visible_cells": self.visible_cells,
+            "buffer_uploads": self.buffer_uploads,
+            "depth_prepass": self.depth_prepass,
+            "overdraw": self.overdraw,
+            "frame_time": self.frame_time,
+            "quality_level": self.quality_level,
+            "render_scale": self.render_scale,
+            "msaa_samples": self.msaa_samples,
+            "lod_bias": self.lod_bias,
+            "max_lights": self.max_lights,
+            "frame_cost": self.frame_cost,
+        }
+
+    def lines(self) -> List[str]:
+        """Formats the counters as human readable lines (used by the HUD)"""
+        fps = 1.0 / self.frame_time if self.frame_time > 0 else 0.0
+        return [
+            f"Frame: {self.frame_time * 1000:.2f}ms ({fps:.0f} FPS)",
+            f"Draw calls: {self.draw_calls}",
+            f"Triangles: {self.triangles}",
+            f"Program switches: {self.program_switches}",
+            f"Texture binds: {self.texture_binds}",
+            f"Uniform uploads: {self.uniform_uploads} ({self.uniform_skips} skipped)",
+            f"Culled entities: {self.culled_entities}"
+            f" ({self.occluded_entities} occluded,"
+            f" {self.cell_culled_entities} in hidden cells)",
+            f"Visible cells: {self.visible_cells}",
+            f"Buffer uploads: {self.buffer_uploads}",
+            f"Depth pre-pass: {'on' if self.depth_prepass else 'off'}"
+            f" (overdraw {self.overdraw:.2f})",
+            f"Quality: level {self.quality_level}"
+            f" (cost {self.frame_cost * 1000:.2f}ms)",
+            f"Render scale: {self.render_scale:.2f}, MSAA: {self.msaa_samples}x",
+            f"LOD bias: +{self.lod_bias}, lights: {self.max_lights}",
+        ]
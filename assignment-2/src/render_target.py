@@ -0,0 +1,155 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import List, Optional, Tuple, cast
+
+from gl_backend import gl
+
+
+class RenderTarget:
+    """
+    An offscreen framebuffer the scene is drawn into at `scale` times the
+    window's resolution, with `samples` samples per pixel, then resolved and
+    scaled up into the window's framebuffer (`output`). At full scale and
+    without multisampling it steps aside and the scene is drawn straight
+    into the window.
+
+    Multisampled framebuffers can only be resolved at their own size and
+    into the same format, so they are first resolved into a second one,
+    which is then scaled. The window must not be multisampled itself, blits
+    can't write into one.
+    """
+
+    scale: float
+    samples: int
+    # Framebuffer the scene ends up in, 0 for the window's
+    output: int
+    # Size of the framebuffers, as last allocated
+    width: int
+    height: int
+
+    _framebuffers: Optional[List[int]]
+    _renderbuffers: Optional[List[int]]
+    _allocated: Optional[Tuple[int, int, int]]
+    _max_samples: Optional[int]
+
+    def __init__(self, scale: float = 1.0, samples: int = 0, output: int = 0) -> None:
+        self.scale = scale
+        self.samples = samples
+        self.output = output
+        self.width = 0
+        self.height = 0
+        self._framebuffers = None
+        self._renderbuffers = None
+        self._allocated = None
+        self._max_samples = None
+
+    @property
+    def active(self) -> bool:
+        """Whether the scene goes through the offscreen framebuffer"""
+        return self.scale != 1.0 or self.samples > 0
+
+    def _allocate(self, width: int, height: int, samples: int) -> None:
+        """(Re)creates the storage of the framebuffers for the given size"""
+        if self._framebuffers is None:
+            self._framebuffers = [int(f) for f in gl.glGenFramebuffers(2)]
+            self._renderbuffers = [int(r) for r in gl.glGenRenderbuffers(3)]
+        scene, resolve = self._framebuffers
+        color, depth, resolved = cast(List[int], self._renderbuffers)
+
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, scene)
+        for renderbuffer, storage, attachment in (
+            (color, gl.GL_RGBA8, gl.GL_COLOR_ATTACHMENT0),
+            (depth, gl.GL_DEPTH_COMPONENT24, gl.GL_DEPTH_ATTACHMENT),
+        ):
+            gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, renderbuffer)
+            gl.glRenderbufferStorageMultisample(
+                gl.GL_RENDERBUFFER, samples, storage, width, height
+            )
+            gl.glFramebufferRenderbuffer(
+                gl.GL_FRAMEBUFFER, attachment, gl.GL_RENDERBUFFER, renderbuffer
+            )
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Incomplete framebuffer: {status}")
+
+        if samples > 0:
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, resolve)
+            gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, resolved)
+            gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_RGBA8, width, height)
+            gl.glFramebufferRenderbuffer(
+                gl.GL_FRAMEBUFFER,
+                gl.GL_COLOR_ATTACHMENT0,
+                gl.GL_RENDERBUFFER,
+                resolved,
+            )
+
+        self.width = width
+        self.height = height
+        self._allocated = (width, height, samples)
+
+    def begin(self, window_size: Tuple[int, int]) -> None:
+        """Directs the drawing into the offscreen framebuffer, if active"""
+        window_width, window_height = window_size
+        if not self.active:
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.output)
+            gl.glViewport(0, 0, window_width, window_height)
+            return
+
+        if self._max_samples is None:
+            self._max_samples = int(gl.glGetIntegerv(gl.GL_MAX_SAMPLES))
+        samples = min(self.samples, self._max_samples)
+        width = max(int(window_width * self.scale), 1)
+        height = max(int(window_height * self.scale), 1)
+        if self._allocated != (width, height, samples):
+            self._allocate(width, height, samples)
+
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, cast(List[int], self._framebuffers)[0])
+        gl.glViewport(0, 0, width, height)
+
+    def end(self, window_size: Tuple[int, int]) -> None:
+        """Resolves and scales the scene up into the output framebuffer"""
+        if not self.active:
+            return
+        window_width, window_height = window_size
+
+        scene, resolve = cast(List[int], self._framebuffers)
+        width, height, samples = cast(Tuple[int, int, int], self._allocated)
+        source = scene
+        if samples > 0:
+            gl.glBindFramebuffer(gl.GL_READ_FRAMEBUFFER, scene)
+            gl.glBindFramebuffer(gl.GL_DRAW_FRAMEBUFFER, resolve)
+            gl.glBlitFramebuffer(
+                0,
+                0,
+                width,
+                height,
+                0,
+                0,
+                width,
+                height,
+                gl.GL_COLOR_BUFFER_BIT,
+                gl.GL_NEAREST,
+            )
+            source = resolve
+
+        gl.glBindFramebuffer(gl.GL_READ_FRAMEBUFFER, source)
+        gl.glBindFramebuffer(gl.GL_DRAW_FRAMEBUFFER, self.output)
+        gl.glBlitFramebuffer(
+            0,
+            0,
+            width,
+            height,
+            0,
+            0,
+            window_width,
+            window_height,
+            gl.GL_COLOR_BUFFER_BIT,
+            gl.GL_LINEAR,
+        )
+
+        # Whatever comes next (the HUD) draws into the output at full size
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.output)
+        gl.glViewport(0, 0, window_width, window_height)
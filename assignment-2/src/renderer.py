@@ -3,68 +3,355 @@
 # D. H. Lelis - 12543822
 # Samuel Figueiredo Veronez - 12542626
 
-from typing import Any, cast
+import ctypes
+from typing import Any, List, Optional, Set, Tuple, cast
 import glfw
 import numpy as np
-import OpenGL.GL as gl
+from gl_backend import gl
+from gl_state import gl_state
 import glm
 
-from entity import Entity
+from entity import Entity, EntityRows
 from shader import Shader
 from camera import Camera
+from cells import CellGraph
+from light_source import LightSource, MAX_LIGHTS
+from render_stats import RenderStats
+from draw_packets import DrawPackets, LevelDraws, MaterialUniforms, PacketRow
+from material import ALPHA_TESTED, BLENDED, OPAQUE
+from material_table import MATERIAL_TABLE_UNIT
+from model import INDEX_SIZE
+from occlusion import OcclusionCuller, box_corners
+from overdraw import COLOR_QUERY, DEPTH_QUERY, OverdrawProbe
+from skybox import Skybox
+
+# Uniforms uploaded per entity (with lights) and per material
+ENTITY_UNIFORMS = 8
+MATERIAL_UNIFORMS = 5
+
+# Projected size (bounding sphere radius over half the viewport height) under
+# which each level of detail after the full one is drawn
+LOD_SCREEN_SIZES = (0.25, 0.12, 0.06)
+# How far past a threshold the size has to go to switch levels, so entities
+# near one don't alternate between them
+LOD_HYSTERESIS = 0.2
+
+# An entity as drawn this frame: itself, the draws of its level of detail, its
+# model matrix and whether it ignores lighting
+EntityDraw = Tuple[Entity, LevelDraws, np.ndarray, bool]
+
+
+def _staging_buffer(*shape: int) -> np.ndarray:
+    return np.zeros(shape, dtype=np.float32)
+
+
+def model_matrices(transforms: np.ndarray) -> np.ndarray:
+    """
+    The model matrices (n x 4 x 4, translation in the last column) of
+    `entity.store.TRANSFORM` records: translate, rotate around x, y and z,
+    then scale, like `Renderer._model_matrix_glm` does one at a time
+    """
+    angles = np.radians(transforms["angles"].astype(np.float64))
+    cos, sin = np.cos(angles), np.sin(angles)
+    cx, cy, cz = cos.T
+    sx, sy, sz = sin.T
+    rotations = np.empty((len(transforms), 3, 3))
+    # Rx(x) * Ry(y) * Rz(z), multiplied out
+    rotations[:, 0, 0] = cy * cz
+    rotations[:, 0, 1] = -cy * sz
+    rotations[:, 0, 2] = sy
+    rotations[:, 1, 0] = sx * sy * cz + cx * sz
+    rotations[:, 1, 1] = cx * cz - sx * sy * sz
+    rotations[:, 1, 2] = -sx * cy
+    rotations[:, 2, 0] = sx * sz - cx * sy * cz
+    rotations[:, 2, 1] = cx * sy * sz + sx * cz
+    rotations[:, 2, 2] = cx * cy
+
+    matrices = np.zeros((len(transforms), 4, 4), dtype=np.float32)
+    matrices[:, :3, :3] = rotations * transforms["scale"][:, np.newaxis, :]
+    matrices[:, :3, 3] = transforms["position"]
+    matrices[:, 3, 3] = 1.0
+    return matrices
 
 
 class Renderer:
     polygon_mode: bool
     ambient_color: np.ndarray
     ambient_intensity: float
+    stats: RenderStats
+    # Draw each material with its specialized shader variant
+    shader_variants: bool
+    # Merge segments sharing program, texture and material into one draw
+    multi_draw: bool
+    # Read materials from a table on the GPU, so multi-draws can span them
+    material_table: bool
+    # Draw simplified models for entities that look small
+    lod: bool
+    # Levels of detail added to the one picked by size, and lights shaded per
+    # fragment at most, lowered by the quality governor when frames run long
+    lod_bias: int
+    max_lights: int
+    # Position-only shader of the depth pre-pass, None to never run it
+    depth_shader: Optional[Shader]
+    # Run the pre-pass always (True), never (False) or when the measured
+    # overdraw calls for it (None)
+    depth_prepass: Optional[bool]
+    overdraw_probe: OverdrawProbe
+    # Skips the entities hidden behind its occluders, if any
+    occlusion: Optional[OcclusionCuller]
+    # Skips the entities in cells the camera can't see into, if any
+    cells: Optional[CellGraph]
+
+    # Entities the occluders hid this frame, by id
+    _occluded: Set[int]
+    # Rows of the entities last given to `draw_entities`
+    _rows: Optional[EntityRows]
+
+    _current_shader: Optional[Shader]
+
+    # Staging buffers reused every frame, so drawing doesn't allocate
+    _model: np.ndarray
+    _ignore_lighting: bool
+    _view: np.ndarray
+    _projection: np.ndarray
+    _view_pos: np.ndarray
+    _ambient_color: np.ndarray
+    _light_positions: np.ndarray
+    _light_colors: np.ndarray
+    _light_decay: np.ndarray
+    _light_intensities_d: np.ndarray
+    _light_intensities_s: np.ndarray
 
     def __init__(
         self,
         polygon_mode: bool = False,
         ambient_color: np.ndarray = np.array([1.0, 1.0, 1.0, 1.0]),
         ambient_intensity: float = 1.0,
+        shader_variants: bool = True,
+        multi_draw: bool = True,
+        material_table: bool = True,
+        lod: bool = True,
+        lod_bias: int = 0,
+        max_lights: int = MAX_LIGHTS,
+        depth_shader: Optional[Shader] = None,
+        depth_prepass: Optional[bool] = None,
+        occlusion: Optional[OcclusionCuller] = None,
+        cells: Optional[CellGraph] = None,
     ) -> None:
         self.polygon_mode = polygon_mode
         self.ambient_color = ambient_color
         self.ambient_intensity = ambient_intensity
-
-    def _model_matrix(self, entity: Entity) -> np.ndarray:
-        # rad_angle = np.radians(entity.angle)
+        self.stats = RenderStats()
+        self.shader_variants = shader_variants
+        self.multi_draw = multi_draw
+        self.material_table = material_table
+        self.lod = lod
+        self.lod_bias = lod_bias
+        self.max_lights = max_lights
+        self.depth_shader = depth_shader
+        self.depth_prepass = depth_prepass
+        self.overdraw_probe = OverdrawProbe()
+        self.occlusion = occlusion
+        self.cells = cells
+        self._occluded = set()
+        self._rows = None
+        self._current_shader = None
+
+        # PyGLM values are copied in through the buffer protocol. Matrices
+        # come out row-major, hence the transposed uploads
+        self._model = _staging_buffer(4, 4)
+        self._ignore_lighting = False
+        self._view = _staging_buffer(4, 4)
+        self._projection = _staging_buffer(4, 4)
+        self._view_pos = _staging_buffer(3)
+        self._ambient_color = _staging_buffer(3)
+        self._light_positions = _staging_buffer(MAX_LIGHTS, 3)
+        self._light_colors = _staging_buffer(MAX_LIGHTS, 3)
+        self._light_decay = _staging_buffer(MAX_LIGHTS, 3)
+        self._light_intensities_d = _staging_buffer(MAX_LIGHTS)
+        self._light_intensities_s = _staging_buffer(MAX_LIGHTS)
+
+    def _model_matrix_glm(self, entity: Entity) -> glm.mat4:
+        # The whole transform in one read of the entity's store, instead of a
+        # property per part
+        transform = entity.store.transforms[entity.row]
+        angle_x, angle_y, angle_z = transform["angles"].tolist()
 
         mat = glm.mat4(1.0)
-        mat = glm.translate(mat, entity.position)
+        mat = glm.translate(mat, glm.vec3(transform["position"]))
         # Join these rotations later
         mat = glm.rotate(
             mat,
-            glm.radians(entity.angle_x),
+            glm.radians(angle_x),
             glm.vec3(1.0, 0.0, 0.0),
         )
         mat = glm.rotate(
             mat,
-            glm.radians(entity.angle_y),
+            glm.radians(angle_y),
             glm.vec3(0.0, 1.0, 0.0),
         )
         mat = glm.rotate(
             mat,
-            glm.radians(entity.angle_z),
+            glm.radians(angle_z),
             glm.vec3(0.0, 0.0, 1.0),
         )
-        mat = glm.scale(
-            mat,
-            entity.scale,
-        )
-        return np.array(mat, dtype=np.float32)
+        return glm.scale(mat, glm.vec3(transform["scale"]))
+
+    def _model_matrix(self, entity: Entity) -> np.ndarray:
+        return np.array(self._model_matrix_glm(entity), dtype=np.float32)
+
+    def _view_matrix_glm(self, camera: Camera) -> glm.mat4:
+        return glm.lookAt(camera.position, camera.target, camera.up)
 
     def _view_matrix(self, camera: Camera) -> np.ndarray:
-        view = glm.lookAt(camera.position, camera.target, camera.up)
-        return np.array(view, dtype=np.float32)
+        return np.array(self._view_matrix_glm(camera), dtype=np.float32)
 
-    def _projection_matrix(self, camera: Camera):
-        projection = glm.perspective(
+    def _projection_matrix_glm(self, camera: Camera) -> glm.mat4:
+        return glm.perspective(
             glm.radians(camera.fov), camera.aspect_ratio, camera.near, camera.far
         )
-        return np.array(projection, dtype=np.float32)
+
+    def _projection_matrix(self, camera: Camera):
+        return np.array(self._projection_matrix_glm(camera), dtype=np.float32)
+
+    def screen_size(self, entity: Entity, camera: Camera) -> float:
+        """Radius of the entity's bounding sphere over half the viewport height"""
+        radius = entity.model.radius * max(entity.scale)
+        distance = glm.distance(entity.position, camera.position)
+        if distance <= radius:
+            return float("inf")
+        return radius / (distance * np.tan(np.radians(camera.fov) / 2))
+
+    def _frame_columns(
+        self, rows: EntityRows, camera: Camera
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The model matrices, flags, distances to the camera and projected sizes
+        (see `screen_size`) of the entities, read from their stores' columns
+        in one pass
+        """
+        transforms = rows.gather("transforms")
+        offsets = transforms["position"] - np.asarray(camera.position)
+        distances = np.sqrt(np.einsum("ij,ij->i", offsets, offsets))
+        radii = np.fromiter(
+            (entity.model.radius for entity in rows.entities),
+            dtype=np.float64,
+            count=len(rows),
+        ) * transforms["scale"].max(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sizes = radii / (distances * np.tan(np.radians(camera.fov) / 2))
+        sizes[distances <= radii] = np.inf
+        return model_matrices(transforms), rows.gather("flags"), distances, sizes
+
+    def select_lod(
+        self, entity: Entity, camera: Camera, size: Optional[float] = None
+    ) -> int:
+        """
+        The level of detail to draw an entity with, moving at most as far from
+        last frame's as its projected size (`size`, found if not given) is
+        past the thresholds (with some hysteresis), then coarser by
+        `lod_bias`. Updates `entity.lod`, without the bias
+        """
+        levels = min(len(entity.model.lods), len(LOD_SCREEN_SIZES))
+        if not self.lod or levels == 0:
+            entity.lod = 0
+            return 0
+
+        if size is None:
+            size = self.screen_size(entity, camera)
+        level = min(entity.lod, levels)
+        while level < levels and size < LOD_SCREEN_SIZES[level] * (1 - LOD_HYSTERESIS):
+            level += 1
+        while level > 0 and size > LOD_SCREEN_SIZES[level - 1] * (1 + LOD_HYSTERESIS):
+            level -= 1
+        entity.lod = level
+        return min(level + self.lod_bias, levels)
+
+    def update_cells(self, entities: List[Entity], camera: Camera) -> List[Entity]:
+        """
+        Finds the cells in view through the portals and tags the entities
+        with theirs. Returns the entities whose cell is in view, the only ones
+        worth any more work this frame
+        """
+        hidden = self._cell_hidden(entities, camera)
+        if hidden is None:
+            return entities
+        return [entity for entity, out in zip(entities, hidden.tolist()) if not out]
+
+    def _cell_hidden(
+        self,
+        entities: List[Entity],
+        camera: Camera,
+        positions: Optional[np.ndarray] = None,
+    ) -> Optional[np.ndarray]:
+        """
+        Updates the cells like `update_cells`, with the entities' `positions`
+        if given, and returns which entities are out of view. None without
+        cells
+        """
+        graph = self.cells
+        if graph is None:
+            return None
+
+        view_projection = np.array(
+            self._projection_matrix_glm(camera) * self._view_matrix_glm(camera)
+        )
+        graph.update(view_projection, np.asarray(camera.position), entities, positions)
+        hidden = graph.hidden(entities)
+        self.stats.visible_cells = len(graph.visible)
+        self.stats.cell_culled_entities = int(np.count_nonzero(hidden))
+        return hidden
+
+    def update_occlusion(
+        self,
+        entities: List[Entity],
+        camera: Camera,
+        matrices: Optional[np.ndarray] = None,
+        tested: Optional[np.ndarray] = None,
+    ) -> Optional[np.ndarray]:
+        """
+        Draws the occluders for the camera and finds the entities they hide,
+        which `draw_entity` and `draw_packets` then skip. The occluders' own
+        entities are always drawn. `matrices` are the entities' model
+        matrices, and `tested` which of them to test (the visible ones by
+        default). Returns which entities are hidden, None without occluders
+        """
+        self._occluded = set()
+        culler = self.occlusion
+        if culler is None:
+            return None
+
+        view_projection = np.array(
+            self._projection_matrix_glm(camera) * self._view_matrix_glm(camera)
+        )
+        culler.render(
+            view_projection,
+            (
+                (occluder.triangles, np.array(self._model_matrix_glm(occluder.entity)))
+                for occluder in culler.occluders
+                if occluder.entity.visible
+            ),
+        )
+
+        if matrices is None or tested is None:
+            columns = self._frame_columns(EntityRows(entities), camera)
+            matrices = columns[0] if matrices is None else matrices
+            tested = columns[1]["visible"] if tested is None else tested
+        occluders = {id(occluder.entity) for occluder in culler.occluders}
+        tested = tested & np.fromiter(
+            (id(entity) not in occluders for entity in entities),
+            dtype=bool,
+            count=len(entities),
+        )
+        hidden = np.zeros(len(entities), dtype=bool)
+        indices = np.flatnonzero(tested)
+        if not len(indices):
+            return hidden
+        bounds = np.stack([entities[index].model.bounds for index in indices.tolist()])
+        hidden[indices] = culler.occluded(box_corners(bounds, matrices[indices]))
+        self._occluded = {id(entities[index]) for index in np.flatnonzero(hidden)}
+        self.stats.occluded_entities = len(self._occluded)
+        return hidden
 
     def _bootstrap_lighting(self, shader: Shader, camera: Camera):
         pass
@@ -85,13 +372,20 @@ class Renderer:
 
     def init(self):
         """Initializes the render stage"""
-        gl.glEnable(gl.GL_BLEND)
-        gl.glEnable(gl.GL_DEPTH_TEST)
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-        gl.glDepthMask(gl.GL_TRUE)
+        gl_state.enable(gl.GL_BLEND)
+        gl_state.enable(gl.GL_DEPTH_TEST)
+        gl_state.depth_func(gl.GL_LESS)
+        gl_state.enable(gl.GL_TEXTURE_CUBE_MAP_SEAMLESS)
+        gl_state.blend_func(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+        gl_state.depth_mask(True)
 
     def pre_render(self) -> None:
         """Clears the buffer and prepares the pre-render"""
+        # Start counting a new frame
+        self.stats.reset()
+        # Other passes may have changed the program since the last frame
+        self._current_shader = None
+
         # Clean the screen
         gl.glClear(
             cast(int, gl.GL_COLOR_BUFFER_BIT) | cast(int, gl.GL_DEPTH_BUFFER_BIT)
@@ -99,102 +393,450 @@ class Renderer:
         gl.glClearColor(0, 0, 0, 0)
 
         # Set polygon mode
-        if self.polygon_mode:
-            gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_LINE)
-        else:
-            gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_FILL)
+        gl_state.polygon_mode(gl.GL_LINE if self.polygon_mode else gl.GL_FILL)
 
     def setup_camera(self, shader: Shader, camera: Camera):
         """Sets up the camera"""
-        view = self._view_matrix(camera)
-        projection = self._projection_matrix(camera)
-
-        gl.glUniformMatrix4fv(shader.view_loc, 1, gl.GL_TRUE, view)
-        gl.glUniformMatrix4fv(shader.projection_loc, 1, gl.GL_TRUE, projection)
-
-    def draw_entity(self, entity: Entity, camera: Camera) -> None:
-        """Draws an entity based on it's components and the camera's attributes"""
-        model = entity.model
-        light_sources = entity.light_sources
-        mat = self._model_matrix(entity)
-
-        # Separate the model into segments per material
-        segments = list(model.material_swaps.keys()) + [len(model.vertices)]
-
-        # Render each segment
-        for i in range(len(segments) - 1):
+        self._view[...] = self._view_matrix_glm(camera)
+        self._projection[...] = self._projection_matrix_glm(camera)
+        self._view_pos[...] = camera.position
+
+        issued = (
+            shader.view_uniform.set_mat4(self._view)
+            + shader.projection_uniform.set_mat4(self._projection)
+            + shader.view_pos_uniform.set_vec3(self._view_pos)
+        )
+        self.stats.record_uniforms(issued, 3)
+
+    def _setup_program(self, shader: Shader, camera: Camera) -> None:
+        """Uploads the per-frame uniforms once the program is made current"""
+        self.setup_camera(shader, camera)
+
+        # Setup ambient lights
+        self._ambient_color[:] = self.ambient_color[:3]
+        issued = shader.ambient_color_uniform.set_vec3(
+            self._ambient_color
+        ) + shader.ambient_intensity_uniform.set_float(self.ambient_intensity)
+        self.stats.record_uniforms(issued, 2)
+
+        if shader.materials_uniform.location != -1:
+            self.stats.record_uniforms(
+                shader.materials_uniform.set_int(MATERIAL_TABLE_UNIT), 1
+            )
 
-            # Segment endpoints
-            start = segments[i]
-            end = segments[i + 1]
+    def _stage_lights(self, light_sources: List[LightSource]) -> int:
+        """Packs the light sources into the staging arrays, returns their count"""
+        count = min(len(light_sources), self.max_lights)
+        for i in range(count):
+            light = light_sources[i]
+            self._light_positions[i] = light.position
+            self._light_colors[i] = light.color
+            self._light_decay[i] = light.decay_coefs
+            self._light_intensities_d[i] = light.intensity_d
+            self._light_intensities_s[i] = light.intensity_s
+        return count
+
+    def _lights(self, entity: Entity) -> List[LightSource]:
+        """
+        The lights an entity is drawn with: those not baked into it, when the
+        shader variants can add the baked ones
+        """
+        if self.shader_variants and entity.baked_lights:
+            return entity.dynamic_lights
+        return entity.light_sources
+
+    def _begin_entity(
+        self,
+        entity: Entity,
+        matrix: Optional[np.ndarray] = None,
+        ignore_lighting: Optional[bool] = None,
+    ) -> int:
+        """
+        Stages an entity's transform, lighting flag and lights, returns the
+        light count. The model matrix and flag are read from the entity if
+        not given
+        """
+        if matrix is None:
+            self._model[...] = self._model_matrix_glm(entity)
+        else:
+            self._model[...] = matrix
+        if ignore_lighting is None:
+            ignore_lighting = entity.ignore_lighting
+        self._ignore_lighting = ignore_lighting
+        return self._stage_lights(self._lights(entity))
+
+    def _use_shader(self, shader: Shader, camera: Camera) -> None:
+        """Activates the right shader, if it isn't already"""
+        if shader is not self._current_shader:
+            if shader.use():
+                self.stats.program_switches += 1
+            self._current_shader = shader
+            self._setup_program(shader, camera)
+
+    def _upload_entity(
+        self,
+        shader: Shader,
+        light_count: int,
+        material_base: Optional[int] = None,
+    ) -> None:
+        """
+        Uploads the staged transform, lights and lighting flag of an entity,
+        and the first row of its model in the material table if drawing from
+        one
+        """
+        # Load model
+        issued = shader.model_uniform.set_mat4(self._model)
+
+        # Setup light sources, all of them at once
+        issued += shader.light_count_uniform.set_int(light_count)
+        if light_count > 0:
+            issued += (
+                shader.light_positions_uniform.set_vec3(
+                    self._light_positions, light_count
+                )
+                + shader.light_colors_uniform.set_vec3(self._light_colors, light_count)
+                + shader.light_decay_uniform.set_vec3(self._light_decay, light_count)
+                + shader.light_intensities_d_uniform.set_floats(
+                    self._light_intensities_d, light_count
+                )
+                + shader.light_intensities_s_uniform.set_floats(
+                    self._light_intensities_s, light_count
+                )
+            )
 
-            # Get material
-            material = model.materials[model.material_swaps[start]]
+        # Ignore lighting
+        issued += shader.ignore_lighting_uniform.set_int(self._ignore_lighting)
+        total = ENTITY_UNIFORMS if light_count > 0 else 3
 
-            # Activate the right shader (does this have a big performance impact?)
-            material.shader.use()
+        if material_base is not None:
+            issued += shader.material_base_uniform.set_int(material_base)
+            total += 1
+        self.stats.record_uniforms(issued, total)
 
-            # Load model
-            gl.glUniformMatrix4fv(material.shader.model_loc, 1, gl.GL_TRUE, mat)
+    def _draw_segment(
+        self,
+        shader: Shader,
+        material: Optional[MaterialUniforms],
+        texture: int,
+        mode: int,
+        offset: Optional[ctypes.c_void_p],
+        count: int,
+        offsets: Optional[np.ndarray] = None,
+        counts: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Draws a range of the bound index buffer, starting `offset` bytes in, or
+        the ranges in `offsets` and `counts` (`count` indices in total) with a
+        single call. Without `material`, the shader reads it from the
+        material table
+        """
+        stats = self.stats
+
+        # Material properties
+        if material is not None:
+            ka, kd, ks, ns, d = material
+            issued = (
+                shader.ka_uniform.set_vec3(ka)
+                + shader.kd_uniform.set_vec3(kd)
+                + shader.ks_uniform.set_vec3(ks)
+                + shader.ns_uniform.set_float(ns)
+                + shader.d_uniform.set_float(d)
+            )
+            stats.record_uniforms(issued, MATERIAL_UNIFORMS)
 
-            # Load view & projection
-            self.setup_camera(material.shader, camera)
+        # Set texture
+        if gl_state.bind_texture(gl.GL_TEXTURE_2D, texture):
+            stats.texture_binds += 1
 
-            # Setup camera position
-            gl.glUniform3fv(
-                material.shader.view_pos_loc,
-                1,
-                np.array(camera.position, dtype=np.float32),
+        # Draw segment
+        if offsets is None:
+            gl.glDrawElements(mode, count, gl.GL_UNSIGNED_INT, offset)
+        else:
+            gl.glMultiDrawElements(
+                mode, counts, gl.GL_UNSIGNED_INT, offsets, len(offsets)
             )
+        stats.record_draw(mode, count)
 
-            # Setup ambient lights
-            gl.glUniform3fv(material.shader.ambient_color_loc, 1, self.ambient_color)
-            gl.glUniform1f(
-                material.shader.ambient_intensity_loc, self.ambient_intensity
+    def draw_entity(self, entity: Entity, camera: Camera) -> None:
+        """Draws an entity based on it's components and the camera's attributes"""
+        if (
+            not entity.visible
+            or id(entity) in self._occluded
+            or (self.cells is not None and self.cells.hides(entity))
+        ):
+            self.stats.culled_entities += 1
+            return
+        self._draw_model(entity, self.select_lod(entity, camera), camera)
+
+    def draw_entities(self, entities: List[Entity], camera: Camera) -> None:
+        """
+        Draws the entities like `draw_entity` does, with their transforms,
+        flags and sizes read from the stores' columns once for all of them
+        """
+        if self._rows is None or not self._rows.describes(entities):
+            self._rows = EntityRows(entities)
+        matrices, flags, _, sizes = self._frame_columns(self._rows, camera)
+        shown = flags["visible"].copy()
+        if self._occluded:
+            shown &= np.fromiter(
+                (id(entity) not in self._occluded for entity in entities),
+                dtype=bool,
+                count=len(entities),
+            )
+        if self.cells is not None:
+            shown &= ~self.cells.hidden(entities)
+
+        indices = np.flatnonzero(shown).tolist()
+        self.stats.culled_entities += len(entities) - len(indices)
+        ignore_lighting = flags["ignore_lighting"].tolist()
+        sizes = sizes.tolist()
+        for index in indices:
+            entity = entities[index]
+            self._draw_model(
+                entity,
+                self.select_lod(entity, camera, sizes[index]),
+                camera,
+                matrices[index],
+                ignore_lighting[index],
             )
 
-            # Setup light sources
-            gl.glUniform1i(material.shader.light_count_loc, len(light_sources))
-            for i in range(len(light_sources)):
-                gl.glUniform3fv(
-                    material.shader.light_positions_loc + i,
-                    1,
-                    np.array(light_sources[i].position),
-                )
-                gl.glUniform3fv(
-                    material.shader.light_colors_loc + i,
-                    1,
-                    np.array(light_sources[i].color),
-                )
-                gl.glUniform3fv(
-                    material.shader.light_decay_loc + i,
-                    1,
-                    np.array(light_sources[i].decay_coefs),
-                )
-                gl.glUniform1f(
-                    material.shader.light_intensities_d_loc + i,
-                    light_sources[i].intensity_d,
-                )
-                gl.glUniform1f(
-                    material.shader.light_intensities_s_loc + i,
-                    light_sources[i].intensity_s,
-                )
-
-            # Material properties
-            gl.glUniform3fv(material.shader.ka_loc, 1, material.ka)
-            gl.glUniform3fv(material.shader.kd_loc, 1, material.kd)
-            gl.glUniform3fv(material.shader.ks_loc, 1, material.ks)
-            gl.glUniform1fv(material.shader.ns_loc, 1, material.ns)
-            gl.glUniform1fv(material.shader.d_loc, 1, material.d)
+    def _draw_model(
+        self,
+        entity: Entity,
+        level: int,
+        camera: Camera,
+        matrix: Optional[np.ndarray] = None,
+        ignore_lighting: Optional[bool] = None,
+    ) -> None:
+        """Draws a level of detail of an entity's model, segment by segment"""
+        model = entity.model.lod(level)
+        light_count = self._begin_entity(entity, matrix, ignore_lighting)
 
-            # Ignore lighting
-            gl.glUniform1i(material.shader.ignore_lighting_loc, entity.ignore_lighting)
+        # Select the model's vertex array
+        gl_state.bind_vertex_array(model.vao)
 
-            # Set texture
-            gl.glBindTexture(
-                gl.GL_TEXTURE_2D,
+        # Render each segment
+        for start, count, material in model.segments:
+            if self.shader_variants:
+                shader = material.select_shader(
+                    not self._ignore_lighting,
+                    light_count,
+                    baked=bool(entity.baked_lights),
+                )
+            else:
+                shader = material.shader
+
+            self._use_shader(shader, camera)
+            self._upload_entity(shader, light_count)
+            # Without the passes, only blending follows the material
+            gl_state.set_capability(gl.GL_BLEND, material.transparency == BLENDED)
+            self._draw_segment(
+                shader,
+                (material.ka, material.kd, material.ks, material.ns, material.d),
                 material.texture_id,
+                model.draw_mode,
+                ctypes.c_void_p((model.offset + start) * INDEX_SIZE),
+                count,
             )
 
-            # Draw segment
-            gl.glDrawArrays(model.draw_mode, model.offset + start, end - start)
+    def draw_skybox(self, skybox: Skybox, camera: Camera) -> None:
+        """Draws the sky in the pixels the scene left uncovered"""
+        # Only the camera's rotation, the sky is infinitely far
+        self._view[...] = glm.mat4(glm.mat3(self._view_matrix_glm(camera)))
+        self._projection[...] = self._projection_matrix_glm(camera)
+        skybox.draw(self._view, self._projection, self.stats)
+        # The sky's program replaced the renderer's
+        self._current_shader = None
+
+    def _draw_rows(
+        self, draw: EntityDraw, rows: List[PacketRow], camera: Camera
+    ) -> None:
+        """Draws packet rows of an entity"""
+        stats = self.stats
+        entity, (material_base, _, _, _), matrix, ignore_lighting = draw
+        light_count = self._begin_entity(entity, matrix, ignore_lighting)
+        entity_uniforms = ENTITY_UNIFORMS if light_count > 0 else 3
+        if material_base is not None:
+            entity_uniforms += 1
+        # Consecutive packets of an entity mostly share the shader, the
+        # entity's uniforms only need checking when it changes
+        entity_shader = None
+        for (
+            shader,
+            vao,
+            texture,
+            material,
+            mode,
+            offset,
+            count,
+            offsets,
+            counts,
+        ) in rows:
+            gl_state.bind_vertex_array(vao)
+            if shader is not entity_shader:
+                self._use_shader(shader, camera)
+                self._upload_entity(shader, light_count, material_base)
+                entity_shader = shader
+            else:
+                stats.record_uniforms(0, entity_uniforms)
+            self._draw_segment(
+                shader, material, texture, mode, offset, count, offsets, counts
+            )
+
+    def _sort_blended(
+        self, levels: List[EntityDraw], camera: Camera
+    ) -> List[Tuple[EntityDraw, List[PacketRow]]]:
+        """
+        The blended rows of the entities, farthest first by the center of their
+        range. Consecutive rows of the same entity are drawn together
+        """
+        distances = []
+        blended = []
+        for draw in levels:
+            _, (_, passes, centers, _), matrix, _ = draw
+            rows = passes[BLENDED]
+            if not rows:
+                continue
+            world = centers @ matrix[:3, :3].T + matrix[:3, 3]
+            distances.append(
+                np.linalg.norm(world - np.asarray(camera.position), axis=1)
+            )
+            blended.extend((draw, row) for row in rows)
+        if not blended:
+            return []
+
+        order = np.argsort(-np.concatenate(distances), kind="stable").tolist()
+        draws: List[Tuple[EntityDraw, List[PacketRow]]] = []
+        for index in order:
+            draw, row = blended[index]
+            if draws and draws[-1][0] is draw:
+                draws[-1][1].append(row)
+            else:
+                draws.append((draw, [row]))
+        return draws
+
+    def _use_prepass(self) -> bool:
+        """Whether this frame runs the depth pre-pass"""
+        if self.depth_shader is None:
+            return False
+        probe = self.overdraw_probe
+        probe.poll()
+        self.stats.overdraw = probe.overdraw
+        if self.depth_prepass is None:
+            return probe.due()
+        return self.depth_prepass
+
+    def _draw_depth(self, levels: List[EntityDraw], camera: Camera) -> None:
+        """Lays down the depth of the opaque geometry, without shading it"""
+        shader = cast(Shader, self.depth_shader)
+        stats = self.stats
+        self._use_shader(shader, camera)
+        gl_state.color_mask(False)
+        for _, (_, _, _, depth_rows), matrix, _ in levels:
+            if not depth_rows:
+                continue
+            self._model[...] = matrix
+            stats.record_uniforms(shader.model_uniform.set_mat4(self._model), 1)
+            for vao, mode, offset, count, offsets, counts in depth_rows:
+                gl_state.bind_vertex_array(vao)
+                if offsets is None:
+                    gl.glDrawElements(mode, count, gl.GL_UNSIGNED_INT, offset)
+                else:
+                    gl.glMultiDrawElements(
+                        mode, counts, gl.GL_UNSIGNED_INT, offsets, len(offsets)
+                    )
+                stats.record_draw(mode, count)
+        gl_state.color_mask(True)
+
+    def draw_packets(
+        self,
+        packets: DrawPackets,
+        camera: Camera,
+        skybox: Optional[Skybox] = None,
+    ) -> None:
+        """
+        Draws precompiled packets, rebuilding them if the entities changed.
+        Opaque and alpha tested packets are drawn without blending, nearest
+        entities first so early depth testing rejects what they cover. Then
+        the sky, if any, and the blended packets, farthest first. These still
+        write depth: a blended segment may hold every tree of the map, which
+        could never be sorted as a whole.
+
+        With the depth pre-pass (see `depth_prepass`), the opaque geometry's
+        depth is drawn first with `depth_shader`, and its color pass only
+        shades the fragments whose depth is equal, the visible ones
+        """
+        packets.refresh(
+            self.shader_variants, self.multi_draw, self.material_table, self.max_lights
+        )
+        stats = self.stats
+
+        table = packets.active_table
+        if table is not None:
+            if table.bind():
+                stats.texture_binds += 1
+            gl_state.active_texture(gl.GL_TEXTURE0)
+
+        # Everything per entity from the stores' columns, in one pass
+        entities = packets.entities
+        matrices, flags, distances, sizes = self._frame_columns(packets.rows, camera)
+        shown = flags["visible"].copy()
+        hidden = self._cell_hidden(entities, camera, matrices[:, :3, 3])
+        if hidden is not None:
+            shown &= ~hidden
+        occluded = self.update_occlusion(entities, camera, matrices, shown)
+        if occluded is not None:
+            shown &= ~occluded
+
+        indices = np.flatnonzero(shown)
+        stats.culled_entities += len(entities) - len(indices)
+        # Nearest first, in list order when as near
+        indices = indices[np.argsort(distances[indices], kind="stable")].tolist()
+        ignore_lighting = flags["ignore_lighting"].tolist()
+        sizes = sizes.tolist()
+        levels: List[EntityDraw] = []
+        for index in indices:
+            entity, entity_levels = packets.batches[index]
+            level = entity_levels[self.select_lod(entity, camera, sizes[index])]
+            levels.append((entity, level, matrices[index], ignore_lighting[index]))
+
+        gl_state.disable(gl.GL_BLEND)
+        prepass = self._use_prepass()
+        stats.depth_prepass = prepass
+        probe = self.overdraw_probe
+        measure = prepass and not probe.pending
+        if prepass:
+            if measure:
+                probe.begin(DEPTH_QUERY)
+            self._draw_depth(levels, camera)
+            if measure:
+                probe.end()
+            # The depth is final, the color pass only has to match it
+            gl_state.depth_func(gl.GL_EQUAL)
+            gl_state.depth_mask(False)
+            if measure:
+                probe.begin(COLOR_QUERY)
+
+        for draw in levels:
+            passes = draw[1][1]
+            if passes[OPAQUE]:
+                self._draw_rows(draw, passes[OPAQUE], camera)
+
+        if prepass:
+            if measure:
+                probe.end()
+            gl_state.depth_mask(True)
+            gl_state.depth_func(gl.GL_LESS)
+
+        for draw in levels:
+            passes = draw[1][1]
+            if passes[ALPHA_TESTED]:
+                self._draw_rows(draw, passes[ALPHA_TESTED], camera)
+
+        if skybox is not None:
+            self.draw_skybox(skybox, camera)
+
+        # Blending stays on for whatever is drawn after the scene
+        gl_state.enable(gl.GL_BLEND)
+        for draw, rows in self._sort_blended(levels, camera):
+            self._draw_rows(draw, rows, camera)
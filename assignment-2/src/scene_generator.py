@@ -0,0 +1,171 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import random
+from typing import Any, Dict, List, Tuple
+
+import glm
+import numpy as np
+
+from entity import Entity, EntityStore, GlowingEntity, OkuuFumo
+from light_source import LightSource, MAX_LIGHTS
+from material import Material
+from model import Model
+
+
+class SyntheticScene:
+    """Entities, lights and materials built by `generate_scene`"""
+
+    entities: List[Entity]
+    # Holds the state of the scene's entities, apart from other scenes'
+    store: EntityStore
+    light_sources: List[LightSource]
+    materials: Dict[str, Material]
+    models: List[Model]
+
+    def __init__(self) -> None:
+        self.entities = []
+        self.store = EntityStore()
+        self.light_sources = []
+        self.materials = {}
+        self.models = []
+
+    def update(self, dt: float, camera: Any) -> None:
+        self.store.update(dt, camera)
+
+
+def _tinted(material: Material, tint: np.ndarray) -> Material:
+    kd = np.clip(np.asarray(material.kd, dtype=np.float32) * tint, 0.0, 1.0)
+    ka = np.clip(np.asarray(material.ka, dtype=np.float32) * tint, 0.0, 1.0)
+    return Material(
+        material.shader,
+        material.texture_path,
+        ka,
+        kd,
+        np.asarray(material.ks, dtype=np.float32),
+        material.ns,
+        material.d,
+    )
+
+
+def generate_scene(
+    base_models: Dict[str, Model],
+    entity_count: int = 100,
+    light_count: int = 4,
+    material_variants: int = 1,
+    static_fraction: float = 0.8,
+    glowing_count: int = 0,
+    spacing: float = 6.0,
+    seed: int = 0,
+) -> SyntheticScene:
+    """
+    Builds a random scene out of already loaded models.
+
+    - `entity_count` entities are scattered over a square grid whose area
+      grows with the count, so the density stays the same;
+    - `light_count` light sources, the first `glowing_count` of them carried
+      by glowing entities orbiting or bobbing (counted in `entity_count`);
+    - every material of the base models gets `material_variants` tinted
+      copies, and each entity picks one of them;
+    - `static_fraction` of the remaining entities don't move, the others spin.
+
+    Model variants share the vertex data of their base model, so
+    `Buffers.setup_buffers(scene.models)` uploads each mesh only once.
+    """
+    assert base_models, "At least one base model must be provided"
+    assert glowing_count <= light_count, "Each glowing entity carries a light"
+    assert glowing_count <= entity_count, "Glowing entities are part of the count"
+
+    rng = random.Random(seed)
+    scene = SyntheticScene()
+    extent = spacing * max(np.sqrt(entity_count), 1.0)
+
+    def random_position(height: float = 0.0) -> glm.vec3:
+        return glm.vec3(
+            rng.uniform(-extent / 2, extent / 2),
+            height,
+            rng.uniform(-extent / 2, extent / 2),
+        )
+
+    # Tinted copies of every material, one set per variant
+    variant_models: Dict[Tuple[str, int], Model] = {}
+    for name, model in base_models.items():
+        scene.models.append(model)
+        for variant in range(material_variants):
+            tint = np.array([rng.uniform(0.5, 1.0) for _ in range(3)], dtype=np.float32)
+            swaps = {}
+            for start, material_name in model.material_swaps.items():
+                variant_name = f"{material_name}#{variant}"
+                if variant_name not in scene.materials:
+                    base = model.materials[material_name]
+                    scene.materials[variant_name] = (
+                        base if variant == 0 else _tinted(base, tint)
+                    )
+                swaps[start] = variant_name
+            variant_model = model.with_materials(scene.materials, swaps)
+            variant_models[(name, variant)] = variant_model
+            scene.models.append(variant_model)
+
+    # Lights, the glowing ones are positioned by their entity
+    for _ in range(light_count):
+        color = np.array([rng.uniform(0.5, 1.0) for _ in range(3)])
+        scene.light_sources.append(
+            LightSource(
+                position=np.array(random_position(rng.uniform(2.0, 8.0))),
+                color=color,
+                decay_coefs=np.array([1.0, 0.01, 0.01]),
+            )
+        )
+
+    def nearest_lights(position: glm.vec3) -> List[LightSource]:
+        lights = sorted(
+            scene.light_sources,
+            key=lambda light: glm.distance(position, glm.vec3(*light.position)),
+        )
+        return lights[:MAX_LIGHTS]
+
+    model_names = list(base_models.keys())
+    for i in range(entity_count):
+        name = rng.choice(model_names)
+        model = variant_models[(name, rng.randrange(material_variants))]
+        position = random_position()
+
+        if i < glowing_count:
+            center = random_position(rng.uniform(2.0, 8.0))
+            entity: Entity = GlowingEntity(
+                model,
+                position=center,
+                light_source=scene.light_sources[i],
+                ignore_lighting=True,
+                store=scene.store,
+            )
+            if rng.random() < 0.5:
+                entity.orbit(center, rng.uniform(1.0, spacing), rng.uniform(0.5, 2.0))
+            else:
+                entity.bob(center, rng.uniform(0.5, 2.0), rng.uniform(1.0, 4.0))
+                entity.spin = glm.vec3(0.0, 90.0, 0.0)
+        elif rng.random() < static_fraction:
+            entity = Entity(
+                model,
+                position=position,
+                angle_y=rng.uniform(0.0, 360.0),
+                light_sources=nearest_lights(position),
+                static=True,
+                store=scene.store,
+            )
+        else:
+            entity = OkuuFumo(
+                model,
+                position=position,
+                angle_y=rng.uniform(0.0, 360.0),
+                rotation_speed=rng.uniform(-180.0, 180.0),
+                handle_events=False,
+                light_sources=nearest_lights(position),
+                store=scene.store,
+            )
+
+        scene.entities.append(entity)
+
+    return scene
@@ -3,100 +3,186 @@
 # D. H. Lelis - 12543822
 # Samuel Figueiredo Veronez - 12542626
 
-from typing import Any, cast
+from typing import Any, Dict, Optional, Tuple, cast
 
-import OpenGL.GL as gl
+from gl_backend import gl
+from gl_state import gl_state
+from program_cache import ProgramCache
+from uniform import Uniform, reflect_uniforms
 
 
-class Shader:
-    program_id: int
-    model_loc: Any
-    view_loc: Any
-    projection_loc: Any
-    texture_filter_loc: Any
-    normal_loc: Any
-    has_texture: bool
+def _variant_key(defines: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(sorted(defines.items()))
 
-    light_count_loc: Any
-    ambient_color_loc: Any
-    ambient_intensity_loc: Any
-    light_positions_loc: Any
-    light_colors_loc: Any
-    light_intensities_d_loc: Any
-    light_intensities_s_loc: Any
-    light_decay_loc: Any
-    ignore_lighting_loc: Any
 
-    view_positions_loc: Any
+def inject_defines(source: str, defines: Dict[str, Any]) -> str:
+    """Adds `#define NAME VALUE` lines right after the `#version` directive"""
+    if not defines:
+        return source
 
-    ka_loc: Any
-    kd_loc: Any
-    ks_loc: Any
-    ns_loc: Any
-    d_loc: Any
+    lines = source.splitlines(keepends=True)
+    directives = "".join(f"#define {name} {value}\n" for name, value in defines.items())
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith("#version"):
+            return "".join(lines[: i + 1]) + directives + "".join(lines[i + 1 :])
+    return directives + source
+
+
+class Shader:
+    program_id: int
+    has_texture: bool
+    # Active uniforms, found by reflection when the shader is created
+    uniforms: Dict[str, Uniform]
+
+    model_uniform: Uniform
+    view_uniform: Uniform
+    projection_uniform: Uniform
+    view_pos_uniform: Uniform
+
+    ambient_color_uniform: Uniform
+    ambient_intensity_uniform: Uniform
+    light_count_uniform: Uniform
+    light_positions_uniform: Uniform
+    light_colors_uniform: Uniform
+    light_intensities_d_uniform: Uniform
+    light_intensities_s_uniform: Uniform
+    light_decay_uniform: Uniform
+    ignore_lighting_uniform: Uniform
+
+    ka_uniform: Uniform
+    kd_uniform: Uniform
+    ks_uniform: Uniform
+    ns_uniform: Uniform
+    d_uniform: Uniform
+
+    # Sources before the defines are injected, kept to build variants
+    vertex_source: str
+    fragment_source: str
+    defines: Dict[str, Any]
+    cache: Optional[ProgramCache]
+    _variants: Dict[Tuple[Tuple[str, Any], ...], "Shader"]
 
     def __init__(
         self,
         program_id: int,
         has_texture: bool = True,
+        vertex_source: str = "",
+        fragment_source: str = "",
+        defines: Optional[Dict[str, Any]] = None,
+        cache: Optional[ProgramCache] = None,
     ) -> None:
         self.program_id = program_id
-        self.model_loc = gl.glGetUniformLocation(program_id, "model")
-        self.view_loc = gl.glGetUniformLocation(program_id, "view")
-        self.projection_loc = gl.glGetUniformLocation(program_id, "projection")
+        self.cache = cache
+        self.vertex_source = vertex_source
+        self.fragment_source = fragment_source
+        self.defines = dict(defines) if defines is not None else {}
+        self._variants = {_variant_key(self.defines): self}
         self.has_texture = has_texture
+        self.uniforms = reflect_uniforms(program_id)
 
-        # Ambient Lighting
-        self.ambient_color_loc = gl.glGetUniformLocation(program_id, "u_ambientColor")
-        self.ambient_intensity_loc = gl.glGetUniformLocation(
-            program_id, "u_ambientIntensity"
-        )
-        self.ka_loc = gl.glGetUniformLocation(program_id, "u_ka")
-
-        # Light Sources
-        self.light_count_loc = gl.glGetUniformLocation(program_id, "u_lightCount")
-        self.light_positions_loc = gl.glGetUniformLocation(program_id, "u_lightPos")
-        self.light_colors_loc = gl.glGetUniformLocation(program_id, "u_lightColors")
-        self.light_intensities_d_loc = gl.glGetUniformLocation(
-            program_id, "u_lightIntensity_d"
-        )
-        self.light_intensities_s_loc = gl.glGetUniformLocation(
-            program_id, "u_lightIntensity_s"
-        )
-        self.light_decay_loc = gl.glGetUniformLocation(program_id, "u_lightDecay")
-
-        # Diffuse && Specular
-        self.kd_loc = gl.glGetUniformLocation(program_id, "u_kd")
-        self.ks_loc = gl.glGetUniformLocation(program_id, "u_ks")
-        self.ns_loc = gl.glGetUniformLocation(program_id, "u_ns")
-        self.d_loc = gl.glGetUniformLocation(program_id, "u_d")
+        # Transformations
+        self.model_uniform = self.uniform("model")
+        self.view_uniform = self.uniform("view")
+        self.projection_uniform = self.uniform("projection")
 
         # Camera Position
-        self.view_pos_loc = gl.glGetUniformLocation(program_id, "u_viewPos")
+        self.view_pos_uniform = self.uniform("u_viewPos")
 
-        self.ignore_lighting_loc = gl.glGetUniformLocation(
-            program_id, "u_ignoreLighting"
-        )
+        # Ambient Lighting
+        self.ambient_color_uniform = self.uniform("u_ambientColor")
+        self.ambient_intensity_uniform = self.uniform("u_ambientIntensity")
 
-    def use(self):
-        gl.glUseProgram(self.program_id)
+        # Light Sources
+        self.light_count_uniform = self.uniform("u_lightCount")
+        self.light_positions_uniform = self.uniform("u_lightPos")
+        self.light_colors_uniform = self.uniform("u_lightColors")
+        self.light_intensities_d_uniform = self.uniform("u_lightIntensity_d")
+        self.light_intensities_s_uniform = self.uniform("u_lightIntensity_s")
+        self.light_decay_uniform = self.uniform("u_lightDecay")
+        self.ignore_lighting_uniform = self.uniform("u_ignoreLighting")
+
+        # Material
+        self.ka_uniform = self.uniform("u_ka")
+        self.kd_uniform = self.uniform("u_kd")
+        self.ks_uniform = self.uniform("u_ks")
+        self.ns_uniform = self.uniform("u_ns")
+        self.d_uniform = self.uniform("u_d")
+
+        # Material table (variants built with MATERIAL_TABLE)
+        self.materials_uniform = self.uniform("u_materials")
+        self.material_base_uniform = self.uniform("u_materialBase")
+
+    def uniform(self, name: str) -> Uniform:
+        """The named uniform, an inactive one if the program doesn't use it"""
+        if name not in self.uniforms:
+            return Uniform(name, -1)
+        return self.uniforms[name]
+
+    def use(self) -> bool:
+        """Makes this the current program, returns whether it wasn't already"""
+        return gl_state.use_program(self.program_id)
+
+    def variant(self, **defines: Any) -> "Shader":
+        """
+        The program built from the same sources with the given `#define`s
+        (added to this shader's own). Variants are compiled on first use and
+        shared by the whole family of shaders built from the same sources.
+        """
+        merged = {**self.defines, **defines}
+        key = _variant_key(merged)
+        if key not in self._variants:
+            shader = Shader.compile(
+                self.vertex_source, self.fragment_source, merged, self.cache
+            )
+            shader._variants = self._variants
+            self._variants[key] = shader
+        return self._variants[key]
 
     @staticmethod
-    def load_from_files(vertex_file: str, fragment_file: str) -> "Shader":
+    def load_from_files(
+        vertex_file: str, fragment_file: str, cache: Optional[ProgramCache] = None
+    ) -> "Shader":
         """Loads a shader from a .vert and .frag file"""
         with open(vertex_file, "r") as f:
             vertex_shader = f.read()
         with open(fragment_file, "r") as f:
             fragment_shader = f.read()
-        return Shader.compile(vertex_shader, fragment_shader)
+        return Shader.compile(vertex_shader, fragment_shader, cache=cache)
 
     @staticmethod
-    def compile(vertex_shader_source: str, fragment_shader_source: str) -> "Shader":
+    def compile(
+        vertex_shader_source: str,
+        fragment_shader_source: str,
+        defines: Optional[Dict[str, Any]] = None,
+        cache: Optional[ProgramCache] = None,
+    ) -> "Shader":
+        """
+        Builds a program from GLSL sources. With a `cache`, the linked binary
+        is loaded from it when present and saved to it otherwise.
+        """
+        defines = defines if defines is not None else {}
+
+        if cache is not None:
+            key = cache.key(vertex_shader_source, fragment_shader_source, defines)
+            program_id = cache.load(key)
+            if program_id is not None:
+                return Shader(
+                    program_id,
+                    vertex_source=vertex_shader_source,
+                    fragment_source=fragment_shader_source,
+                    defines=defines,
+                    cache=cache,
+                )
+
         program_id = cast(int, gl.glCreateProgram())
+        if cache is not None:
+            gl.glProgramParameteri(
+                program_id, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, gl.GL_TRUE
+            )
 
         # Build and compile vertex shader
         vertex_shader = gl.glCreateShader(gl.GL_VERTEX_SHADER)
-        gl.glShaderSource(vertex_shader, vertex_shader_source)
+        gl.glShaderSource(vertex_shader, inject_defines(vertex_shader_source, defines))
         gl.glCompileShader(vertex_shader)
         if not gl.glGetShaderiv(vertex_shader, gl.GL_COMPILE_STATUS):
             err = gl.glGetShaderInfoLog(vertex_shader)
@@ -104,7 +190,9 @@ class Shader:
 
         # Build and compile fragment shader
         fragment_shader = gl.glCreateShader(gl.GL_FRAGMENT_SHADER)
-        gl.glShaderSource(fragment_shader, fragment_shader_source)
+        gl.glShaderSource(
+            fragment_shader, inject_defines(fragment_shader_source, defines)
+        )
         gl.glCompileShader(fragment_shader)
         if not gl.glGetShaderiv(fragment_shader, gl.GL_COMPILE_STATUS):
             err = gl.glGetShaderInfoLog(fragment_shader)
@@ -123,5 +211,14 @@ class Shader:
         gl.glDeleteShader(vertex_shader)
         gl.glDeleteShader(fragment_shader)
 
+        if cache is not None:
+            cache.store(key, program_id)
+
         # Return program
-        return Shader(program_id)
+        return Shader(
+            program_id,
+            vertex_source=vertex_shader_source,
+            fragment_source=fragment_shader_source,
+            defines=defines,
+            cache=cache,
+        )
@@ -0,0 +1,168 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import glm
+import numpy as np
+
+from camera import Camera
+from entity import Entity, EntityStore
+from light_source import LightSource
+
+# Simulation steps per second
+SIMULATION_RATE = 60
+# Steps run at most per frame: after a stall (loading, a dragged window) the
+# rest of the lag is dropped instead of simulated all at once
+MAX_STEPS_PER_FRAME = 5
+# Slack when counting whole steps, so frames adding up to a step exactly
+# aren't left a rounding error short of it
+STEP_EPSILON = 1e-9
+
+
+class FixedTimestep:
+    """
+    Turns the real time between frames into whole simulation steps of
+    `step` seconds, carrying the remainder over to the next frame. The
+    simulation then runs the same at any frame rate, and `alpha` says how far
+    the frame is between the last two steps.
+    """
+
+    step: float
+    max_steps: int
+    # Real time not simulated yet, less than a step after `advance`
+    accumulator: float
+    # Simulated time and steps so far
+    time: float
+    steps: int
+    # Real time dropped because of `max_steps`
+    dropped: float
+
+    def __init__(
+        self,
+        step: float = 1.0 / SIMULATION_RATE,
+        max_steps: int = MAX_STEPS_PER_FRAME,
+    ) -> None:
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.time = 0.0
+        self.steps = 0
+        self.dropped = 0.0
+
+    def advance(self, elapsed: float) -> int:
+        """Accounts for `elapsed` real seconds, returns the steps to run now"""
+        self.accumulator += max(elapsed, 0.0)
+        steps = int(self.accumulator / self.step + STEP_EPSILON)
+        if steps > self.max_steps:
+            lag = self.accumulator - self.max_steps * self.step
+            self.dropped += lag
+            self.accumulator -= lag
+            steps = self.max_steps
+        self.accumulator = max(self.accumulator - steps * self.step, 0.0)
+        self.time += steps * self.step
+        self.steps += steps
+        return steps
+
+    @property
+    def alpha(self) -> float:
+        """Fraction of a step the frame is past the last one, in [0, 1)"""
+        return min(self.accumulator / self.step, 1.0)
+
+
+def _blend_transforms(
+    previous: np.ndarray, current: np.ndarray, alpha: float
+) -> np.ndarray:
+    # Records of `entity.store.TRANSFORM`. Angles are kept within [0, 360) by
+    # spinning, go the short way
+    blended = np.empty_like(current)
+    for name in ("position", "scale"):
+        blended[name] = previous[name] + (current[name] - previous[name]) * alpha
+    delta = (current["angles"] - previous["angles"] + 180.0) % 360.0 - 180.0
+    blended["angles"] = previous["angles"] + delta * alpha
+    return blended
+
+
+class StateInterpolator:
+    """
+    Draws the frame between the last two simulation steps: `save` keeps the
+    transforms (and lights) of the entities and camera before each step, and
+    `blend` puts the interpolated ones in place while the frame is drawn,
+    restoring the simulated ones afterwards. Nothing but the transforms is
+    blended, the simulation never sees the in-between state. Static entities
+    never move, they are left out. Transforms are blended in the entity
+    stores' arrays, a store at a time.
+    """
+
+    entities: List[Entity]
+    camera: Optional[Camera]
+    lights: List[LightSource]
+
+    # Rows of the entities in each of their stores
+    _rows: List[Tuple[EntityStore, np.ndarray]]
+    # Their transforms, a store at a time
+    _previous: List[np.ndarray]
+    _previous_lights: List[np.ndarray]
+    _previous_camera: Optional[Tuple[glm.vec3, float]]
+
+    def __init__(
+        self, entities: Iterable[Entity], camera: Optional[Camera] = None
+    ) -> None:
+        self.entities = [entity for entity in entities if not entity.static]
+        self.camera = camera
+        rows: Dict[int, Tuple[EntityStore, List[int]]] = {}
+        for entity in self.entities:
+            rows.setdefault(id(entity.store), (entity.store, []))[1].append(entity.row)
+        self._rows = [(store, np.array(rows)) for store, rows in rows.values()]
+        # Lights carried by the entities move with them
+        self.lights = []
+        for entity in self.entities:
+            for light in entity.light_sources:
+                if all(light is not known for known in self.lights):
+                    self.lights.append(light)
+        self._previous = []
+        self._previous_lights = []
+        self._previous_camera = None
+        self.save()
+
+    def save(self) -> None:
+        """Keeps the current state as the one before the next step"""
+        self._previous = [store.transforms[rows] for store, rows in self._rows]
+        self._previous_lights = [np.array(light.position) for light in self.lights]
+        if self.camera is not None:
+            self._previous_camera = (glm.vec3(self.camera.position), self.camera._fov)
+
+    @contextmanager
+    def blend(self, alpha: float) -> Iterator[None]:
+        """Puts the state `alpha` of the way from the saved one in place"""
+        current = [store.transforms[rows] for store, rows in self._rows]
+        current_lights = [np.array(light.position) for light in self.lights]
+        current_camera = None
+        if self.camera is not None:
+            current_camera = (self.camera.position, self.camera._fov)
+
+        for (store, rows), before, after in zip(self._rows, self._previous, current):
+            store.transforms[rows] = _blend_transforms(before, after, alpha)
+            store.touch(rows)
+        for light, before, after in zip(
+            self.lights, self._previous_lights, current_lights
+        ):
+            light.position[...] = before + (after - before) * alpha
+        if self.camera is not None and current_camera is not None:
+            position, fov = self._previous_camera or current_camera
+            self.camera.position = glm.mix(position, current_camera[0], alpha)
+            self.camera._fov = fov + (current_camera[1] - fov) * alpha
+
+        try:
+            yield
+        finally:
+            for (store, rows), after in zip(self._rows, current):
+                store.transforms[rows] = after
+                store.touch(rows)
+            for light, after in zip(self.lights, current_lights):
+                light.position[...] = after
+            if self.camera is not None and current_camera is not None:
+                self.camera.position, self.camera._fov = current_camera
@@ -0,0 +1,203 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+import os
+from typing import Optional, Tuple, cast
+
+import numpy as np
+from gl_backend import gl
+from gl_state import gl_state
+from PIL import Image
+
+from program_cache import ProgramCache
+from render_stats import RenderStats
+from shader import Shader
+
+# The faces in GL's order (+x, -x, +y, -y, +z, -z), as the direction through
+# each texel given its face coordinates (s, t) in [-1, 1]
+_FACE_AXES = (
+    lambda s, t: (np.ones_like(s), -t, -s),
+    lambda s, t: (-np.ones_like(s), -t, s),
+    lambda s, t: (s, np.ones_like(s), t),
+    lambda s, t: (s, -np.ones_like(s), -t),
+    lambda s, t: (s, -t, np.ones_like(s)),
+    lambda s, t: (-s, -t, -np.ones_like(s)),
+)
+
+# Two triangles per face of the unit cube
+_CUBE_CORNERS = np.array(
+    [[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)],
+    dtype=np.float32,
+)
+_CUBE_TRIANGLES = np.array(
+    [
+        [0, 1, 3, 0, 3, 2],  # -x
+        [4, 6, 7, 4, 7, 5],  # +x
+        [0, 4, 5, 0, 5, 1],  # -y
+        [2, 3, 7, 2, 7, 6],  # +y
+        [0, 2, 6, 0, 6, 4],  # -z
+        [1, 5, 7, 1, 7, 3],  # +z
+    ]
+).ravel()
+CUBE_VERTICES = _CUBE_CORNERS[_CUBE_TRIANGLES]
+
+
+def face_directions(size: int) -> np.ndarray:
+    """Direction through the center of every texel of the six cube map faces"""
+    coords = (np.arange(size, dtype=np.float64) + 0.5) / size * 2.0 - 1.0
+    t, s = np.meshgrid(coords, coords, indexing="ij")
+    directions = np.stack([np.stack(axes(s, t), axis=-1) for axes in _FACE_AXES])
+    return directions / np.linalg.norm(directions, axis=-1, keepdims=True)
+
+
+def equirectangular_to_cubemap(image: np.ndarray, size: int) -> np.ndarray:
+    """
+    Resamples (bilinearly) a top-down equirectangular image into the six
+    faces of a cube map. The image is mapped like on the old sky sphere,
+    u = atan2(x, z) / 2pi + 1/4 and v = asin(y) / pi + 1/2 (bottom-up)
+    """
+    height, width = image.shape[:2]
+    directions = face_directions(size)
+    x, y, z = directions[..., 0], directions[..., 1], directions[..., 2]
+    u = np.arctan2(x, z) / (2 * np.pi) + 0.25
+    v = np.arcsin(np.clip(y, -1.0, 1.0)) / np.pi + 0.5
+
+    # Texel space, columns wrap around and rows clamp at the poles
+    column = u * width - 0.5
+    row = np.clip((1.0 - v) * height - 0.5, 0, height - 1)
+    left = np.floor(column).astype(np.int64)
+    top = np.minimum(np.floor(row).astype(np.int64), height - 2)
+    fx = (column - left)[..., None]
+    fy = (row - top)[..., None]
+    left %= width
+    right = (left + 1) % width
+
+    pixels = image.astype(np.float32)
+    upper = pixels[top, left] * (1 - fx) + pixels[top, right] * fx
+    lower = pixels[top + 1, left] * (1 - fx) + pixels[top + 1, right] * fx
+    faces = upper * (1 - fy) + lower * fy
+    return np.clip(np.rint(faces), 0, 255).astype(np.uint8)
+
+
+class Skybox:
+    """
+    The sky as a cube map, drawn with a single cube after the opaque geometry
+    (see `Renderer.draw_packets`). The cube is at depth 1.0, so it only
+    shades the pixels nothing else covered, and doesn't bound the camera's
+    far plane.
+    """
+
+    shader: Shader
+    texture: int
+    vao: int
+    vertex_buffer: int
+
+    def __init__(self, shader: Shader, faces: np.ndarray) -> None:
+        self.shader = shader
+        self.texture = self._upload(faces)
+
+        self.vao = cast(int, gl.glGenVertexArrays(1))
+        self.vertex_buffer = cast(int, gl.glGenBuffers(1))
+        gl_state.bind_vertex_array(self.vao)
+        gl_state.bind_buffer(gl.GL_ARRAY_BUFFER, self.vertex_buffer)
+        gl.glBufferData(
+            gl.GL_ARRAY_BUFFER, CUBE_VERTICES.nbytes, CUBE_VERTICES, gl.GL_STATIC_DRAW
+        )
+        gl.glEnableVertexAttribArray(0)
+        gl.glVertexAttribPointer(0, 3, gl.GL_FLOAT, False, 12, gl.ctypes.c_void_p(0))
+
+    @staticmethod
+    def load_from_files(
+        vertex_file: str,
+        fragment_file: str,
+        texture_path: Optional[str],
+        face_size: Optional[int] = None,
+        color: Tuple[int, int, int] = (0, 0, 0),
+        cache: Optional[ProgramCache] = None,
+    ) -> "Skybox":
+        """
+        Builds the sky from an equirectangular texture, converted once into a
+        cube map with faces of `face_size` texels (a quarter of the texture's
+        width by default). Without the texture, the sky is `color`
+        """
+        shader = Shader.load_from_files(vertex_file, fragment_file, cache)
+        if texture_path is None or not os.path.isfile(texture_path):
+            faces = np.empty((6, 1, 1, 3), dtype=np.uint8)
+            faces[...] = color
+            return Skybox(shader, faces)
+
+        with Image.open(texture_path) as img:
+            image = np.asarray(img.convert("RGB"))
+        if face_size is None:
+            face_size = max(image.shape[1] // 4, 1)
+        return Skybox(shader, equirectangular_to_cubemap(image, face_size))
+
+    @staticmethod
+    def _upload(faces: np.ndarray) -> int:
+        texture = cast(int, gl.glGenTextures(1))
+        gl_state.active_texture(gl.GL_TEXTURE0)
+        gl_state.bind_texture(gl.GL_TEXTURE_CUBE_MAP, texture)
+        for parameter in (
+            gl.GL_TEXTURE_WRAP_S,
+            gl.GL_TEXTURE_WRAP_T,
+            gl.GL_TEXTURE_WRAP_R,
+        ):
+            gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, parameter, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR
+        )
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR
+        )
+
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        size = faces.shape[1]
+        for i, face in enumerate(faces):
+            gl.glTexImage2D(
+                gl.GL_TEXTURE_CUBE_MAP_POSITIVE_X + i,
+                0,
+                gl.GL_RGB8,
+                size,
+                size,
+                0,
+                gl.GL_RGB,
+                gl.GL_UNSIGNED_BYTE,
+                np.ascontiguousarray(face),
+            )
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        return texture
+
+    def draw(
+        self,
+        view: np.ndarray,
+        projection: np.ndarray,
+        stats: Optional[RenderStats] = None,
+    ) -> None:
+        """
+        Draws the sky behind what was drawn so far, `view` being the camera's
+        view matrix without its translation
+        """
+        shader = self.shader
+        program_switched = shader.use()
+        issued = shader.view_uniform.set_mat4(
+            view
+        ) + shader.projection_uniform.set_mat4(projection)
+
+        gl_state.bind_vertex_array(self.vao)
+        gl_state.active_texture(gl.GL_TEXTURE0)
+        texture_bound = gl_state.bind_texture(gl.GL_TEXTURE_CUBE_MAP, self.texture)
+
+        # The cube lies on the cleared depth, and must not change it
+        gl_state.depth_func(gl.GL_LEQUAL)
+        gl_state.depth_mask(False)
+        gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(CUBE_VERTICES))
+        gl_state.depth_mask(True)
+        gl_state.depth_func(gl.GL_LESS)
+
+        if stats is not None:
+            stats.program_switches += program_switched
+            stats.record_uniforms(issued, 2)
+            stats.texture_binds += texture_bound
+            stats.record_draw(gl.GL_TRIANGLES, len(CUBE_VERTICES))
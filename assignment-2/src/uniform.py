@@ -0,0 +1,133 @@
+# CG 2024.1 - Assignment 2
+#
+# D. H. Lelis - 12543822
+# Samuel Figueiredo Veronez - 12542626
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from gl_backend import gl
+
+
+class Uniform:
+    """
+    An active uniform of a linked program. The setters keep a copy of the last
+    uploaded value and skip the GL call when it didn't change; they return
+    whether the upload was issued. Uniforms the program doesn't use (optimized
+    out or compiled out of a variant) have location -1 and never upload.
+    """
+
+    name: str
+    location: int
+    gl_type: int
+    # Array length, 1 for plain uniforms
+    size: int
+
+    # Last value uploaded: a number, or a copy of the array (allocated once,
+    # then updated in place) and a view of the rows of it that were sent
+    _shadow: Any
+    _view: Optional[memoryview]
+    _count: int
+    # The array last checked, its row count and a view of those rows, reused
+    # while the caller passes the same (staging) array
+    _source: Optional[Tuple[np.ndarray, int, memoryview]]
+
+    def __init__(self, name: str, location: int, gl_type: int = 0, size: int = 1):
+        self.name = name
+        self.location = location
+        self.gl_type = gl_type
+        self.size = size
+        self._shadow = None
+        self._view = None
+        self._count = -1
+        self._source = None
+
+    @property
+    def active(self) -> bool:
+        return self.location >= 0
+
+    def invalidate(self) -> None:
+        """Forgets the last value, so the next set always uploads"""
+        self._shadow = None
+        self._view = None
+        self._count = -1
+
+    def _changed(self, values: np.ndarray, count: int) -> bool:
+        """Whether the first `count` rows of `values` differ from the last upload"""
+        # Memoryviews compare the elements without copying them out, unlike
+        # tobytes() or the temporary array of a numpy comparison. Exporting
+        # one costs more than comparing, it's only done for a new array
+        source = self._source
+        if source is not None and source[0] is values and source[1] == count:
+            view = source[2]
+        else:
+            view = memoryview(values)
+            if count < len(values):
+                view = view[:count]
+            self._source = (values, count, view)
+        if view == self._view:
+            return False
+
+        shadow = self._shadow
+        if type(shadow) is not np.ndarray or shadow.shape != values.shape:
+            self._shadow = shadow = values.copy()
+            self._count = -1
+        else:
+            shadow[:count] = values[:count]
+        if count != self._count:
+            self._view = memoryview(shadow)[:count]
+            self._count = count
+        return True
+
+    def set_int(self, value: int) -> bool:
+        """Sets an int, bool or sampler uniform"""
+        if self.location < 0 or value == self._shadow:
+            return False
+        self._shadow = value
+        gl.glUniform1i(self.location, value)
+        return True
+
+    def set_float(self, value: float) -> bool:
+        if self.location < 0 or value == self._shadow:
+            return False
+        self._shadow = value
+        gl.glUniform1f(self.location, value)
+        return True
+
+    def set_floats(self, values: np.ndarray, count: int = 1) -> bool:
+        """Sets the first `count` elements of a float array (float32 values)"""
+        if self.location < 0 or not self._changed(values, count):
+            return False
+        gl.glUniform1fv(self.location, count, values)
+        return True
+
+    def set_vec3(self, values: np.ndarray, count: int = 1) -> bool:
+        """Sets a vec3, or the first `count` of a vec3 array (float32 values)"""
+        rows = count if values.ndim > 1 else len(values)
+        if self.location < 0 or not self._changed(values, rows):
+            return False
+        gl.glUniform3fv(self.location, count, values)
+        return True
+
+    def set_mat4(self, matrix: np.ndarray) -> bool:
+        """Sets a mat4 from a row-major float32 matrix (numpy's layout)"""
+        if self.location < 0 or not self._changed(matrix, len(matrix)):
+            return False
+        gl.glUniformMatrix4fv(self.location, 1, gl.GL_TRUE, matrix)
+        return True
+
+
+def reflect_uniforms(program_id: int) -> Dict[str, Uniform]:
+    """The active uniforms of a linked program, by name (arrays without [0])"""
+    uniforms: Dict[str, Uniform] = {}
+    count = int(gl.glGetProgramiv(program_id, gl.GL_ACTIVE_UNIFORMS))
+    for index in range(count):
+        name, size, gl_type = gl.glGetActiveUniform(program_id, index)
+        if isinstance(name, bytes):
+            name = name.decode()
+        if name.endswith("[0]"):
+            name = name[:-3]
+        location = int(gl.glGetUniformLocation(program_id, name))
+        uniforms[name] = Uniform(name, location, int(gl_type), int(size))
+    return uniforms
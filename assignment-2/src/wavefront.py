@@ -109,6 +109,24 @@ def load_obj(filepath: str, split_objects=False):
     return models
 
 
+def material_runs(faces) -> int:
+    """Number of runs of consecutive faces with the same material"""
+    return sum(
+        1 for i, face in enumerate(faces) if i == 0 or face[3] != faces[i - 1][3]
+    )
+
+
+def group_faces_by_material(faces):
+    """
+    Stably reorders the faces so each material is a single run, materials
+    keeping the order they first appear in
+    """
+    groups = {}
+    for face in faces:
+        groups.setdefault(face[3], []).append(face)
+    return [face for group in groups.values() for face in group]
+
+
 def load_mtllib(filepath: str):
     """Loads a Wavefront material library."""
     materials = {}
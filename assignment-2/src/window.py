@@ -19,8 +19,14 @@ def init_window(
     width: int,
     height: int,
     resizable=False,
+    samples: int = 4,
+    vsync: bool = True,
 ) -> Any:
-    """Initializes window with given title and width and height"""
+    """
+    Initializes window with given title and width and height, and `samples`
+    samples per pixel (0 when the scene is drawn through a `RenderTarget`).
+    Swaps wait for the display's refresh with `vsync`
+    """
     glfw.init()
     glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 4)
     glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 1)
@@ -29,12 +35,12 @@ def init_window(
     glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
     glfw.window_hint(glfw.RESIZABLE, glfw.TRUE if resizable else glfw.FALSE)
     glfw.window_hint(glfw.DOUBLEBUFFER, glfw.TRUE)
-    glfw.window_hint(glfw.SAMPLES, 4)
+    glfw.window_hint(glfw.SAMPLES, samples)
 
     win = glfw.create_window(width, height, title, None, None)
     glfw.make_context_current(win)
 
-    glfw.swap_interval(1)
+    glfw.swap_interval(1 if vsync else 0)
 
     glfw.set_input_mode(win, glfw.STICKY_KEYS, glfw.TRUE)
     glfw.set_input_mode(win, glfw.CURSOR, glfw.CURSOR_DISABLED)